@@ -0,0 +1,73 @@
+"""
+Benchmark compiled spec validator against the interpreted validator chain,
+and bulk validation of album items against validation item by item
+
+Run from the source tree::
+
+    python -m benchmarks.compiler [NUMBER]
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+from __future__ import print_function
+
+import sys
+import timeit
+
+import validators
+
+from outernet_metadata import values
+from outernet_metadata.compiler import (compile_spec, compile_list_spec,
+                                         compile_bulk_spec)
+
+
+VALID = {
+    'title': 'Foo',
+    'url': 'outernet://foo.bar/',
+    'timestamp': '2015-04-29 13:22:00 UTC',
+    'broadcast': '2015-04-29',
+    'license': 'CC-BY',
+    'archive': 'core',
+    'keywords': 'foo,bar',
+    'language': 'en',
+    'publisher': 'foo',
+    'is_partner': False,
+    'is_sponsored': False,
+    'content': {'html': {'main': 'index.html'}},
+}
+
+INVALID = dict(VALID, title='', url='foo', license='foo', index='index.html')
+
+ALBUM = [{'file': 'photos/img{:05}.jpg'.format(i),
+          'title': 'Photo {}'.format(i),
+          'size': '640x480'} for i in range(20000)]
+
+
+def run(number):
+    interpreted = validators.spec_validator(
+        values.SPECS, key=lambda k: lambda obj: obj.get(k))
+    compiled = compile_spec(values.SPECS)
+    for label, data in (('valid', VALID), ('invalid', INVALID)):
+        old = min(timeit.repeat(lambda: interpreted(data), number=number,
+                                repeat=3))
+        new = min(timeit.repeat(lambda: compiled(data), number=number,
+                                repeat=3))
+        print('{:<8} interpreted {:>8.2f} us  compiled {:>8.2f} us  '
+              '{:.2f}x'.format(label, old / number * 1e6,
+                               new / number * 1e6, old / new))
+    spec = values.TYPE_SPECS['image.album']
+    by_item = compile_list_spec(spec)
+    bulk = compile_bulk_spec(spec, values.SCANS)
+    number = max(number // 2000, 1)
+    old = min(timeit.repeat(lambda: by_item(ALBUM), number=number, repeat=3))
+    new = min(timeit.repeat(lambda: bulk(ALBUM), number=number, repeat=3))
+    print('album    by item    {:>8.2f} ms  bulk     {:>8.2f} ms  '
+          '{:.2f}x'.format(old / number * 1e3, new / number * 1e3, old / new))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,122 @@
+"""
+Synthetic metadata corpus generator
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import random
+import datetime
+
+from outernet_metadata import values
+from outernet_metadata.template import generate_template
+from outernet_metadata.custom_validators import CONTENT_TYPES
+
+
+WORDS = ('water', 'farming', 'medicine', 'history', 'science', 'music',
+         'language', 'weather', 'health', 'news', 'math', 'energy')
+LANGUAGES = ('', 'en', 'fr', 'pt_BR', 'sw', 'ar', 'sr_Latn')
+
+
+def words(rnd, count):
+    return ' '.join(rnd.choice(WORDS) for _ in range(count))
+
+
+def make_item(rnd, kind, n):
+    """ Return a playlist or album item for given content type """
+    if kind == 'audio':
+        return {'file': 'audio/track{}.mp3'.format(n),
+                'title': words(rnd, 3),
+                'duration': rnd.randint(1, 600)}
+    return {'file': 'images/img{}.jpg'.format(n),
+            'title': words(rnd, 3),
+            'thumbnail': 'thumbs/img{}.jpg'.format(n),
+            'caption': words(rnd, 8),
+            'size': '{}x{}'.format(rnd.randint(64, 4096),
+                                   rnd.randint(64, 4096))}
+
+
+def make_content(rnd, kind, items):
+    """ Return content dict for given content type """
+    if kind == 'html':
+        return {'main': 'index.html', 'keep_formatting': rnd.random() < 0.5}
+    if kind == 'video':
+        return {'main': 'video.mp4', 'description': words(rnd, 10),
+                'duration': rnd.randint(1, 7200), 'size': '1280x720'}
+    if kind == 'audio':
+        return {'description': words(rnd, 10),
+                'playlist': [make_item(rnd, kind, n) for n in range(items)]}
+    if kind == 'image':
+        return {'description': words(rnd, 10),
+                'album': [make_item(rnd, kind, n) for n in range(items)]}
+    if kind == 'app':
+        return {'description': words(rnd, 10), 'version': '1.0'}
+    return {'description': words(rnd, 10)}
+
+
+def corrupt(rnd, meta):
+    """ Make metadata invalid in one of the ways seen in the wild """
+    kind = list(meta['content'])[0]
+    content = meta['content'][kind]
+    choice = rnd.randint(0, 6)
+    if choice == 0:
+        meta['title'] = ''
+    elif choice == 1:
+        meta['url'] = 'not a url'
+    elif choice == 2:
+        meta['license'] = 'CC-FOO'
+    elif choice == 3:
+        meta['timestamp'] = meta['timestamp'][:10]
+    elif choice == 4:
+        meta['content'] = {'unknown': {}}
+    elif choice == 5 and kind in ('audio', 'image'):
+        items = content.get('playlist') or content.get('album')
+        for item in items[::max(1, len(items) // 10)]:
+            item['file'] = '/' + item['file']
+    else:
+        meta['index'] = 'index.html'
+    return meta
+
+
+def make_record(rnd, n, invalid=0.1, large=0.05, large_items=1000):
+    """ Return one metadata record
+
+    ``invalid`` is the probability of the record being invalid. ``large`` is
+    the probability of audio and image records having ``large_items`` items
+    in their playlist or album, instead of a few.
+    """
+    url = 'http://example.com/content/{}'.format(n)
+    ts = datetime.datetime(2015, 1, 1) + datetime.timedelta(
+        seconds=rnd.randint(0, 365 * 24 * 3600))
+    meta = generate_template(
+        title=words(rnd, 5),
+        url=url,
+        timestamp=ts.strftime(values.TS_FMT),
+        broadcast=rnd.choice([ts.strftime(values.DATE_FMT), '$BROADCAST']),
+        license=rnd.choice(values.LICENSES),
+        keywords=','.join(words(rnd, 1) for _ in range(3)),
+        language=rnd.choice(LANGUAGES),
+        publisher='Publisher {}'.format(rnd.randint(1, 50)))
+    # The template has defaults for deprecated keys, which are invalid
+    for key in values.DEPRECATED:
+        meta.pop(key, None)
+    kind = rnd.choice(CONTENT_TYPES)
+    items = large_items if rnd.random() < large else rnd.randint(1, 20)
+    meta['content'] = {kind: make_content(rnd, kind, items)}
+    if rnd.random() < invalid:
+        corrupt(rnd, meta)
+    return meta
+
+
+def generate(size, seed=0, **kwargs):
+    """ Generate ``size`` metadata records
+
+    The corpus is deterministic for a given ``seed``. Other keyword arguments
+    are passed to ``make_record()``.
+    """
+    rnd = random.Random(seed)
+    for n in range(size):
+        yield make_record(rnd, n, **kwargs)
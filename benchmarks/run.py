@@ -0,0 +1,152 @@
+"""
+Run validation benchmarks over a synthetic corpus
+
+Run from the source tree::
+
+    python -m benchmarks.run [--size N] [--save PATH] [--baseline PATH]
+
+Each benchmark reports throughput in records per second, per-record latency
+percentiles, and peak memory allocated while running. When a baseline file
+saved by an earlier run is given, benchmarks whose throughput dropped by more
+than the tolerance are reported and the program exits with status 1.
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+from __future__ import print_function
+
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+from outernet_metadata import jsonutil
+from outernet_metadata import validator
+
+from . import corpus
+
+
+PERCENTILES = (50, 90, 99)
+
+
+def bench_validate(records, encoded):
+    validate = validator.validate
+    for data in records:
+        yield lambda data=data: validate(data)
+
+
+def bench_decode_validate(records, encoded):
+    validate = validator.validate
+    loads = jsonutil.loads
+    for data in encoded:
+        yield lambda data=data: validate(loads(data))
+
+
+BENCHMARKS = (
+    ('validate', bench_validate),
+    ('decode+validate', bench_decode_validate),
+)
+
+
+def percentile(ordered, pct):
+    """ Return percentile of a sorted list using nearest-rank method """
+    idx = max(0, int(round(pct / 100.0 * len(ordered))) - 1)
+    return ordered[idx]
+
+
+def measure(calls):
+    """ Run calls and return throughput, latency and memory statistics """
+    calls = list(calls)
+    latencies = []
+    timer = time.perf_counter
+    start = timer()
+    for call in calls:
+        t = timer()
+        call()
+        latencies.append(timer() - t)
+    total = timer() - start
+    latencies.sort()
+    tracemalloc.start()
+    for call in calls:
+        call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    stats = {'throughput': len(calls) / total, 'peak_kb': peak / 1024.0}
+    for pct in PERCENTILES:
+        stats['p{}_us'.format(pct)] = percentile(latencies, pct) * 1e6
+    return stats
+
+
+def run(size, seed=0, **kwargs):
+    """ Return a dict of benchmark names mapped to statistics """
+    records = list(corpus.generate(size, seed, **kwargs))
+    encoded = [jsonutil.dumps(r, compact=True).encode('utf8')
+               for r in records]
+    return {name: measure(bench(records, encoded))
+            for name, bench in BENCHMARKS}
+
+
+def compare(results, baseline, tolerance):
+    """ Return list of ``(name, old, new)`` for regressed benchmarks """
+    regressions = []
+    for name, stats in sorted(results.items()):
+        if name not in baseline:
+            continue
+        old = baseline[name]['throughput']
+        new = stats['throughput']
+        if new < old * (1 - tolerance):
+            regressions.append((name, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run validation benchmarks')
+    parser.add_argument('--size', '-n', type=int, default=5000,
+                        help='number of records in the corpus')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed for the corpus generator')
+    parser.add_argument('--invalid', type=float, default=0.1,
+                        help='share of invalid records (default 0.1)')
+    parser.add_argument('--large', type=float, default=0.05,
+                        help='share of audio and image records with large '
+                        'playlists or albums (default 0.05)')
+    parser.add_argument('--large-items', type=int, default=1000,
+                        help='number of items in large playlists and albums')
+    parser.add_argument('--save', metavar='PATH',
+                        help='save results to PATH for use as a baseline')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='compare results with baseline saved at PATH')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed relative drop in throughput')
+    args = parser.parse_args()
+
+    results = run(args.size, args.seed, invalid=args.invalid,
+                  large=args.large, large_items=args.large_items)
+    for name, stats in sorted(results.items()):
+        print('{:<16} {:>10.0f} rec/s  p50 {:>8.1f} us  p90 {:>8.1f} us  '
+              'p99 {:>9.1f} us  peak {:>8.0f} KiB'.format(
+                  name, stats['throughput'], stats['p50_us'],
+                  stats['p90_us'], stats['p99_us'], stats['peak_kb']))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print('REGRESSION {}: {:.0f} -> {:.0f} rec/s'.format(
+                name, old, new), file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure import and command line tool startup time
+
+Run from the source tree::
+
+    python -m benchmarks.startup [--runs N]
+
+Each command is run in a fresh interpreter the given number of times, and
+the median and minimum wall clock times are reported, along with the time
+over a bare interpreter start.
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+from __future__ import print_function
+
+import sys
+import time
+import argparse
+import subprocess
+
+
+BASELINE = ('python', ['-c', 'pass'])
+
+COMMANDS = (
+    ('import validator',
+     ['-c', 'import outernet_metadata.validator']),
+    ('import validate',
+     ['-c', 'import outernet_metadata.validate']),
+    ('first validation',
+     ['-c', 'from outernet_metadata.validator import validate; '
+      'validate({})']),
+    ('metacheck -V', ['-m', 'outernet_metadata.validate', '-V']),
+    ('metacheck -h', ['-m', 'outernet_metadata.validate', '-h']),
+    ('metagen -V', ['-m', 'outernet_metadata.template', '-V']),
+)
+
+
+def measure(args, runs):
+    """ Return sorted list of wall clock times of running the interpreter """
+    cmd = [sys.executable] + args
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.check_call(cmd, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return sorted(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure startup time')
+    parser.add_argument('--runs', '-n', type=int, default=20,
+                        help='number of runs of each command')
+    args = parser.parse_args()
+
+    base = measure(BASELINE[1], args.runs)
+    base_median = base[len(base) // 2]
+    for name, cmd in (BASELINE,) + COMMANDS:
+        times = measure(cmd, args.runs)
+        median = times[len(times) // 2]
+        print('{:<18} median {:>7.1f} ms  min {:>7.1f} ms  '
+              'over python {:>7.1f} ms'.format(
+                  name, median * 1e3, times[0] * 1e3,
+                  (median - base_median) * 1e3))
+
+
+if __name__ == '__main__':
+    main()
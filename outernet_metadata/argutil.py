@@ -9,15 +9,36 @@ file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
 import sys
-import platform
 import argparse
 
 from . import __version__, __copyright__
 
-VERSION = "%(prog)s {} / Python {} {}".format(
-    __version__,
-    '.'.join([str(s) for s in sys.version_info[:3]]),
-    ' '.join(platform.architecture()))
+
+def get_version():
+    """ Return version string template for the ``--version`` switch """
+    # platform.architecture() runs an external program, so it is only called
+    # when the version is requested
+    import platform
+
+    return "%(prog)s {} / Python {} {}".format(
+        __version__,
+        '.'.join([str(s) for s in sys.version_info[:3]]),
+        ' '.join(platform.architecture()))
+
+
+class VersionAction(argparse.Action):
+    """ Action that prints the version string returned by ``get_version()`` """
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS,
+                 default=argparse.SUPPRESS,
+                 help="show program's version number and exit"):
+        super(VersionAction, self).__init__(
+            option_strings=option_strings, dest=dest, default=default,
+            nargs=0, help=help)
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        sys.stdout.write(get_version() % {'prog': parser.prog} + '\n')
+        parser.exit()
 
 
 def getparser(desc, usage=None):
@@ -25,5 +46,5 @@ def getparser(desc, usage=None):
         description=desc,
         usage=usage,
         epilog=__copyright__)
-    parser.add_argument('--version', '-V', action='version', version=VERSION)
+    parser.add_argument('--version', '-V', action=VersionAction)
     return parser
@@ -0,0 +1,152 @@
+"""
+Check that files referenced by metadata exist in the content package
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import posixpath
+
+from . import jsonutil
+from . import pathutil
+from . import validate
+from .values import RELPATH_RE, str_type
+
+
+# Content type keys that hold a relative path of the main file
+MAIN_KEYS = ('html', 'video')
+
+# Item list keys of content types, and item keys that hold relative paths
+ITEM_KEYS = {
+    'audio': ('playlist', ('file',)),
+    'image': ('album', ('file', 'thumbnail')),
+}
+
+MISSING = 'asset_missing'
+
+
+def is_relpath(value):
+    return isinstance(value, str_type) and RELPATH_RE.match(value)
+
+
+def references(data):
+    """ Yield ``(key, path)`` for each relative path referenced by metadata
+
+    Only values that are relative paths are considered, so references that
+    fail validation are not reported twice. Keys of playlist and album items
+    use 1-based indices, like the validation errors for those items.
+    """
+    if not isinstance(data, dict):
+        return
+    for key in ('thumbnail', 'cover'):
+        if is_relpath(data.get(key)):
+            yield key, data[key]
+    content = data.get('content')
+    if not isinstance(content, dict):
+        return
+    for ctype, value in content.items():
+        if not isinstance(value, dict):
+            continue
+        prefix = 'content.' + ctype
+        if ctype in MAIN_KEYS and is_relpath(value.get('main')):
+            yield prefix + '.main', value['main']
+        if ctype not in ITEM_KEYS:
+            continue
+        list_key, item_keys = ITEM_KEYS[ctype]
+        items = value.get(list_key)
+        if not isinstance(items, list):
+            continue
+        for i, item in enumerate(items, 1):
+            if not isinstance(item, dict):
+                continue
+            for k in item_keys:
+                if is_relpath(item.get(k)):
+                    yield '{}.{}.{}'.format(prefix, i, k), item[k]
+
+
+def index_dir(path):
+    """ Return a set of paths of all files below ``path``
+
+    Paths are relative to ``path`` and use forward slashes as separators.
+    The directory tree is listed once, and file types are taken from the
+    directory listing where the platform provides them.
+    """
+    start = len(os.path.join(path, ''))
+    index = set()
+    for entry in pathutil.scan(path, follow_symlinks=True):
+        try:
+            if not entry.is_file():
+                continue
+        except OSError:
+            continue
+        rel = entry.path[start:]
+        if os.sep != '/':
+            rel = rel.replace(os.sep, '/')
+        index.add(rel)
+    return index
+
+
+def index_zip(zf, prefix=''):
+    """ Return a set of paths of files in an open ``ZipFile`` object
+
+    Only members under ``prefix`` are included, and paths are relative to
+    it. Only the central directory is consulted.
+    """
+    start = len(prefix)
+    return set(name[start:] for name in zf.namelist()
+               if name.startswith(prefix) and not name.endswith('/'))
+
+
+def load_package(path):
+    """ Return ``(data, index)`` for metadata file or package ZIP file
+
+    ``data`` is the loaded metadata, and ``index`` is the set of paths of
+    files in the package, relative to the metadata file. The package
+    directory is the one that contains the metadata file. If ``path`` is a
+    directory, metadata is loaded from the ``info.json`` file in it.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, validate.METADATA_NAME)
+    if not path.lower().endswith(validate.ZIP_EXT):
+        data = jsonutil.load_path(path)
+        return data, index_dir(os.path.dirname(os.path.abspath(path)))
+    import zipfile
+
+    with zipfile.ZipFile(path, 'r') as zf:
+        member = validate.zip_member(zf, path)
+        data = jsonutil.loads(zf.read(member))
+        prefix = member[:-len(validate.METADATA_NAME)]
+        return data, index_zip(zf, prefix)
+
+
+def missing(data, index):
+    """ Return a list of ``(key, path)`` for references not in ``index`` """
+    return [(key, path) for key, path in references(data)
+            if posixpath.normpath(path) not in index]
+
+
+def check_path(path):
+    """ Validate metadata and check that referenced files exist
+
+    The return value has the same format as that of ``validate.check_path()``.
+    Missing files are reported after validation errors, with the
+    ``asset_missing`` code.
+    """
+    indexes = []
+
+    def loader(p):
+        data, index = load_package(p)
+        indexes.append((data, index))
+        return data
+
+    path, status, details = validate.check_path(path, loader)
+    if status == validate.LOAD_ERROR:
+        return path, status, details
+    data, index = indexes[0]
+    details += [(key, MISSING, 'file {} not found in package'.format(p))
+                for key, p in missing(data, index)]
+    return path, validate.INVALID if details else status, details
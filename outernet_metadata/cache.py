@@ -0,0 +1,214 @@
+"""
+Persistent cache of metadata validation results
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import time
+import hashlib
+import sqlite3
+
+from . import __version__
+from . import jsonutil
+from . import validate
+from .pathutil import stamp
+
+
+# Version of the stored result format
+FORMAT = 2
+
+# Results are only reused if they were produced by the same version
+SPEC_VERSION = '{}/{}'.format(__version__, FORMAT)
+
+# Entries for files that have not been checked for this long are evicted
+MAX_AGE = 30 * 24 * 3600
+
+# Maximum number of entries kept after eviction
+MAX_ENTRIES = 2000000
+
+# Number of writes after which the pending transaction is committed
+COMMIT_EVERY = 1000
+
+SCHEMA = """
+create table if not exists results (
+    path text primary key,
+    spec text,
+    size integer,
+    mtime integer,
+    digest text,
+    status text,
+    details text,
+    seen real
+);
+create index if not exists results_seen on results (seen);
+"""
+
+# Cache used by worker processes, set up by ``init_worker()``
+worker_cache = None
+
+
+def fingerprint(path):
+    """ Return ``(digest, loader)`` for the metadata at ``path``
+
+    For plain files, the digest is the MD5 hexdigest of the file contents,
+    which are read once and handed to the ``loader`` function so they need
+    not be read again. For ZIP files, the digest is made of the CRC and size
+    of the metadata member as recorded in the central directory, so that
+    nothing is decompressed unless the metadata has changed.
+    """
+    if path.lower().endswith(validate.ZIP_EXT):
+        import zipfile
+
+        with zipfile.ZipFile(path, 'r') as zf:
+            info = zf.getinfo(validate.zip_member(zf, path))
+        digest = 'zip:{:08x}:{}'.format(info.CRC, info.file_size)
+        return digest, validate.load_zip
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.md5(data).hexdigest()
+    return digest, lambda p: jsonutil.loads(data)
+
+
+def check_cached(path, cache):
+    """ Check metadata at ``path`` using results stored in ``cache``
+
+    Returns a ``(result, row)`` tuple where ``result`` is in the same format
+    as the return value of ``validate.check_path()``, and ``row`` is the
+    cache entry that should be stored for the path, or ``None`` if the result
+    should not be cached. The file is not parsed if its size and mtime, or
+    its digest, match the cached entry.
+    """
+    path = path.strip()
+    try:
+        size, mtime = stamp(path)
+        row = cache.get(path)
+        if row and row[:2] == (size, mtime):
+            return row_result(path, row), row
+        digest, loader = fingerprint(path)
+    except Exception as exc:
+        if not (isinstance(exc, validate.FILE_ERRORS) or
+                validate.is_bad_zip(exc)):
+            raise
+        return validate.check_path(path), None
+    if row and row[2] == digest:
+        return row_result(path, row), (size, mtime) + row[2:]
+    res = validate.check_path(path, loader)
+    details = jsonutil.dumps(res[2], compact=True)
+    return res, (size, mtime, digest, res[1], details)
+
+
+def row_result(path, row):
+    """ Return a ``validate.check_path()`` result for a cache row """
+    details = jsonutil.loads(row[4])
+    if isinstance(details, list):
+        details = [tuple(d) for d in details]
+    return path, row[3], details
+
+
+def init_worker(path):
+    """ Open the cache for lookups in a worker process """
+    global worker_cache
+    worker_cache = ResultCache(path)
+
+
+def check_worker(path):
+    return check_cached(path, worker_cache)
+
+
+class ResultCache(object):
+    """ Validation results stored in an SQLite database
+
+    Entries are keyed by path, and store the file's size, mtime and content
+    digest, along with the version of the specification that was used to
+    check it. Entries for a different specification version are ignored.
+    """
+
+    def __init__(self, path, max_age=MAX_AGE, max_entries=MAX_ENTRIES):
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.writes = 0
+        self.db = sqlite3.connect(path)
+        # WAL allows lookups from worker processes while results are written
+        self.db.execute('pragma journal_mode=wal')
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def get(self, path):
+        """ Return ``(size, mtime, digest, status, details)`` or ``None`` """
+        cur = self.db.execute(
+            'select size, mtime, digest, status, details from results '
+            'where path = ? and spec = ?',
+            (os.path.abspath(path), SPEC_VERSION))
+        row = cur.fetchone()
+        return tuple(row) if row else None
+
+    def put(self, path, row):
+        """ Store cache ``row`` as returned by ``check_cached()``
+
+        Storing a row also refreshes its timestamp, so that entries for files
+        that are still being checked are not evicted.
+        """
+        self.db.execute(
+            'insert or replace into results values (?, ?, ?, ?, ?, ?, ?, ?)',
+            (os.path.abspath(path), SPEC_VERSION) + tuple(row) +
+            (time.time(),))
+        self.writes += 1
+        if self.writes % COMMIT_EVERY == 0:
+            self.db.commit()
+
+    def check(self, path):
+        """ Check metadata at ``path`` and store the result """
+        res, row = check_cached(path, self)
+        if row:
+            self.put(res[0], row)
+        return res
+
+    def check_paths(self, paths, jobs=1):
+        """ Return an iterator of results for given paths
+
+        When ``jobs`` is larger than 1, paths are checked in a pool of worker
+        processes which look up the cache on their own, and results are
+        stored by the calling process. Results are yielded in the order of
+        ``paths``.
+        """
+        if jobs <= 1:
+            for p in paths:
+                yield self.check(p)
+            return
+        self.db.commit()
+        results = validate.pmap(check_worker, paths, jobs,
+                                initializer=init_worker,
+                                initargs=(self.path,))
+        for res, row in results:
+            if row:
+                self.put(res[0], row)
+            yield res
+
+    def invalidate(self):
+        """ Discard all cached results """
+        self.db.execute('delete from results')
+        self.db.commit()
+
+    def evict(self):
+        """ Discard entries that were not refreshed recently
+
+        Entries that were not refreshed within ``max_age`` seconds are removed,
+        and if there are still more than ``max_entries`` entries, the ones
+        that were stored least recently are removed.
+        """
+        self.db.execute('delete from results where seen < ? or spec != ?',
+                        (time.time() - self.max_age, SPEC_VERSION))
+        self.db.execute(
+            'delete from results where path in (select path from results '
+            'order by seen desc limit -1 offset ?)', (self.max_entries,))
+        self.db.commit()
+
+    def close(self):
+        self.evict()
+        self.db.close()
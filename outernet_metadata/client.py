@@ -0,0 +1,66 @@
+"""
+Client for the validation server
+
+Only the standard library is imported here, so that clients start quickly.
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import json
+import collections
+import socket
+import threading
+
+
+def decode(line):
+    """ Return ``(path, status, details)`` result for a response line
+
+    The result has the same format as those returned by
+    ``validate.check_path()``.
+    """
+    obj = json.loads(line)
+    if 'error' in obj:
+        return obj['path'], obj['status'], obj['error']
+    details = [(e['key'], e['code'], e['message']) for e in obj['errors']]
+    return obj['path'], obj['status'], details
+
+
+def check_paths(sock_path, paths):
+    """ Check paths using the server at ``sock_path`` and yield results
+
+    Paths are made absolute as the server may run in a different directory,
+    but results report them as given, like ``validate.check_path()`` does.
+    Requests are sent from a separate thread while responses are read, so
+    that neither side blocks on a full socket buffer. Results are yielded in
+    the order of ``paths``.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(sock_path)
+    # Paths as given, in the order of requests that were sent
+    sent = collections.deque()
+
+    def send():
+        try:
+            for path in paths:
+                path = path.strip()
+                sent.append(path)
+                line = json.dumps({'path': os.path.abspath(path)}) + '\n'
+                sock.sendall(line.encode('utf8'))
+        finally:
+            sock.shutdown(socket.SHUT_WR)
+
+    sender = threading.Thread(target=send)
+    sender.daemon = True
+    sender.start()
+    try:
+        with sock.makefile('rb') as f:
+            for line in f:
+                _, status, details = decode(line.decode('utf8'))
+                yield sent.popleft(), status, details
+    finally:
+        sock.close()
@@ -0,0 +1,482 @@
+"""
+Compile validator specs into specialized validation functions
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+from itertools import repeat
+
+import validators
+from validators import ReturnEarly
+from validators.re_patterns import URL_RE
+
+from . import timeutil
+from .errors import ValidationError
+
+
+INDENT = '    '
+EMPTY = ('', [], {})
+
+try:
+    INT_TYPES = {int, long}
+except NameError:
+    INT_TYPES = {int}
+
+
+class Rule(object):
+    """ Base class for compiled rules
+
+    Each rule knows how to emit Python source code for itself. The ``emit()``
+    method takes a ``fail`` callback which emits code that records an error
+    expression, a ``cont`` callback which emits the rest of the chain, and
+    the current indentation.
+    """
+
+    def emit(self, ns, fail, cont, indent):
+        raise NotImplementedError()
+
+
+class Guard(Rule):
+    """ Rule that fails when a condition expression is truthy """
+
+    def __init__(self, cond, error, **consts):
+        self.cond = cond
+        self.error = error
+        self.consts = consts
+
+    def emit(self, ns, fail, cont, indent):
+        names = {k: ns.add(v) for k, v in self.consts.items()}
+        lines = [indent + 'if {}:'.format(self.cond.format(**names))]
+        lines += fail(self.error.format(**names), indent + INDENT)
+        return lines + orelse(cont(indent + INDENT), indent)
+
+
+class Skip(Rule):
+    """ Rule that stops the chain without errors when condition is truthy """
+
+    def __init__(self, cond, **consts):
+        self.cond = cond
+        self.consts = consts
+
+    def emit(self, ns, fail, cont, indent):
+        names = {k: ns.add(v) for k, v in self.consts.items()}
+        body = cont(indent + INDENT)
+        if not body:
+            return []
+        cond = self.cond.format(**names)
+        return [indent + 'if not ({}):'.format(cond)] + body
+
+
+class Match(Rule):
+    """ Rule that matches the value against a regular expression """
+
+    def __init__(self, regex):
+        self.regex = regex
+
+    def emit(self, ns, fail, cont, indent):
+        regex = ns.add(self.regex.match)
+        inner = indent + INDENT
+        lines = [indent + 'try:',
+                 inner + '_m = {}(val)'.format(regex),
+                 indent + 'except TypeError:']
+        # Errors are formatted to unescape braces since no constants are used
+        lines += fail(error('value of {0.__name__} type cannot be tested '
+                            'for format', 'match', 'type(val)').format(),
+                      inner)
+        lines += [indent + 'else:',
+                  inner + 'if not _m:']
+        lines += fail(error('value does not match the expected format',
+                            'match').format(), inner + INDENT)
+        return lines + orelse(cont(inner + INDENT), inner)
+
+
+class Call(Rule):
+    """ Rule that calls a chainable validator that could not be compiled """
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def emit(self, ns, fail, cont, indent):
+        fn = ns.add(self.fn)
+        inner = indent + INDENT
+        lines = [indent + 'try:',
+                 inner + 'val = {}(val)'.format(fn),
+                 indent + 'except ReturnEarly:',
+                 inner + 'pass',
+                 indent + 'except ValueError as _exc:']
+        lines += fail('_exc', inner)
+        return lines + orelse(cont(inner), indent)
+
+
+class Any(Rule):
+    """ Rule that passes if any of the alternatives passes
+
+    As with ``validators.OR``, the error of the last alternative is reported
+    when all alternatives fail.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+
+    def emit(self, ns, fail, cont, indent):
+        first, rest = self.rules[0], self.rules[1:]
+        if rest:
+            def fail_first(err, indent):
+                return Any(rest).emit(ns, fail, cont, indent)
+        else:
+            fail_first = fail
+        return first.emit(ns, fail_first, cont, indent)
+
+
+def orelse(body, indent):
+    """ Return ``else`` clause with given body, or nothing if body is empty """
+    if not body:
+        return []
+    return [indent + 'else:'] + body
+
+
+class Namespace(dict):
+    """ Globals for the generated code, with names allocated on demand """
+
+    def add(self, obj):
+        for name, value in self.items():
+            if value is obj:
+                return name
+        name = '_c{}'.format(len(self))
+        self[name] = obj
+        return name
+
+
+def closure_vars(fn):
+    """ Return a dict of variables closed over by function ``fn`` """
+    code = getattr(fn, '__code__', None)
+    cells = getattr(fn, '__closure__', None) or ()
+    if code is None:
+        return {}
+    return dict(zip(code.co_freevars, [c.cell_contents for c in cells]))
+
+
+def factory_name(fn):
+    """ Return the name of the factory that created chainable ``fn``
+
+    Returns ``None`` for validators that are not created by one of the
+    factories in the ``validators`` package.
+    """
+    wrapped = getattr(fn, '__wrapped__', None)
+    if wrapped is None:
+        return None
+    if not wrapped.__module__.startswith('validators.'):
+        return None
+    qualname = getattr(wrapped, '__qualname__', '')
+    parts = qualname.split('.')
+    if len(parts) != 3 or parts[1:] != ['<locals>', 'validator']:
+        return None
+    return parts[0]
+
+
+def error(template, code, params=None):
+    """ Return source of an expression that creates a ``ValidationError``
+
+    ``params`` is the source of comma-separated expressions for the message
+    template parameters, and may reference rule constants as ``{name}``.
+    The template itself is not formatted until the message is needed.
+    """
+    template = repr(template).replace('{', '{{').replace('}', '}}')
+    if params:
+        return 'ValidationError({}, {!r}, ({},))'.format(template, code,
+                                                        params)
+    return 'ValidationError({}, {!r})'.format(template, code)
+
+
+def compile_rule(fn, fail_fast=False):
+    """ Return a ``Rule`` object that matches chainable validator ``fn``
+
+    Validators that are not recognized are wrapped in a ``Call`` rule, so any
+    chainable validator can be used in a spec that is being compiled. If
+    ``fail_fast`` is ``True`` and such a validator has a ``fail_fast``
+    attribute, the validator in that attribute is used instead.
+    """
+    if fn is validators.required:
+        return Guard('val is None', error('value is required', 'required'))
+    if fn is validators.nonempty:
+        return Guard('val in {empty}',
+                     error('value cannot be an empty {}', 'nonempty',
+                           'type(val)'), empty=EMPTY)
+    if fn is validators.deprecated:
+        return Guard('val is not None',
+                     error('Key is deprecated, remove it or ignore this '
+                           'error', 'deprecated'))
+    if fn is validators.boolean:
+        return Guard('val not in {bools}',
+                     error('{} must be True or False', 'boolean', 'val'),
+                     bools=[True, False])
+    if fn is validators.url:
+        return Match(URL_RE)
+    name = factory_name(fn)
+    args = closure_vars(getattr(fn, '__wrapped__', None))
+    if name == 'optional':
+        return Skip('val in {skip}', skip=(None, args['default']))
+    if name == 'istype':
+        return Guard('type(val) is not {t}',
+                     error('value must be a {0.__name__}, was '
+                           '{1.__name__}', 'istype', '{t}, type(val)'),
+                     t=args['t'])
+    if name == 'instanceof':
+        return Guard('not isinstance(val, {t})',
+                     error('value must be an instance of {0.__name__}, was '
+                           '{1.__name__}', 'instanceof', '{t}, type(val)'),
+                     t=args['t'])
+    if name == 'isin':
+        return Guard('val not in {coll}',
+                     error('value must be in {}', 'isin', '{coll}'),
+                     coll=args['collection'])
+    if name == 'gte':
+        return Guard('not val >= {num}',
+                     error('value must be greater than {}', 'gte', '{num}'),
+                     num=args['num'])
+    if name == 'lte':
+        return Guard('not val <= {num}',
+                     error('value must be less than {}', 'lte', '{num}'),
+                     num=args['num'])
+    if name == 'min_len':
+        return Guard('val is None or len(val) < {min}',
+                     error('Key must be longer than {}, was {}',
+                           'min_length', '{min}, val'),
+                     min=args['min'])
+    if name == 'match':
+        return Match(args['regex'])
+    if name == 'timestamp' and args['fmt'] in timeutil.CHECKS:
+        return Guard('not {check}(val)',
+                     error("{} does not match the format '{}'", 'timestamp',
+                           'val, {fmt}'),
+                     check=timeutil.CHECKS[args['fmt']], fmt=args['fmt'])
+    if name == 'OR':
+        return Any([compile_rule(f, fail_fast) for f in args['fns']])
+    if fail_fast:
+        fn = getattr(fn, 'fail_fast', fn)
+    return Call(fn)
+
+
+def emit_chain(ns, rules, fail, indent):
+    """ Emit source lines for a list of compiled rules """
+    if not rules:
+        return []
+    first, rest = rules[0], rules[1:]
+
+    def cont(indent):
+        return emit_chain(ns, rest, fail, indent)
+
+    return first.emit(ns, fail, cont, indent)
+
+
+def emit_spec(ns, spec, indent, stop=None):
+    """ Emit source lines that validate ``obj`` and fill ``errors`` dict
+
+    If ``stop`` lines are given, they are emitted after the first recorded
+    error, and the validation is compiled in fail-fast mode.
+    """
+    lines = [indent + 'errors = {}',
+             indent + 'get = obj.get']
+    for key in spec:
+        rules = [compile_rule(fn, stop is not None) for fn in spec[key]]
+        k = repr(key)
+
+        def fail(err, indent):
+            return ([indent + 'errors[{}] = {}'.format(k, err)] +
+                    [indent + l for l in stop or []])
+
+        lines.append(indent + 'val = get({})'.format(k))
+        lines += emit_chain(ns, rules, fail, indent)
+    return lines
+
+
+def build(ns, lines, name):
+    """ Compile generated source lines and return the named function """
+    source = '\n'.join(lines) + '\n'
+    code = compile(source, '<spec {}>'.format(name), 'exec')
+    exec(code, ns)
+    fn = ns[name]
+    fn.source = source
+    return fn
+
+
+def compile_spec(spec, name='validator', fail_fast=False):
+    """ Compile a spec in dict form into a single validation function
+
+    The spec has the same format as the one used by
+    ``validators.spec_validator()`` with the ``obj.get(key)`` getter, and the
+    returned function returns the same error dict. The difference is that all
+    keys are validated within one generated function, and built-in validators
+    are inlined instead of being called through the chain.
+
+    When ``fail_fast`` is ``True``, the function returns as soon as the first
+    error is found, so the error dict contains at most one error.
+    """
+    ns = Namespace(ValidationError=ValidationError,
+                   ReturnEarly=ReturnEarly)
+    lines = ['def {}(obj):'.format(name)]
+    lines += emit_spec(ns, spec, INDENT,
+                       stop=['return errors'] if fail_fast else None)
+    lines.append(INDENT + 'return errors')
+    return build(ns, lines, name)
+
+
+def compile_list_spec(spec, name='list_validator', fail_fast=False,
+                      iterator=False):
+    """ Compile a spec into a function that validates a list of objects
+
+    The returned function takes an iterable of objects and returns a list of
+    ``(index, errors)`` tuples for objects that failed validation, where
+    ``index`` is 1-based. The loop over the objects is part of the generated
+    code, so validating a long list costs one function call in total rather
+    than one per item.
+
+    When ``fail_fast`` is ``True``, the function returns as soon as the first
+    error is found, so the list contains at most one item with one error.
+
+    When ``iterator`` is ``True``, the returned function is a generator that
+    yields the tuples instead, so the caller can decide how many of them to
+    keep.
+    """
+    ns = Namespace(ValidationError=ValidationError,
+                   ReturnEarly=ReturnEarly)
+    body = INDENT * 2
+    if iterator:
+        found = 'yield index, errors'
+        lines = ['def {}(items):'.format(name)]
+        stop = [found, 'return']
+    else:
+        found = 'results.append((index, errors))'
+        lines = ['def {}(items):'.format(name),
+                 INDENT + 'results = []']
+        stop = [found, 'return results']
+    lines += [INDENT + 'index = 0',
+              INDENT + 'for obj in items:',
+              body + 'index += 1']
+    lines += emit_spec(ns, spec, body, stop=stop if fail_fast else None)
+    lines += [body + 'if errors:',
+              body + INDENT + found]
+    if not iterator:
+        lines.append(INDENT + 'return results')
+    return build(ns, lines, name)
+
+
+def column_rule(fn, scans):
+    """ Return a function that checks a column of values against ``fn``
+
+    The returned function takes a list of values and returns the list of
+    values that the rest of the chain should check, or ``None`` if some value
+    may fail the rule. A column is never accepted if ``fn`` rejects any of
+    its values, but it may be rejected when that cannot be determined
+    cheaply. ``scans`` maps regular expressions to functions that test a
+    whole list of strings against them in one pass.
+
+    Returns ``None`` instead of a function for validators that are not
+    recognized.
+    """
+    if fn is validators.required:
+        return lambda col: None if None in col else col
+    name = factory_name(fn)
+    args = closure_vars(getattr(fn, '__wrapped__', None))
+    if name == 'optional':
+        skip = (None, args['default'])
+
+        def check(col):
+            nones = col.count(None)
+            if nones == len(col):
+                return []
+            if skip[1] is not None:
+                return [val for val in col if val not in skip]
+            if not nones:
+                return col
+            # Values equal to None that are not skipped are still checked
+            # by the rest of the chain, so the column is never accepted
+            # because of them
+            return [val for val in col if val is not None]
+        return check
+    if name == 'istype':
+        types = {args['t']}
+        return lambda col: col if set(map(type, col)) <= types else None
+    if name == 'instanceof':
+        t = args['t']
+        return lambda col: (col if all(issubclass(c, t)
+                                       for c in set(map(type, col)))
+                            else None)
+    if name in ('gte', 'lte'):
+        num = args['num']
+        # Only integers are known to compare consistently with min and max
+        if name == 'gte':
+            def ok(col):
+                return min(col) >= num
+        else:
+            def ok(col):
+                return max(col) <= num
+
+        def check(col):
+            if not col:
+                return col
+            if set(map(type, col)) <= INT_TYPES and ok(col):
+                return col
+            return None
+        return check
+    if name == 'match':
+        regex = args['regex']
+        scan = scans.get(regex)
+
+        def check(col):
+            if scan is not None and set(map(type, col)) <= {str}:
+                return col if scan(col) else None
+            try:
+                return col if all(map(regex.match, col)) else None
+            except TypeError:
+                return None
+        return check
+    return None
+
+
+def compile_bulk_spec(spec, scans=None):
+    """ Compile a spec into a function that checks a list of objects at once
+
+    Where ``compile_list_spec()`` validates the objects one by one, the
+    function returned by this one checks each key of the spec across all
+    objects, with loops that run in C, such as one regular expression scan
+    over all values of a key. It returns ``True`` if all objects are valid,
+    and ``False`` if some objects are invalid or the check was not
+    conclusive, in which case the list spec should be used to find the
+    errors. ``scans`` is a dict as described in ``column_rule()``.
+
+    Returns ``None`` if the spec uses validators that cannot be checked in
+    bulk.
+    """
+    scans = scans or {}
+    columns = []
+    for key in spec:
+        rules = [column_rule(fn, scans) for fn in spec[key]]
+        if None in rules:
+            return None
+        columns.append((key, rules))
+
+    def check(items):
+        if type(items) is not list or not set(map(type, items)) <= {dict}:
+            return False
+        keys = set().union(*items)
+        for key, rules in columns:
+            if key in keys:
+                col = list(map(dict.get, items, repeat(key)))
+            else:
+                # Rules accept a column if they accept each of its values,
+                # so a single value stands for a column of missing values
+                col = [None] if items else []
+            for rule in rules:
+                col = rule(col)
+                if col is None:
+                    return False
+                if not col:
+                    break
+        return True
+
+    return check
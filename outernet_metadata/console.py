@@ -0,0 +1,36 @@
+"""
+Console used by command line tools
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+
+class Console(object):
+    """ Proxy for ``conz.Console`` that imports ``conz`` on first use
+
+    Modules that provide command line tools create a console at module
+    level. With this proxy, importing such a module for its functions does
+    not import ``conz``, nor does a tool that exits before printing
+    anything. Attribute access and assignment are forwarded to the console.
+    """
+
+    def __init__(self, **kwargs):
+        object.__setattr__(self, 'kwargs', kwargs)
+        object.__setattr__(self, 'console', None)
+
+    def get(self):
+        """ Return the ``conz.Console`` object, creating it if needed """
+        if self.console is None:
+            import conz
+            object.__setattr__(self, 'console', conz.Console(**self.kwargs))
+        return self.console
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.get(), name, value)
@@ -1,63 +1,134 @@
-from validators import chainable, spec_validator
+from itertools import islice
+
+from validators import chainable
+
+from .errors import ValidationError, ContentError
+from .compiler import compile_spec, compile_list_spec, compile_bulk_spec
 
 CONTENT_TYPES = ['html', 'video', 'audio', 'image', 'generic', 'app']
 
 
-def content_type(TYPE_SPECS):
+# Content types whose dict holds a list of items, mapped to the list key and
+# the TYPE_SPECS key of the item spec
+ITEM_LISTS = {
+    'audio': ('playlist', 'audio.playlist'),
+    'image': ('album', 'image.album'),
+}
+
+# Maximum number of invalid items whose errors are reported for one item
+# list, and for all item lists in a document. Errors of further invalid items
+# are counted and reported as a single ``suppressed`` error, so a badly
+# broken document does not produce one error object per item. The limits are
+# read on each validation and can be changed at run time.
+MAX_LIST_ERRORS = 100
+MAX_DOCUMENT_ERRORS = 1000
+
+# Errors for item lists that were validated while the document was decoded,
+# keyed by ``id()`` of the list that stands in for the items in the document
+# (see ``validator.validate_stream()``). Each value is a ``(found, errors,
+# items)`` tuple as returned by ``take()``.
+STREAMED = {}
+
+
+def take(results, limit):
+    """ Return up to ``limit`` results and counts of the remaining ones
+
+    ``results`` is an iterable of ``(index, errors)`` tuples. The return
+    value is a ``(found, errors, items)`` tuple where ``found`` is a list of
+    the first ``limit`` results, and ``errors`` and ``items`` are the number
+    of errors and invalid items in the remaining results, which are not
+    kept.
+    """
+    results = iter(results)
+    found = list(islice(results, limit))
+    errors = items = 0
+    for _, e in results:
+        errors += len(e)
+        items += 1
+    return found, errors, items
+
+
+def suppressed(errors, items):
+    """ Return error that reports the number of suppressed item errors """
+    return ValidationError('{} more errors in {} items were not reported',
+                           'suppressed', (errors, items))
+
+
+def content_type(TYPE_SPECS, fail_fast=False, scans=None):
+    # Validators are built on first use and reused for every validated
+    # document. Item lists are first checked in bulk, and validated item by
+    # item only when that check does not pass, so that long lists of valid
+    # items are cheap to validate. ``scans`` are passed to the bulk check.
+    compiled = []
+
+    def get_validators():
+        if compiled:
+            return compiled
+        type_validators = {
+            key: compile_spec(spec, name=key.replace('.', '_'),
+                              fail_fast=fail_fast)
+            for key, spec in TYPE_SPECS.items()}
+        item_validators = {
+            key: (list_key,
+                  compile_bulk_spec(TYPE_SPECS[spec_key], scans),
+                  compile_list_spec(TYPE_SPECS[spec_key], name=list_key,
+                                    fail_fast=fail_fast, iterator=True))
+            for key, (list_key, spec_key) in ITEM_LISTS.items()}
+        compiled[:] = [type_validators, item_validators]
+        return compiled
+
     @chainable
     def validator(v):
+        type_validators, item_validators = get_validators()
         errors = {}
+        # Number of invalid items whose errors may still be reported
+        remaining = MAX_DOCUMENT_ERRORS
         for key in v:
             value = v[key]
             key_string = 'content.{}'.format(key)
 
             if key not in TYPE_SPECS:
                 errors['content'] = {
-                    key: ValueError('content type must be one of '
-                                   '{}'.format(CONTENT_TYPES), 'content_type')}
+                    key: ValidationError('content type must be one of {}',
+                                         'content_type', (CONTENT_TYPES,))}
             elif type(value) != dict:
                 errors['content'] = {
-                    key: ValueError('{} must be a '
-                                    'dict'.format(key), 'content_type')}
+                    key: ValidationError('{} must be a dict',
+                                         'content_type', (key,))}
             else:
-                VALIDATOR = spec_validator(
-                    TYPE_SPECS[key], key=lambda k: lambda obj: obj.get(k))
-                e = VALIDATOR(value)
+                e = type_validators[key](value)
                 if e:
                     errors[key_string] = e
-                elif key == 'audio':
-                    i = 0
-                    spec = TYPE_SPECS['audio.playlist']
-                    VALIDATOR = spec_validator(
-                        spec, key=lambda k: lambda obj: obj.get(k))
-                    for item in value['playlist']:
-                        i += 1
-                        e = VALIDATOR(item)
-                        if e:
-                            s = key_string + '.' + str(i)
-                            errors[s] = e
-                elif key == 'image':
-                    i = 0
-                    spec = TYPE_SPECS['image.album']
-                    VALIDATOR = spec_validator(
-                        spec, key=lambda k: lambda obj: obj.get(k))
-                    for item in value['album']:
-                        i += 1
-                        e = VALIDATOR(item)
-                        if e:
-                            s = key_string + '.' + str(i)
-                            errors[s] = e
-        final_set = []
+                elif key in item_validators:
+                    list_key, bulk_check, items_validator = \
+                        item_validators[key]
+                    items = value[list_key]
+                    limit = max(min(MAX_LIST_ERRORS, remaining), 0)
+                    streamed = STREAMED.get(id(items))
+                    if streamed is not None:
+                        found, more, more_items = take(streamed[0], limit)
+                        more += streamed[1]
+                        more_items += streamed[2]
+                    elif bulk_check is not None and bulk_check(items):
+                        found, more, more_items = (), 0, 0
+                    else:
+                        found, more, more_items = take(
+                            items_validator(items), limit)
+                    remaining -= len(found)
+                    for i, e in found:
+                        errors[key_string + '.' + str(i)] = e
+                    if more:
+                        errors[key_string] = {
+                            'suppressed': suppressed(more, more_items)}
+            if fail_fast and errors:
+                break
         if errors:
-            for key in errors:
-                set = []
-                for k in errors[key]:
-                    key_string = '.'.join([key, k])
-                    msg = errors[key][k].args[0]
-                    string = '{}: {}'.format(key_string, msg)
-                    set.append(string)
-                final_set.append('\n'.join(set))
-            error_string = '\n' + '\n'.join(final_set)
-            raise ValueError(error_string, 'content_type')
+            raise ContentError([('.'.join([key, k]), errors[key][k])
+                                for key in errors for k in errors[key]])
         return v
+
+    if not fail_fast:
+        # Used by the spec compiler for fail-fast validators
+        validator.fail_fast = content_type(TYPE_SPECS, fail_fast=True,
+                                           scans=scans)
     return validator
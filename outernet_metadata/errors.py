@@ -0,0 +1,93 @@
+"""
+Structured validation errors
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+
+class ValidationError(ValueError):
+    """ Validation error whose message is formatted on demand
+
+    The error carries the ``code`` of the failed check, and a message
+    ``template`` with ``params`` that is only formatted when ``message`` or
+    ``args`` is accessed. Like errors raised by the ``validators`` package,
+    ``args`` is a ``(message, code)`` tuple.
+    """
+
+    def __init__(self, template, code, params=()):
+        # Base exception args are left empty so nothing is formatted here
+        super(ValidationError, self).__init__()
+        self.template = template
+        self.code = code
+        self.params = params
+
+    @property
+    def message(self):
+        if not self.params:
+            return self.template
+        return self.template.format(*self.params)
+
+    @property
+    def args(self):
+        return (self.message, self.code)
+
+    def __str__(self):
+        return str(self.args)
+
+    def __repr__(self):
+        return '{}({!r}, {!r})'.format(self.__class__.__name__,
+                                       self.message, self.code)
+
+    def __reduce__(self):
+        return (self.__class__, (self.template, self.code, self.params))
+
+
+class ContentError(ValidationError):
+    """ Error that holds errors from content type specific validation
+
+    ``errors`` is a list of ``(path, error)`` pairs where ``path`` is the
+    dotted path of the failed key, such as ``content.image.2.file``. The
+    message joins all nested messages, one per line, in ``path: message``
+    format.
+    """
+
+    def __init__(self, errors):
+        super(ContentError, self).__init__(None, 'content_type')
+        self.errors = errors
+
+    @property
+    def message(self):
+        lines = ['{}: {}'.format(path, err.args[0])
+                 for path, err in self.errors]
+        return '\n' + '\n'.join(lines)
+
+    def __reduce__(self):
+        return (self.__class__, (self.errors,))
+
+
+def error_code(err):
+    """ Return the code of a validation error """
+    code = getattr(err, 'code', None)
+    if code is None and len(err.args) > 1:
+        code = err.args[1]
+    return code
+
+
+def flatten(errors):
+    """ Yield ``(path, error)`` pairs for an errors dict
+
+    Errors are yielded in order of their keys, and nested content type errors
+    are expanded in place of the ``content`` key. No message is formatted.
+    """
+    for key in sorted(errors):
+        err = errors[key]
+        nested = getattr(err, 'errors', None)
+        if nested is None:
+            yield key, err
+            continue
+        for path, e in nested:
+            yield path, e
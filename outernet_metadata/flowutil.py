@@ -19,5 +19,11 @@ def oninterrupt(signum, frame):
     sys.exit(1)
 
 
-signal.signal(signal.SIGINT, oninterrupt)
-signal.signal(signal.SIGTERM, oninterrupt)
+def handle_signals():
+    """ Exit with a message when interrupted or terminated
+
+    Handlers are only installed when this function is called, as importing
+    a module should not change the signal handling of the program.
+    """
+    signal.signal(signal.SIGINT, oninterrupt)
+    signal.signal(signal.SIGTERM, oninterrupt)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+
+"""
+Count asset files in content packages
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import json
+from collections import Counter
+
+from . import pathutil
+from .console import Console
+
+cn = Console()
+
+ZIP_EXT = '.zip'
+
+# Version of the cache file format
+CACHE_FORMAT = 1
+
+# ``os.replace()`` is not available on Python 2
+replace = getattr(os, 'replace', os.rename)
+
+
+def ext(name):
+    """ Return lower-case extension of a file name """
+    return os.path.splitext(name)[1].lower()
+
+
+def scan_dir(path):
+    """ Return ``[counts, subdirs]`` for files directly in a directory
+
+    ``counts`` maps lower-case extensions of all files in the directory to
+    number of files with that extension, and ``subdirs`` is a list of names
+    of its subdirectories.
+    """
+    counts = Counter()
+    subdirs = []
+    for entry in pathutil.listdir(path):
+        if pathutil.is_dir(entry, True):
+            subdirs.append(entry.name)
+            continue
+        try:
+            if entry.is_file():
+                counts[ext(entry.name)] += 1
+        except OSError:
+            continue
+    return [dict(counts), subdirs]
+
+
+def scan_zip(path):
+    """ Return counts of files per extension from ZIP central directory """
+    import zipfile
+
+    counts = Counter()
+    with zipfile.ZipFile(path, 'r') as zf:
+        for name in zf.namelist():
+            if not name.endswith('/'):
+                counts[ext(name)] += 1
+    return dict(counts)
+
+
+class AssetCounter(object):
+    """ Counts files per extension in package directories and ZIP files
+
+    Results are cached in a dict keyed by path. For directories, each
+    directory in the tree has its own entry holding the counts of the files
+    directly in it and the names of its subdirectories, which is reused
+    while the directory's mtime does not change. A directory's mtime changes
+    whenever entries are added to it or removed from it, so a package tree
+    that did not change costs one ``stat()`` per directory. For ZIP files,
+    the entry is reused while size and mtime of the file do not change.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else {}
+
+    def cached(self, path, fn):
+        try:
+            st = list(pathutil.stamp(path))
+        except OSError:
+            return None
+        entry = self.cache.get(path)
+        if entry and entry[0] == st:
+            return entry[1]
+        ret = fn(path)
+        self.cache[path] = [st, ret]
+        return ret
+
+    def count(self, path):
+        """ Return a ``Counter`` of files per extension in ``path`` """
+        totals = Counter()
+        if path.lower().endswith(ZIP_EXT):
+            import zipfile
+
+            try:
+                totals.update(self.cached(path, scan_zip) or {})
+            except zipfile.BadZipfile:
+                pass
+            return totals
+        stack = [path]
+        while stack:
+            d = stack.pop()
+            ret = self.cached(d, scan_dir)
+            if ret is None:
+                continue
+            counts, subdirs = ret
+            totals.update(counts)
+            stack.extend(os.path.join(d, s) for s in subdirs)
+        return totals
+
+    def count_many(self, paths, jobs=1):
+        """ Return iterator of ``(path, counts)`` in the order of ``paths``
+
+        Packages are counted in a pool of ``jobs`` threads.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        paths = (p.strip() for p in paths)
+        with ThreadPoolExecutor(max(1, jobs)) as pool:
+            for path, counts in pool.map(lambda p: (p, self.count(p)),
+                                         paths):
+                yield path, counts
+
+
+def load_cache(path):
+    """ Load cache dict from a JSON file, or return empty dict """
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except (IOError, OSError, ValueError):
+        return {}
+    if data.get('format') != CACHE_FORMAT:
+        return {}
+    return data.get('entries', {})
+
+
+def save_cache(path, cache):
+    """ Write cache dict to a JSON file atomically """
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'format': CACHE_FORMAT, 'entries': cache}, f)
+    replace(tmp, path)
+
+
+def main():
+    from .argutil import getparser
+
+    parser = getparser('Count asset files in content packages',
+                       usage='\n    %(prog)s [-h] [-V] [options] PATH...\n'
+                       '    PATH | %(prog)s [-h] [-V] [options]')
+    parser.add_argument('paths', metavar='PATH', nargs='*', default=['.'],
+                        help='package directory or ZIP file (defaults to '
+                        'current directory, ignored if used in a pipe)')
+    parser.add_argument('--ext', '-e', metavar='EXT', action='append',
+                        help='count files with extension EXT (can be used '
+                        'multiple times, defaults to common image formats)')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=8,
+                        help='number of packages counted concurrently '
+                        '(defaults to 8)')
+    parser.add_argument('--cache', metavar='PATH', default=None,
+                        help='cache counts in a file at PATH and reuse them '
+                        'for directories that did not change')
+    args = parser.parse_args()
+
+    exts = [e.lower() for e in args.ext or pathutil.IMAGE_EXTS]
+    src = args.paths if cn.interm else cn.readpipe()
+    counter = AssetCounter(load_cache(args.cache) if args.cache else None)
+    try:
+        for path, counts in counter.count_many(src, args.jobs):
+            found = [(e, counts[e]) for e in exts if counts[e]]
+            total = sum(n for _, n in found)
+            details = ' '.join('{}={}'.format(e, n) for e, n in found)
+            cn.pstd('{} {} {}'.format(path, total, details).rstrip())
+    finally:
+        if args.cache:
+            save_cache(args.cache, counter.cache)
+
+
+if __name__ == '__main__':
+    main()
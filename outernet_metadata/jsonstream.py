@@ -0,0 +1,197 @@
+"""
+Incremental JSON decoding for metadata with very long arrays
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import re
+import json
+import codecs
+
+
+# Number of bytes read from the file at once
+CHUNK_SIZE = 64 * 1024
+
+# Maximum number of array items passed to a handler at once
+BATCH_SIZE = 256
+
+# Maximum distance from the end of buffer of errors caused by values that
+# continue beyond it, such as ``-Infinit`` or ``"\ud83d\ude0``
+MAX_TOKEN_TAIL = 16
+
+NONSPACE_RE = re.compile(r'[^ \t\n\r]')
+
+
+class Reader(object):
+    """ Decoder of JSON values from a binary file, read in chunks
+
+    The file is expected to be UTF-8 encoded. Only the part of the document
+    that has not been decoded yet is kept in memory, so the document can be
+    decoded one value at a time in constant memory.
+    """
+
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf8')()
+        self.raw_decode = json.JSONDecoder().raw_decode
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=None):
+        """ Read more data, and return ``False`` if there is none """
+        if self.eof:
+            return False
+        data = self.f.read(size or self.chunk_size)
+        self.eof = not data
+        self.buf = self.buf[self.pos:] + self.decoder.decode(data, self.eof)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ Skip whitespace and return the next character, or ``''`` """
+        while True:
+            m = NONSPACE_RE.search(self.buf, self.pos)
+            if m:
+                self.pos = m.start()
+                return self.buf[self.pos]
+            self.pos = len(self.buf)
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        """ Consume and return the next character if it is one of ``chars``
+
+        Raises ``ValueError`` for any other character.
+        """
+        c = self.peek()
+        if not c or c not in chars:
+            raise ValueError('Expecting one of {!r}'.format(chars))
+        self.pos += 1
+        return c
+
+    def value(self):
+        """ Decode and return the next value """
+        if not self.peek():
+            raise ValueError('Expecting value')
+        while True:
+            try:
+                obj, end = self.raw_decode(self.buf, self.pos)
+            except ValueError as exc:
+                # The value may be incomplete, so read as much again as is
+                # buffered before trying once more
+                if not self.truncated(exc) or not self.fill(
+                        max(self.chunk_size, len(self.buf) - self.pos)):
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the file
+            if end == len(self.buf) and self.fill():
+                continue
+            self.pos = end
+            return obj
+
+    def truncated(self, exc):
+        """ Whether decoding error ``exc`` may be due to the end of buffer
+
+        Errors are located at the end of the buffer, or within a few
+        characters of it for incomplete literals and escapes, except for
+        strings, which are reported at their start. Errors without a location
+        are always assumed to be due to the end of buffer.
+        """
+        pos = getattr(exc, 'pos', None)
+        if pos is None or str(exc).startswith('Unterminated string'):
+            return True
+        return len(self.buf) - pos <= MAX_TOKEN_TAIL
+
+    def members(self):
+        """ Iterate over the keys of the next object
+
+        The reader is positioned at the value of the yielded key, which must
+        be consumed before iteration continues.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            if self.peek() != '"':
+                raise ValueError('Expecting property name')
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+    def elements(self):
+        """ Iterate over the items of the next array
+
+        Like ``members()``, but ``None`` is yielded for each item.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.expect(',]') == ']':
+                return
+
+
+def stream(reader, handler, batch_size):
+    """ Pass items of the next array to ``handler`` and return placeholder """
+    placeholder = []
+    batch = []
+    start = 0
+    for _ in reader.elements():
+        batch.append(reader.value())
+        if not placeholder:
+            placeholder.append(batch[0])
+        if len(batch) == batch_size:
+            handler(batch, start)
+            start += len(batch)
+            batch = []
+    if batch:
+        handler(batch, start)
+    return placeholder
+
+
+def decode(reader, path, handlers, prefixes, batch_size):
+    """ Decode the next value at ``path`` of the document """
+    c = reader.peek()
+    if c == '[' and path in handlers:
+        return stream(reader, handlers[path], batch_size)
+    if c == '{' and path in prefixes:
+        obj = {}
+        for key in reader.members():
+            obj[key] = decode(reader, path + (key,), handlers, prefixes,
+                              batch_size)
+        return obj
+    return reader.value()
+
+
+def load(f, handlers, batch_size=BATCH_SIZE):
+    """ Decode JSON document from binary file ``f`` incrementally
+
+    ``handlers`` maps paths of arrays in the document to functions that
+    handle their items. A path is a tuple of object keys, such as
+    ``('content', 'image', 'album')``. Items of those arrays are passed to
+    the handler in lists of up to ``batch_size`` items, along with the
+    0-based index of the first item in the list, and are not kept after
+    that. In the returned document, each of those arrays is replaced by a
+    list that holds only its first item, so that it is still a list and
+    empty only if the array is empty.
+
+    Values at other paths are decoded as a whole. Raises ``ValueError`` if
+    the document is not valid JSON.
+    """
+    reader = Reader(f)
+    prefixes = set(p[:i] for p in handlers for i in range(len(p)))
+    doc = decode(reader, (), handlers, prefixes, batch_size)
+    if reader.peek():
+        raise ValueError('Extra data')
+    return doc
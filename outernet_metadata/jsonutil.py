@@ -0,0 +1,127 @@
+"""
+Functions for decoding and encoding JSON with the fastest available backend
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import json
+
+
+PRETTY_OPTS = {'indent': 4, 'sort_keys': True}
+COMPACT_OPTS = {'separators': (',', ':'), 'sort_keys': True}
+
+
+def stdlib_loads(data):
+    if isinstance(data, bytes):
+        data = data.decode('utf8')
+    return json.loads(data)
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, **COMPACT_OPTS)
+
+
+def orjson_backend():
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS).decode('utf8')
+
+    return orjson.loads, dumps
+
+
+def ujson_backend():
+    import ujson
+
+    def dumps(obj):
+        return ujson.dumps(obj, sort_keys=True, ensure_ascii=False)
+
+    return ujson.loads, dumps
+
+
+def stdlib_backend():
+    return stdlib_loads, stdlib_dumps
+
+
+# Backends in order of preference. Decoding errors raised by all of them are
+# subclasses of ``ValueError``.
+BACKENDS = (
+    ('orjson', orjson_backend),
+    ('ujson', ujson_backend),
+    ('json', stdlib_backend),
+)
+
+
+def select_loads(data):
+    use()
+    return fast_loads(data)
+
+
+def select_dumps(obj):
+    use()
+    return fast_dumps(obj)
+
+
+# The backend is selected on first use, so that importing this module does
+# not import the backend
+BACKEND = None
+fast_loads = select_loads
+fast_dumps = select_dumps
+
+
+def use(name=None):
+    """ Select JSON backend by name, or the first one that is installed
+
+    Returns the name of the selected backend. Raises ``ImportError`` if the
+    named backend is not installed.
+    """
+    global BACKEND, fast_loads, fast_dumps
+    for backend, factory in BACKENDS:
+        if name not in (None, backend):
+            continue
+        try:
+            fast_loads, fast_dumps = factory()
+        except ImportError:
+            if name:
+                raise
+            continue
+        BACKEND = backend
+        return backend
+    raise ImportError('no JSON backend named {}'.format(name))
+
+
+def loads(data):
+    """ Decode JSON document from a bytes or text string
+
+    Bytes are expected to be UTF-8 encoded. Raises ``ValueError`` if the
+    document is not valid JSON.
+    """
+    return fast_loads(data)
+
+
+def load_path(path):
+    """ Read and decode JSON document from file at ``path``
+
+    The file is read as bytes in one go, so no text decoding layer sits
+    between the file and the decoder.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return fast_loads(data)
+
+
+def dumps(obj, compact=False):
+    """ Encode object as JSON text
+
+    By default the output is indented and sorted for humans. When
+    ``compact`` is ``True``, the output has no insignificant whitespace and
+    is produced by the fastest available backend, which is meant for
+    machine-to-machine use.
+    """
+    if compact:
+        return fast_dumps(obj)
+    return json.dumps(obj, **PRETTY_OPTS)
@@ -0,0 +1,343 @@
+#!/usr/bin/env python
+
+"""
+Index of library metadata stored in an SQLite database
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import time
+import sqlite3
+
+from . import jsonutil
+from . import timeutil
+from . import validate
+from . import validator
+from .console import Console
+from .pathutil import stamp
+from .template import md5
+from .values import PLACEHOLDER_RE
+
+cn = Console()
+
+# Version of the database schema, databases with other versions are rebuilt
+SCHEMA_VERSION = 2
+
+SCHEMA = """
+create table if not exists files (
+    path text primary key,
+    size integer,
+    mtime integer,
+    id text
+);
+create table if not exists packages (
+    id text primary key,
+    path text,
+    title text,
+    url text,
+    timestamp text,
+    broadcast text,
+    license text,
+    language text,
+    archive text,
+    publisher text,
+    replaces text,
+    data text,
+    indexed real
+);
+create table if not exists content_types (
+    id text,
+    type text,
+    primary key (id, type)
+);
+create index if not exists files_id on files (id);
+create index if not exists packages_timestamp on packages (timestamp);
+create index if not exists packages_broadcast on packages (broadcast);
+create index if not exists packages_license on packages (license);
+create index if not exists packages_language on packages (language);
+create index if not exists packages_archive on packages (archive);
+create index if not exists content_types_type on content_types (type, id);
+"""
+
+# Columns filled from metadata keys of the same name
+COLUMNS = ('title', 'url', 'timestamp', 'broadcast', 'license', 'language',
+           'archive', 'publisher', 'replaces')
+
+# Query filters mapped to SQL conditions on the packages table
+FILTERS = {
+    'license': 'p.license = ?',
+    'language': 'p.language = ?',
+    'archive': 'p.archive = ?',
+    'content_type': ('p.id in (select id from content_types '
+                     'where type = ?)'),
+    'since': 'p.timestamp >= ?',
+    'until': 'p.timestamp < ?',
+    'broadcast_since': 'p.broadcast >= ?',
+    'broadcast_until': 'p.broadcast < ?',
+}
+
+# Date filters mapped to functions that put their values in the form used
+# in the database
+DATE_FILTERS = {
+    'since': timeutil.format_timestamp,
+    'until': timeutil.format_timestamp,
+    'broadcast_since': timeutil.format_date,
+    'broadcast_until': timeutil.format_date,
+}
+
+# Number of writes after which the pending transaction is committed
+COMMIT_EVERY = 1000
+
+ADDED = 'added'
+UNCHANGED = 'unchanged'
+INVALID = 'invalid'
+REMOVED = 'removed'
+
+
+def load_entry(path):
+    """ Load and validate metadata, and return ``(path, stamp, data)``
+
+    ``stamp`` is ``None`` if the file cannot be accessed, and ``data`` is
+    ``None`` if the metadata cannot be loaded, is not a JSON object, or is
+    not valid.
+    """
+    try:
+        st = stamp(path)
+    except OSError:
+        return path, None, None
+    try:
+        data = validate.load(path)
+    except Exception as exc:
+        if validate.load_error(exc) is None:
+            raise
+        return path, st, None
+    if not isinstance(data, dict) or validator.validate(data):
+        return path, st, None
+    return path, st, data
+
+
+def row(data):
+    """ Return a ``packages`` table row for valid metadata, without path """
+    values = [data.get(key) for key in COLUMNS]
+    # Dates are stored in canonical form so that they compare in date order,
+    # as the validator also accepts unpadded values. Placeholders are not
+    # dates, so they are not included in date lookups.
+    timestamp = COLUMNS.index('timestamp')
+    values[timestamp] = timeutil.format_timestamp(values[timestamp])
+    broadcast = COLUMNS.index('broadcast')
+    if PLACEHOLDER_RE.match(values[broadcast]):
+        values[broadcast] = None
+    else:
+        values[broadcast] = timeutil.format_date(values[broadcast])
+    return [md5(data['url'])] + values
+
+
+class LibraryIndex(object):
+    """ Metadata of library packages stored in an SQLite database
+
+    Packages are keyed by content ID, which is the MD5 hexdigest of their
+    URL. Indexed paths are stored along with their size and mtime, so that
+    only files that changed are loaded and validated on later updates.
+    Invalid metadata is not indexed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.writes = 0
+        self.db = sqlite3.connect(path)
+        self.db.execute('pragma journal_mode=wal')
+        version = self.db.execute('pragma user_version').fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.db.executescript("""
+            drop table if exists files;
+            drop table if exists packages;
+            drop table if exists content_types;
+            pragma user_version = {};
+            """.format(SCHEMA_VERSION))
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def is_current(self, path):
+        """ Return whether ``path`` is indexed and did not change since """
+        cur = self.db.execute('select size, mtime from files where path = ?',
+                              (path,))
+        indexed = cur.fetchone()
+        if not indexed:
+            return False
+        try:
+            return tuple(indexed) == stamp(path)
+        except OSError:
+            return False
+
+    def remove(self, path):
+        """ Remove file and the package indexed from it """
+        cur = self.db.execute('select id from files where path = ?', (path,))
+        indexed = cur.fetchone()
+        if indexed and indexed[0]:
+            self.remove_package(indexed[0], path)
+        self.db.execute('delete from files where path = ?', (path,))
+
+    def remove_package(self, id, path):
+        # Another file with the same URL may have replaced the package
+        self.db.execute('delete from packages where id = ? and path = ?',
+                        (id, path))
+        self.db.execute('delete from content_types where id = ? and id not '
+                        'in (select id from packages)', (id,))
+
+    def add(self, path, st, data):
+        """ Store result of ``load_entry()`` for ``path`` """
+        self.remove(path)
+        if st is None:
+            return REMOVED
+        id = None
+        if data is not None:
+            values = row(data)
+            id = values[0]
+            self.db.execute(
+                'insert or replace into packages values '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                values[:1] + [path] + values[1:] +
+                [jsonutil.dumps(data, compact=True), time.time()])
+            self.db.execute('delete from content_types where id = ?', (id,))
+            self.db.executemany(
+                'insert into content_types values (?, ?)',
+                [(id, t) for t in sorted(data.get('content') or {})])
+        self.db.execute('insert into files values (?, ?, ?, ?)',
+                        (path,) + tuple(st) + (id,))
+        self.writes += 1
+        if self.writes % COMMIT_EVERY == 0:
+            self.db.commit()
+        return ADDED if id else INVALID
+
+    def update(self, paths, jobs=1):
+        """ Index metadata files and yield ``(path, status)`` for each
+
+        Paths are normalized to absolute paths. Files that did not change
+        since they were last indexed are not loaded, and are yielded first
+        with the ``UNCHANGED`` status. Other files get ``ADDED`` status if
+        they contain valid metadata, ``INVALID`` if they do not, and
+        ``REMOVED`` if they no longer exist. When ``jobs`` is larger than 1,
+        changed files are loaded and validated in a pool of worker
+        processes.
+        """
+        changed = []
+        for p in paths:
+            p = os.path.abspath(p.strip())
+            if self.is_current(p):
+                yield p, UNCHANGED
+            else:
+                changed.append(p)
+        try:
+            for entry in validate.pmap(load_entry, changed, jobs):
+                yield entry[0], self.add(*entry)
+        finally:
+            self.db.commit()
+
+    def prune(self):
+        """ Remove files that no longer exist, and return their paths """
+        cur = self.db.execute('select path from files')
+        gone = [p for (p,) in cur.fetchall() if not os.path.exists(p)]
+        for p in gone:
+            self.remove(p)
+        self.db.commit()
+        return gone
+
+    def find(self, **filters):
+        """ Return a list of ``(id, path, title)`` for matching packages
+
+        Supported filters are ``license``, ``language``, ``archive`` and
+        ``content_type`` which match values exactly, ``since`` and ``until``
+        which match timestamps in the ``'YYYY-MM-DD HH:MM:SS UTC'`` format,
+        and ``broadcast_since`` and ``broadcast_until`` which match broadcast
+        dates in ``'YYYY-MM-DD'`` format. Date values are accepted in any
+        form the validator accepts, and ``ValueError`` is raised for others.
+        Lower bounds are inclusive and upper bounds are exclusive. Results
+        are ordered by timestamp, newest first.
+        """
+        conds = []
+        params = []
+        for key in sorted(filters):
+            if key not in FILTERS:
+                raise TypeError('unknown filter {!r}'.format(key))
+            if filters[key] is None:
+                continue
+            value = filters[key]
+            if key in DATE_FILTERS:
+                value = DATE_FILTERS[key](value)
+            conds.append(FILTERS[key])
+            params.append(value)
+        sql = 'select p.id, p.path, p.title from packages p'
+        if conds:
+            sql += ' where ' + ' and '.join(conds)
+        sql += ' order by p.timestamp desc, p.id'
+        return [tuple(r) for r in self.db.execute(sql, params)]
+
+    def get(self, id):
+        """ Return metadata for given content ID or ``None`` """
+        cur = self.db.execute('select data from packages where id = ?', (id,))
+        indexed = cur.fetchone()
+        return jsonutil.loads(indexed[0]) if indexed else None
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+def main():
+    from .argutil import getparser
+
+    parser = getparser('Index library metadata and query the index',
+                       usage='\n    %(prog)s [-h] [-V] [options] DB PATH...\n'
+                       '    PATH | %(prog)s [-h] [-V] [options] DB\n'
+                       '    %(prog)s [-h] [-V] DB --find [filters]')
+    parser.add_argument('db', metavar='DB', help='path to index database')
+    parser.add_argument('paths', metavar='PATH', nargs='*',
+                        help='metadata file or content package ZIP file to '
+                        'index (ignored if used in a pipe)')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=1,
+                        help='number of worker processes (0 uses all CPUs, '
+                        'defaults to 1)')
+    parser.add_argument('--prune', action='store_true',
+                        help='remove indexed files that no longer exist')
+    parser.add_argument('--find', action='store_true',
+                        help='print packages that match all filters, as '
+                        'content ID, path and title')
+    for key in sorted(FILTERS):
+        parser.add_argument('--' + key.replace('_', '-'), dest=key,
+                            metavar='VALUE', help='filter by ' +
+                            key.replace('_', ' '))
+    args = parser.parse_args()
+
+    index = LibraryIndex(args.db)
+    try:
+        if args.find:
+            filters = {key: getattr(args, key) for key in FILTERS}
+            try:
+                found = index.find(**filters)
+            except ValueError as exc:
+                parser.error('invalid date filter: {}'.format(exc))
+            for id, path, title in found:
+                cn.pstd('{} {} {}'.format(id, path, title))
+            return
+        if args.prune:
+            for path in index.prune():
+                cn.pstd('{} {}'.format(path, REMOVED))
+        src = args.paths if cn.interm else cn.readpipe()
+        jobs = args.jobs
+        if not jobs:
+            import multiprocessing
+            jobs = multiprocessing.cpu_count()
+        for path, status in index.update(src, jobs):
+            if status != UNCHANGED:
+                cn.pstd('{} {}'.format(path, status))
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    main()
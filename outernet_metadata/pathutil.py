@@ -10,16 +10,111 @@ file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 
 import os
 
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.gif', '.svg')
+
+
+def stamp(path):
+    """ Return ``(size, mtime)`` identity of the file at ``path``
+
+    The mtime is in nanoseconds where the platform supports it.
+    """
+    st = os.stat(path)
+    mtime = getattr(st, 'st_mtime_ns', None)
+    if mtime is None:
+        mtime = int(st.st_mtime * 1e9)
+    return st.st_size, mtime
+
+
+def listdir(path):
+    """ Return a list of ``DirEntry`` objects for a directory
+
+    Returns an empty list if the directory cannot be listed (e.g., it does
+    not exist, it is a file, or permission is denied).
+    """
+    try:
+        it = scandir(path)
+    except OSError:
+        return []
+    try:
+        return list(it)
+    except OSError:
+        return []
+    finally:
+        close = getattr(it, 'close', None)
+        if close:
+            close()
+
+
+def is_dir(entry, follow_symlinks):
+    try:
+        return entry.is_dir(follow_symlinks=follow_symlinks)
+    except OSError:
+        return False
+
+
+def scan(path, follow_symlinks=False, threads=0):
+    """ Walk directory tree and yield ``DirEntry`` objects for all entries
+
+    Entries for both files and directories below ``path`` are yielded, but
+    not for ``path`` itself. The tree is walked top-down using an explicit
+    stack, so the depth of the tree is not limited by the recursion limit.
+    Directories that cannot be listed are silently skipped. The file type
+    information cached in ``DirEntry`` objects can be used by the caller to
+    avoid additional ``stat()`` calls on most platforms.
+
+    Symbolic links to directories are not followed unless
+    ``follow_symlinks`` is ``True``.
+
+    When ``threads`` is larger than 0, directories are listed in a pool of
+    that many threads. This speeds up walks on network file systems where
+    listing a directory has a high latency. In this mode, the order in which
+    entries are yielded is not defined.
+    """
+    if threads > 0:
+        for entry in scan_threaded(path, follow_symlinks, threads):
+            yield entry
+        return
+    stack = [iter(listdir(path))]
+    while stack:
+        for entry in stack[-1]:
+            yield entry
+            if is_dir(entry, follow_symlinks):
+                stack.append(iter(listdir(entry.path)))
+                break
+        else:
+            stack.pop()
+
+
+def scan_threaded(path, follow_symlinks, threads):
+    """ Walk directory tree listing directories in a pool of threads """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    with ThreadPoolExecutor(threads) as pool:
+        pending = set([pool.submit(listdir, path)])
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                for entry in future.result():
+                    yield entry
+                    if is_dir(entry, follow_symlinks):
+                        pending.add(pool.submit(listdir, entry.path))
+
 
 def fnwalk(path, fn):
     """
     Walk directory tree top-down until directories of desired length are found
 
     This generator function takes a ``path`` from which to begin the traversal,
-    and a ``fn`` object that selects the paths to be returned. It calls
-    ``os.listdir()`` recursively until either a full path is flagged by ``fn``
-    function as valid (by returning a truthy value) or ``os.listdir()`` fails
-    with ``OSError``.
+    and a ``fn`` object that selects the paths to be returned. It calls ``fn``
+    with ``path`` and each path below it, and yields the paths that are
+    flagged by the ``fn`` function as valid (by returning a truthy value).
+    Directories are walked using ``scan()``.
 
     This function has been added specifically to deal with large and deep
     directory trees, and it's tehrefore not avisable to convert the return
@@ -28,43 +123,39 @@ def fnwalk(path, fn):
     if fn(path):
         yield path
 
-    try:
-        names = os.listdir(path)
-    except OSError:
-        return
-
-    for name in names:
-        for child in fnwalk(os.path.join(path, name), fn):
-            yield child
+    for entry in scan(path, follow_symlinks=True):
+        if fn(entry.path):
+            yield entry.path
 
 
-def extwalk(path, exts=['.jpg', '.jpeg', '.png', '.gif', '.svg']):
+def extwalk(path, exts=IMAGE_EXTS, threads=0):
     """
     Walk directory tree top-down until files with given extensions are matched.
 
     Default set of extensions match common image formats including SVG. The
     extension list can be customized by providing a non-generator iterable
     (e.g., list, tuple, dict) where each memeber is an extension including the
-    dot.
+    dot. The ``threads`` argument has the same meaning as in ``scan()``.
     """
-    matchfn = lambda p: os.path.isfile(p) and os.path.splitext(p)[1] in exts
-    for p in fnwalk(matchfn):
-        yield p
+    for entry in scan(path, follow_symlinks=True, threads=threads):
+        if os.path.splitext(entry.name)[1] not in exts:
+            continue
+        try:
+            if entry.is_file():
+                yield entry.path
+        except OSError:
+            continue
 
 
-def extcount(path, exts=['.jpg', '.jpeg', '.png', '.gif', '.svg']):
+def extcount(path, exts=IMAGE_EXTS, threads=0):
     """
     Return a count of all files matching given extensions in a certain path
 
     Default set of extensions match common image formats including SVG. The
     extension list can be customized by providing a non-generator iterable
     (e.g., list, tuple, dict) where each memeber is an extension including the
-    dot.
+    dot. The ``threads`` argument has the same meaning as in ``scan()``.
     """
     if os.path.isfile(path):
         return os.path.splitext(path)[1] in exts
-    sub = os.listdir(path)
-    total_found = 0
-    for s in sub:
-        total_found += extcount(os.path.join(path, s), exts)
-    return total_found
+    return sum(1 for _ in extwalk(path, exts, threads))
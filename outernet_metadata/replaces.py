@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+"""
+Resolve the graph of packages that replace other packages
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+from . import validate
+from .console import Console
+from .template import md5
+from .values import CONTENT_ID_RE, str_type
+
+cn = Console()
+
+
+def load_link(path):
+    """ Return ``(path, id, replaces)`` for metadata at ``path``
+
+    ``id`` is the content ID derived from the URL, and ``replaces`` is the
+    lower-case ID of the replaced package, or ``None``. Both are ``None`` if
+    the metadata cannot be loaded or has no URL. Other keys are not
+    validated.
+    """
+    path = path.strip()
+    try:
+        data = validate.load(path)
+    except Exception as exc:
+        if validate.load_error(exc) is None:
+            raise
+        return path, None, None
+    if not isinstance(data, dict) or not isinstance(data.get('url'),
+                                                    str_type):
+        return path, None, None
+    replaces = data.get('replaces')
+    if isinstance(replaces, str_type) and CONTENT_ID_RE.match(replaces):
+        replaces = replaces.lower()
+    else:
+        replaces = None
+    return path, md5(data['url']), replaces
+
+
+class ReplacesGraph(object):
+    """ Graph of packages linked by the ``replaces`` key
+
+    Each package replaces at most one other package, so the graph is stored
+    as a single dict that maps content IDs to the ID of the replaced package
+    or ``None``. All analyses visit each package a constant number of times.
+    """
+
+    def __init__(self):
+        self.replaces = {}
+        self._resolved = None
+
+    def add(self, id, replaces=None):
+        """ Add package ``id`` which replaces package ``replaces`` """
+        self.replaces[id] = replaces
+        self._resolved = None
+
+    def dangling(self):
+        """ Return a list of ``(id, replaces)`` for unknown replaced IDs """
+        known = self.replaces
+        return sorted((id, r) for id, r in known.items()
+                      if r is not None and r not in known)
+
+    def conflicts(self):
+        """ Return a list of ``(replaced, ids)`` for packages replaced twice
+
+        ``ids`` is a sorted list of packages that replace the same package.
+        """
+        replaced_by = {}
+        for id, r in self.replaces.items():
+            if r is not None:
+                replaced_by.setdefault(r, []).append(id)
+        return sorted((r, sorted(ids)) for r, ids in replaced_by.items()
+                      if len(ids) > 1)
+
+    def resolve(self):
+        """ Return ``(roots, cycles)`` for the graph
+
+        ``roots`` maps each package that is not part of a cycle to a
+        ``(root, length)`` tuple, where ``root`` is the oldest package in its
+        chain and ``length`` is the number of packages from it to the root.
+        ``cycles`` is a list of cycles, each a list of IDs in replacement
+        order starting from the smallest ID.
+        """
+        if self._resolved is not None:
+            return self._resolved
+        known = self.replaces
+        roots = {}
+        cycles = []
+        for start in known:
+            if start in roots:
+                continue
+            # Follow the chain until a resolved or unknown package is found
+            path = []
+            on_path = {}
+            id = start
+            while id in known and id not in roots and id not in on_path:
+                on_path[id] = len(path)
+                path.append(id)
+                id = known[id]
+            if id in on_path:
+                cycle = path[on_path[id]:]
+                path = path[:on_path[id]]
+                for c in cycle:
+                    roots[c] = None
+                first = cycle.index(min(cycle))
+                cycles.append(cycle[first:] + cycle[:first])
+            if not path:
+                continue
+            if id in roots and roots[id] is not None:
+                root, length = roots[id]
+            elif id in roots:
+                # Chain leading into a cycle has no root
+                root, length = None, 0
+            else:
+                root, length = path[-1], 0
+            for p in reversed(path):
+                length += 1
+                roots[p] = (root, length)
+        roots = dict((k, v) for k, v in roots.items() if v is not None)
+        self._resolved = roots, sorted(cycles)
+        return self._resolved
+
+    def cycles(self):
+        """ Return a list of cycles as returned by ``resolve()`` """
+        return self.resolve()[1]
+
+    def heads(self):
+        """ Return a sorted list of ``(head, root, length)`` for each chain
+
+        A head is the live package of a chain, which replaces another package
+        but is not replaced by any package. Chains that lead into a cycle
+        have no root and ``None`` is returned in its place.
+        """
+        roots = self.resolve()[0]
+        replaced = set(r for r in self.replaces.values() if r is not None)
+        return sorted((id, ) + roots[id] for id, r in self.replaces.items()
+                      if r is not None and id not in replaced and id in roots)
+
+    def chain(self, head):
+        """ Return list of IDs from ``head`` to the root of its chain """
+        ids = [head]
+        seen = set(ids)
+        id = self.replaces.get(head)
+        while id is not None and id not in seen:
+            ids.append(id)
+            seen.add(id)
+            id = self.replaces.get(id)
+        return ids
+
+
+def build(paths, jobs=1):
+    """ Return a ``ReplacesGraph`` built from metadata files in one pass
+
+    Paths of files that could not be used are collected in the ``skipped``
+    attribute of the returned graph.
+    """
+    graph = ReplacesGraph()
+    graph.skipped = []
+    for path, id, replaces in validate.pmap(load_link, paths, jobs):
+        if id is None:
+            graph.skipped.append(path)
+            continue
+        graph.add(id, replaces)
+    return graph
+
+
+def main():
+    from .argutil import getparser
+
+    parser = getparser('Resolve chains of packages that replace other '
+                       'packages',
+                       usage='\n    %(prog)s [-h] [-V] [-j N] PATH...\n'
+                       '    PATH | %(prog)s [-h] [-V] [-j N]')
+    parser.add_argument('paths', metavar='PATH', nargs='*',
+                        help='metadata file or content package ZIP file '
+                        '(ignored if used in a pipe)')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=1,
+                        help='number of worker processes (0 uses all CPUs, '
+                        'defaults to 1)')
+    parser.add_argument('--chains', action='store_true',
+                        help='print full chains instead of just heads')
+    args = parser.parse_args()
+
+    src = args.paths if cn.interm else cn.readpipe()
+    jobs = args.jobs
+    if not jobs:
+        import multiprocessing
+        jobs = multiprocessing.cpu_count()
+    graph = build(src, jobs)
+
+    for path in graph.skipped:
+        cn.pverr(path, 'could not load metadata')
+    for head, root, length in graph.heads():
+        if args.chains:
+            cn.pstd('chain {}'.format(' '.join(graph.chain(head))))
+        else:
+            cn.pstd('head {} root {} length {}'.format(head, root, length))
+    for id, replaces in graph.dangling():
+        cn.pstd('dangling {} replaces {}'.format(id, replaces))
+    for replaced, ids in graph.conflicts():
+        cn.pstd('conflict {} replaced by {}'.format(replaced, ' '.join(ids)))
+    for cycle in graph.cycles():
+        cn.pstd('cycle {}'.format(' '.join(cycle)))
+
+
+if __name__ == '__main__':
+    main()
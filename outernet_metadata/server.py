@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+
+"""
+Validation server listening on a Unix socket
+
+The server keeps the compiled specification loaded, so that clients such as
+``metacheck --connect`` do not need to load it on every invocation. Clients
+send one JSON object per line, and get one JSON object per line in response,
+in the same order. A request is either ``{"path": PATH}`` to check a metadata
+file or content package ZIP file, or ``{"id": ID, "data": METADATA}`` to
+validate metadata sent over the socket. Responses have the same format as
+those printed by ``metacheck --format json``.
+
+The server requires Python 3.7 or newer.
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import signal
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from . import jsonutil
+from . import validate
+from . import validator
+
+# Requests longer than this are rejected
+MAX_REQUEST = 64 * 1024 * 1024
+
+
+def request_name(request):
+    """ Return the name used for a decoded request in its response """
+    if isinstance(request, dict):
+        if 'data' in request:
+            return str(request.get('id', '<data>'))
+        if isinstance(request.get('path'), str):
+            return request['path'].strip()
+    return '<request>'
+
+
+def handle(request):
+    """ Return response line for a decoded request """
+    name = request_name(request)
+    if isinstance(request, dict) and 'data' in request:
+        if not isinstance(request['data'], dict):
+            res = (name, validate.LOAD_ERROR, 'metadata is not a JSON object')
+        else:
+            res = validate.result(name, validator.validate(request['data']))
+    elif isinstance(request, dict) and isinstance(request.get('path'), str):
+        res = validate.check_path(request['path'])
+    else:
+        res = (name, validate.LOAD_ERROR, 'invalid request')
+    return validate.format_json(res)
+
+
+def handle_line(line):
+    """ Return response line for a request line
+
+    Every request gets a response, even if handling it fails, so that the
+    client receives responses to the requests that follow it.
+    """
+    try:
+        request = jsonutil.loads(line)
+    except ValueError:
+        return validate.format_json(
+            ('<request>', validate.LOAD_ERROR, 'invalid JSON format'))
+    try:
+        return handle(request)
+    except Exception:
+        return validate.format_json((request_name(request),
+                                     validate.LOAD_ERROR,
+                                     'metadata could not be validated'))
+
+
+class Server(object):
+    """ Serves validation requests of concurrent clients
+
+    Requests are handled in a pool of ``jobs`` threads, so that a client
+    whose request takes long to load or validate does not block other
+    clients. Requests of a single client are handled in order.
+    """
+
+    def __init__(self, path, jobs=4):
+        self.path = path
+        self.executor = ThreadPoolExecutor(jobs)
+        self.server = None
+
+    async def client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                response = await loop.run_in_executor(
+                    self.executor, functools.partial(handle_line, line))
+                writer.write(response.encode('utf8') + b'\n')
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            # Client went away, or sent a request longer than the limit
+            pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(
+            self.client, path=self.path, limit=MAX_REQUEST)
+        return self.server
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    async def serve(self):
+        await self.start()
+        # Closing the server ends ``serve_forever()``, and the socket is removed
+        loop = asyncio.get_running_loop()
+        loop.add_signal_handler(signal.SIGTERM, self.server.close)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def main():
+    from .argutil import getparser
+
+    parser = getparser('Serve metadata validation on a Unix socket')
+    parser.add_argument('path', metavar='SOCKET',
+                        help='path of the Unix socket')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=4,
+                        help='number of requests handled concurrently '
+                        '(defaults to 4)')
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(Server(args.path, args.jobs).serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == '__main__':
+    main()
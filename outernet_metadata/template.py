@@ -10,15 +10,20 @@ This software is free software licensed under the terms of GPLv3. See COPYING
 file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
-import json
+import os
+import csv
 import hashlib
 import datetime
+import collections
 
 import sys
 import validators
-import conz
 
 from . import values
+from . import jsonutil
+from . import validator
+from .console import Console
+from .errors import ValidationError, error_code, flatten
 from .custom_validators import CONTENT_TYPES
 
 
@@ -28,9 +33,7 @@ if PY3:
 else:
     FILE_OPTS = {}
 
-JSON_OPTS = {'indent': 4, 'sort_keys': True}
-
-cn = conz.Console()
+cn = Console()
 
 
 def valwrap(fn):
@@ -64,7 +67,7 @@ def generate_template(**kwargs):
     for k in values.REQUIRED:
         data[k] = kwargs.get(k, '')
     for k, v in values.DEFAULTS.items():
-        data[k] = kwargs.get(k, v)
+        data[k] = kwargs[k] if k in kwargs else values.thaw(v)
     data['broadcast'] = data['broadcast'] or '$BROADCAST'
     return data
 
@@ -446,8 +449,180 @@ def md5(s):
     return h.hexdigest()
 
 
+# Keys whose values are given as JSON in CSV manifests
+CSV_JSON_KEYS = ('content', 'images', 'is_partner', 'is_sponsored',
+                 'keep_formatting', 'multipage')
+
+# Main file of packages generated from records without content
+DEFAULT_MAIN = 'index.html'
+
+# Number of pending writes per batch writer thread
+BATCH_BACKLOG = 16
+
+replace = getattr(os, 'replace', os.rename)
+
+
+def read_csv(f, name):
+    """ Yield ``(record_id, record)`` for rows of a CSV manifest
+
+    The first row names the metadata keys. Empty cells are omitted so that
+    defaults are used for them, and cells of keys listed in ``CSV_JSON_KEYS``
+    are parsed as JSON. Record IDs are in ``<name>:<line number>`` format.
+    Rows that cannot be parsed are yielded as ``ValidationError`` objects.
+    """
+    reader = csv.DictReader(f)
+    for row in reader:
+        rid = '{}:{}'.format(name, reader.line_num)
+        record = {}
+        for k, v in row.items():
+            if k is None or v is None or not v.strip():
+                continue
+            if k in CSV_JSON_KEYS:
+                try:
+                    v = jsonutil.loads(v)
+                except ValueError:
+                    yield rid, ValidationError(
+                        'invalid JSON in {} column', 'record', (k,))
+                    break
+            record[k] = v
+        else:
+            yield rid, record
+
+
+def read_ndjson(f, name):
+    """ Yield ``(record_id, record)`` for lines of an NDJSON manifest
+
+    Records that are not valid JSON objects are yielded as
+    ``ValidationError`` objects.
+    """
+    for lineno, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        rid = '{}:{}'.format(name, lineno)
+        try:
+            record = jsonutil.loads(line)
+        except ValueError:
+            yield rid, ValidationError('invalid JSON format', 'record')
+            continue
+        if not isinstance(record, dict):
+            record = ValidationError('record is not a JSON object', 'record')
+        yield rid, record
+
+
+def make_package(record):
+    """ Return ``(id, meta, errors)`` for a manifest record
+
+    The metadata is generated by ``generate_template()``, and optional keys
+    that have no default, such as ``thumbnail``, are copied from the record.
+    Deprecated keys are left out unless the record has them, and timestamp
+    defaults to the current time. Records without content get an HTML
+    package with ``index.html`` as the main file, the same default that
+    ``ask_html()`` uses.
+    """
+    meta = generate_template(**record)
+    for k in values.DEPRECATED:
+        if k not in record:
+            meta.pop(k, None)
+    if 'content' not in record:
+        meta['content'] = {'html': {'main': DEFAULT_MAIN}}
+    for k in values.KEYS:
+        if k in record and k not in meta:
+            meta[k] = record[k]
+    if not meta['timestamp']:
+        meta['timestamp'] = datetime.datetime.utcnow().strftime(values.TS_FMT)
+    errors = validator.validate(meta)
+    url = meta['url']
+    id = md5(url) if url and isinstance(url, values.str_type) else None
+    return id, meta, errors
+
+
+def write_atomic(path, text):
+    """ Write text to a file such that readers never see a partial file """
+    tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp, 'w', **FILE_OPTS) as f:
+        f.write(text)
+    replace(tmp, path)
+
+
+def write_package(base, id, text):
+    """ Write ``info.json`` into package directory ``id`` under ``base`` """
+    path = os.path.join(base, id)
+    try:
+        os.makedirs(path)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    write_atomic(os.path.join(path, 'info.json'), text)
+    return path
+
+
+def batch(records, base='.', jobs=8, compact=False):
+    """ Generate packages for manifest records and yield results
+
+    ``records`` is an iterable of ``(record_id, record)`` pairs as yielded by
+    ``read_csv()`` and ``read_ndjson()``. Each record is validated as it is
+    read, and package directories for valid records are written in a pool of
+    ``jobs`` threads. Yields ``(record_id, path, errors)`` tuples in the order
+    of records, where ``path`` is the package directory or ``None``, and
+    ``errors`` is a dict of validation errors, empty if the package was
+    written. Records whose URL matches a record that was already written
+    are not written again.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    seen = set()
+    pending = collections.deque()
+    with ThreadPoolExecutor(max(1, jobs)) as pool:
+        for rid, record in records:
+            if isinstance(record, ValidationError):
+                pending.append((rid, None, {'record': record}))
+            else:
+                id, meta, errors = make_package(record)
+                if not errors and id in seen:
+                    errors = {'url': ValidationError('duplicate URL',
+                                                     'duplicate')}
+                if errors:
+                    pending.append((rid, None, errors))
+                else:
+                    seen.add(id)
+                    text = jsonutil.dumps(meta, compact=compact)
+                    future = pool.submit(write_package, base, id, text)
+                    pending.append((rid, future, {}))
+            while len(pending) > jobs * BATCH_BACKLOG:
+                yield batch_result(*pending.popleft())
+        while pending:
+            yield batch_result(*pending.popleft())
+
+
+def batch_result(rid, future, errors):
+    if future is None:
+        return rid, None, errors
+    try:
+        return rid, future.result(), errors
+    except (IOError, OSError) as exc:
+        return rid, None, {'write': ValidationError(str(exc), 'write')}
+
+
+def run_batch(path, base, jobs, compact):
+    """ Generate packages from manifest at ``path`` and print results """
+    reader = read_csv if path.lower().endswith('.csv') else read_ndjson
+    opts = {'newline': ''} if PY3 and reader is read_csv else {}
+    opts.update(FILE_OPTS)
+    failed = 0
+    with open(path, 'r', **opts) as f:
+        for rid, pkg, errors in batch(reader(f, path), base, jobs, compact):
+            if not errors:
+                cn.pstd(cn.color.green('{} {}'.format(rid, pkg)))
+                continue
+            failed += 1
+            cn.pstd(cn.color.red('{} ERR'.format(rid)))
+            for key, err in flatten(errors):
+                cn.pverb('{}: {} [{}]'.format(key, cn.color.red(err.args[0]),
+                                               error_code(err)))
+    return 1 if failed else 0
+
+
 def main():
-    import os
     import argparse
 
     from .argutil import getparser
@@ -461,24 +636,41 @@ def main():
                         help='create a package template')
     parser.add_argument('--guided', '-g', action='store_true',
                         help='guided metadata creation')
+    output.add_argument('--batch', '-b', metavar='PATH', default=None,
+                        help='create package directories for all records '
+                        'in a CSV or NDJSON manifest at PATH')
+    parser.add_argument('--compact', '-c', action='store_true',
+                        help='write compact JSON without indentation')
+    parser.add_argument('--dir', '-d', metavar='PATH', default='.',
+                        help='directory in which batch packages are created '
+                        '(defaults to current directory)')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=8,
+                        help='number of threads writing batch packages '
+                        '(defaults to 8)')
     args = parser.parse_args()
 
+    if args.batch:
+        cn.verbose = True
+        sys.exit(run_batch(args.batch, args.dir, args.jobs, args.compact))
+
     if args.guided:
         meta = generate_template(**guide())
     else:
         meta = generate_template()
 
+    if args.package:
+        meta['url'] = meta['url'] or ask_url()
+
+    text = jsonutil.dumps(meta, compact=args.compact)
     if args.out:
-        json.dump(meta, args.out, **JSON_OPTS)
+        args.out.write(text)
     elif args.package:
-        url = meta['url'] or ask_url()
-        meta['url'] = url
-        id = md5(url)
+        id = md5(meta['url'])
         os.makedirs(id)
         with open(os.path.join(id, 'info.json'), 'w', **FILE_OPTS) as f:
-            json.dump(meta, f, **JSON_OPTS)
+            f.write(text)
     else:
-        print(json.dumps(meta, **JSON_OPTS))
+        print(text)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,133 @@
+"""
+Fast parsers for the fixed date and timestamp formats used in metadata
+
+``datetime.strptime()`` parses the format string on every call (with a cache
+guarded by a lock), and goes through locale-aware machinery that the
+metadata formats do not need. The parsers in this module use the same
+regular expressions that ``strptime()`` builds for the two formats, and the
+same checks of the parsed values, so they accept and reject exactly the same
+inputs.
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import re
+import datetime
+
+try:
+    STR_TYPES = (basestring,)
+except NameError:
+    STR_TYPES = (str,)
+
+
+DATE_FMT = '%Y-%m-%d'
+TS_FMT = '%Y-%m-%d %H:%M:%S UTC'
+
+# Patterns are those generated by ``_strptime.TimeRE`` for the formats, and
+# are case-insensitive like theirs. Note that month, day and time fields may
+# have a single digit, day may be padded with a space, and the space in the
+# format matches any run of whitespace.
+DATE_PAT = (r'(?P<Y>\d\d\d\d)-(?P<m>1[0-2]|0[1-9]|[1-9])-'
+            r'(?P<d>3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])')
+DATE_RE = re.compile(DATE_PAT, re.IGNORECASE)
+TS_RE = re.compile(DATE_PAT + r'\s+(?P<H>2[0-3]|[0-1]\d|\d):'
+                   r'(?P<M>[0-5]\d|\d):(?P<S>6[0-1]|[0-5]\d|\d)\s+UTC',
+                   re.IGNORECASE)
+
+# Maximum number of memoized results per format
+CACHE_SIZE = 4096
+
+
+def fullmatch(regex, s):
+    """ Return match object for the whole string, or raise ``ValueError`` """
+    if not isinstance(s, STR_TYPES):
+        raise TypeError('strptime() argument 1 must be str, not {}'.format(
+            type(s).__name__))
+    m = regex.match(s)
+    # Like strptime(), the first match must cover the string, even if a
+    # different alternative could have matched all of it
+    if m is None or m.end() != len(s):
+        raise ValueError('{!r} does not match the format'.format(s))
+    return m
+
+
+def parse_date(s):
+    """ Parse date in ``'%Y-%m-%d'`` format and return a ``date`` object
+
+    Raises ``ValueError`` for strings that do not match the format or do not
+    represent a valid date, and ``TypeError`` for values that are not
+    strings, like ``datetime.strptime()``.
+    """
+    g = fullmatch(DATE_RE, s).group
+    return datetime.date(int(g('Y')), int(g('m')), int(g('d')))
+
+
+def parse_timestamp(s):
+    """ Parse timestamp in ``'%Y-%m-%d %H:%M:%S UTC'`` format
+
+    Returns a naive ``datetime`` object. Raises exceptions in the same cases
+    as ``parse_date()``.
+    """
+    g = fullmatch(TS_RE, s).group
+    return datetime.datetime(int(g('Y')), int(g('m')), int(g('d')),
+                             int(g('H')), int(g('M')), int(g('S')))
+
+
+def format_date(s):
+    """ Return date string parsed by ``parse_date()`` in canonical form
+
+    The canonical form is zero-padded and has no extra whitespace, so that
+    such strings sort in date order.
+    """
+    d = parse_date(s)
+    return '{:04}-{:02}-{:02}'.format(d.year, d.month, d.day)
+
+
+def format_timestamp(s):
+    """ Return timestamp parsed by ``parse_timestamp()`` in canonical form
+
+    See ``format_date()``.
+    """
+    t = parse_timestamp(s)
+    return '{:04}-{:02}-{:02} {:02}:{:02}:{:02} UTC'.format(
+        t.year, t.month, t.day, t.hour, t.minute, t.second)
+
+
+def memoized(parse, size=CACHE_SIZE):
+    """ Return function that tells whether ``parse`` accepts a string
+
+    Results are memoized for up to ``size`` distinct strings, after which
+    the memo is cleared, so memory use stays bounded while the repeated
+    values found across a library, such as broadcast dates, are only parsed
+    once. ``TypeError`` raised by ``parse`` is not caught.
+    """
+    memo = {}
+
+    def check(s):
+        try:
+            return memo[s]
+        except (KeyError, TypeError):
+            pass
+        try:
+            parse(s)
+            ok = True
+        except ValueError:
+            ok = False
+        if len(memo) >= size:
+            memo.clear()
+        memo[s] = ok
+        return ok
+
+    check.memo = memo
+    return check
+
+
+# Memoized checks for supported formats
+CHECKS = {
+    DATE_FMT: memoized(parse_date),
+    TS_FMT: memoized(parse_timestamp),
+}
@@ -10,77 +10,439 @@ This software is free software licensed under the terms of GPLv3. See COPYING
 file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
-import json
-
-import conz
+import os
+import sys
 
+from . import jsonutil
 from . import validator
+from .console import Console
+from .errors import error_code, flatten
+
+# Modules that are only needed by some of the functions, such as zipfile and
+# multiprocessing, are imported by those functions to keep startup fast
 
-cn = conz.Console()
+cn = Console()
 
 try:
     FILE_ERRORS = (IOError, OSError, FileNotFoundError)
 except NameError:
     FILE_ERRORS = (IOError, OSError,)
 
+PY3 = sys.version_info >= (3, 0, 0)
+if PY3:
+    FILE_OPTS = {'encoding': 'utf8'}
+else:
+    FILE_OPTS = {}
+
+METADATA_NAME = 'info.json'
+ZIP_EXT = '.zip'
+
+VALID = 'valid'
+INVALID = 'invalid'
+LOAD_ERROR = 'load_error'
+
+# Load error message for JSON documents that are not objects
+NOT_OBJECT = 'metadata is not a JSON object'
+
+FORMATS = ('text', 'json', 'junit')
+
+# Number of paths sent to a worker process at once
+CHUNKSIZE = 64
+
+
+def zip_member(zf, path):
+    """ Return name of the metadata member in an open ``ZipFile`` object
+
+    Content packages contain a directory named after the package ID, so
+    ``<id>/info.json`` is looked up first, followed by ``info.json`` in the
+    top-level directory. Only the central directory is consulted.
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    for member in (name + '/' + METADATA_NAME, METADATA_NAME):
+        try:
+            zf.getinfo(member)
+        except KeyError:
+            continue
+        return member
+    raise IOError('no {} in {}'.format(METADATA_NAME, path))
+
+
+def load_zip(path):
+    """ Load JSON data from the metadata member of a ZIP file
+
+    Only the metadata member is read and decompressed, regardless of how
+    many other files there are in the archive.
+    """
+    import zipfile
+
+    with zipfile.ZipFile(path, 'r') as zf:
+        data = zf.read(zip_member(zf, path))
+    return jsonutil.loads(data)
+
 
 def load(path):
-    """ Load JSON data from file """
-    with open(path, 'r') as f:
-        data = json.load(f)
-    return data
+    """ Load JSON data from file or content package ZIP file """
+    if path.lower().endswith(ZIP_EXT):
+        return load_zip(path)
+    return jsonutil.load_path(path)
 
 
-def validate_path(path):
+def check_path(path, loader=load):
+    """ Load and validate metadata file, and return the result
+
+    This function does not print anything, so it can be run in worker
+    processes. The return value is a ``(path, status, details)`` tuple. The
+    ``status`` is one of ``VALID``, ``INVALID``, and ``LOAD_ERROR``. For
+    invalid metadata, ``details`` is a list of ``(key, code, message)``
+    tuples, and for load errors it is the error message. JSON documents that
+    are not objects are reported as load errors.
+
+    The ``loader`` function is used to load the data from the path, and
+    defaults to ``load()``.
+    """
     path = path.strip()
     try:
-        data = load(path)
-    except FILE_ERRORS:
-        cn.pverr(path, 'file not found')
-        raise RuntimeError()
-    except ValueError:
-        cn.pverr(path, 'invalid JSON format')
+        data = loader(path)
+    except Exception as exc:
+        msg = load_error(exc)
+        if msg is None:
+            raise
+        return path, LOAD_ERROR, msg
+    if not isinstance(data, dict):
+        return path, LOAD_ERROR, NOT_OBJECT
+    return result(path, validator.validate(data))
+
+
+def validate_stream_path(path):
+    """ Validate metadata file or content package ZIP file incrementally
+
+    See ``validator.validate_stream()``. The metadata member of a ZIP file
+    is decompressed as it is decoded.
+    """
+    if not path.lower().endswith(ZIP_EXT):
+        with open(path, 'rb') as f:
+            return validator.validate_stream(f)
+    import zipfile
+
+    with zipfile.ZipFile(path, 'r') as zf:
+        with zf.open(zip_member(zf, path)) as f:
+            return validator.validate_stream(f)
+
+
+def check_stream_path(path):
+    """ Like ``check_path()``, but decode and validate metadata in one pass
+
+    Items of album and playlist arrays are validated as they are decoded
+    and are not kept, so memory use does not depend on their number.
+    """
+    path = path.strip()
+    try:
+        errors = validate_stream_path(path)
+    except TypeError:
+        # Raised by ``validator.validate_stream()`` for non-objects
+        return path, LOAD_ERROR, NOT_OBJECT
+    except Exception as exc:
+        msg = load_error(exc)
+        if msg is None:
+            raise
+        return path, LOAD_ERROR, msg
+    return result(path, errors)
+
+
+def load_error(exc):
+    """ Return message for an exception raised while loading metadata
+
+    Returns ``None`` for exceptions that are not caused by missing files,
+    invalid JSON, or invalid ZIP files.
+    """
+    if isinstance(exc, FILE_ERRORS):
+        return 'file not found'
+    if isinstance(exc, ValueError):
+        return 'invalid JSON format'
+    if is_bad_zip(exc):
+        return 'invalid ZIP file'
+    return None
+
+
+def is_bad_zip(exc):
+    """ Return whether exception is a ``zipfile.BadZipfile`` error """
+    # Without zipfile imported, no ZIP file could have been opened
+    zipfile = sys.modules.get('zipfile')
+    return zipfile is not None and isinstance(exc, zipfile.BadZipfile)
+
+
+def result(name, errors):
+    """ Return a result tuple for given validation errors
+
+    See ``check_path()`` for the format of the result.
+    """
+    if not errors:
+        return name, VALID, []
+    details = [(path, error_code(err), err.args[0])
+               for path, err in flatten(errors)]
+    return name, INVALID, details
+
+
+def check_ndjson(f, name):
+    """ Validate NDJSON stream in file object ``f`` and yield results
+
+    Each non-blank line is validated as one metadata document, and results
+    are yielded in the same format as those of ``check_path()`` with
+    ``<name>:<line number>`` in place of the path. Lines are read and
+    validated lazily, and each result is yielded before the next line is
+    read, so memory use does not depend on the stream length.
+    """
+    for lineno, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        rid = '{}:{}'.format(name, lineno)
+        try:
+            data = jsonutil.loads(line)
+        except ValueError:
+            yield rid, LOAD_ERROR, 'invalid JSON format'
+            continue
+        if not isinstance(data, dict):
+            yield rid, LOAD_ERROR, 'record is not a JSON object'
+            continue
+        yield result(rid, validator.validate(data))
+
+
+def check_ndjson_paths(paths):
+    """ Yield results of ``check_ndjson()`` for each of the NDJSON files """
+    for path in paths:
+        path = path.strip()
+        try:
+            with open(path, 'r', **FILE_OPTS) as f:
+                for r in check_ndjson(f, path):
+                    yield r
+        except FILE_ERRORS:
+            yield path, LOAD_ERROR, 'file not found'
+
+
+def report(result):
+    """ Print the result returned by ``check_path()``
+
+    Returns 0 for valid and 1 for invalid metadata. Raises ``RuntimeError``
+    if metadata could not be loaded.
+    """
+    path, status, details = result
+    if status == LOAD_ERROR:
+        cn.pverr(path, details)
         raise RuntimeError()
-    errors = validator.validate(data)
-    if errors:
+    if status == INVALID:
         cn.pstd(cn.color.red('{} ERR'.format(path)))
-        for key, err in sorted(errors.items(), key=lambda x: x[0]):
-            err, _ = err.args
-            if '\n' in err:
-                lines = err.strip().split('\n')
-                for l in lines:
-                    k, v = l.split(':')
-                    cn.pverb('{}: {}'.format(k, cn.color.red(v)))
-            else:
-                cn.pverb('{}: {}'.format(key, cn.color.red(err)))
+        for key, _, msg in details:
+            cn.pverb('{}: {}'.format(key, cn.color.red(msg)))
         return 1
     cn.pstd(cn.color.green('{} OK'.format(path)))
     return 0
 
 
+def format_json(result):
+    """ Return result as a single line of JSON """
+    path, status, details = result
+    obj = {'path': path, 'status': status}
+    if status == LOAD_ERROR:
+        obj['error'] = details
+    else:
+        obj['errors'] = [{'key': k, 'code': c, 'message': m}
+                         for k, c, m in details]
+    return jsonutil.dumps(obj, compact=True)
+
+
+def format_junit(results, name='metacheck'):
+    """ Return results as a JUnit XML document
+
+    Each checked file is a test case. Invalid metadata is reported as a test
+    failure with one line per error, and load errors are reported as test
+    errors.
+    """
+    from xml.sax.saxutils import escape, quoteattr
+
+    cases = []
+    failures = errors = 0
+    for path, status, details in results:
+        case = '  <testcase classname={} name={}'.format(
+            quoteattr(name), quoteattr(path))
+        if status == VALID:
+            cases.append(case + '/>')
+            continue
+        if status == LOAD_ERROR:
+            errors += 1
+            body = '    <error message={}/>'.format(quoteattr(details))
+        else:
+            failures += 1
+            text = '\n'.join('{}: {} [{}]'.format(k, m, c)
+                             for k, c, m in details)
+            body = '    <failure message={}>{}</failure>'.format(
+                quoteattr('{} errors'.format(len(details))), escape(text))
+        cases.append('\n'.join([case + '>', body, '  </testcase>']))
+    head = ('<testsuite name={} tests="{}" failures="{}" '
+            'errors="{}">').format(quoteattr(name), len(cases), failures,
+                                   errors)
+    lines = ['<?xml version="1.0" encoding="utf-8"?>', head]
+    return '\n'.join(lines + cases + ['</testsuite>'])
+
+
+def validate_path(path):
+    return report(check_path(path))
+
+
+def pmap(fn, items, jobs=1, initializer=None, initargs=()):
+    """ Return an iterator of ``fn`` applied to each of the items
+
+    When ``jobs`` is larger than 1, ``fn`` is applied in a pool of that many
+    worker processes, each set up by calling ``initializer`` with
+    ``initargs``. Results are always yielded in the order of ``items``.
+    """
+    if jobs <= 1:
+        for item in items:
+            yield fn(item)
+        return
+    import multiprocessing
+
+    pool = multiprocessing.Pool(jobs, initializer, initargs)
+    try:
+        for res in pool.imap(fn, items, chunksize=CHUNKSIZE):
+            yield res
+    finally:
+        pool.terminate()
+
+
+def check_paths(paths, jobs=1, cache=None):
+    """ Return an iterator of ``check_path()`` results for given paths
+
+    When ``jobs`` is larger than 1, paths are checked in a pool of that many
+    worker processes. Results are always yielded in the order of ``paths``.
+
+    If a ``cache.ResultCache`` object is passed as ``cache``, results for
+    unchanged files are taken from it.
+    """
+    if cache is not None:
+        return cache.check_paths(paths, jobs)
+    return pmap(check_path, paths, jobs)
+
+
 def main():
     from .argutil import getparser
 
     parser = getparser('Validate metadata file',
-                       usage='\n    %(prog)s [-h] [-V] PATH\n    '
-                       'PATH | %(prog)s [-h] [-V]')
+                       usage='\n    %(prog)s [-h] [-V] [-j N] PATH\n    '
+                       'PATH | %(prog)s [-h] [-V] [-j N]')
     parser.add_argument('paths', metavar='PATH', help='optional path to '
-                        'metadata file (defaults to info.json in current '
-                        'directory, ignored if used in a pipe)',
+                        'metadata file or content package ZIP file (defaults '
+                        'to info.json in current directory, ignored if used '
+                        'in a pipe)',
                         default=['./info.json'], nargs='*')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=1,
+                        help='number of worker processes (0 uses all CPUs, '
+                        'defaults to 1)')
+    parser.add_argument('--cache', metavar='PATH', default=None,
+                        help='cache results in a database at PATH and skip '
+                        'files that did not change since the last run')
+    parser.add_argument('--invalidate', action='store_true',
+                        help='discard all cached results before checking')
+    parser.add_argument('--format', '-f', choices=FORMATS, default='text',
+                        help='output format: colored text (default), one '
+                        'JSON object per line, or a JUnit XML report')
+    parser.add_argument('--ndjson', action='store_true',
+                        help='treat input as newline-delimited JSON with one '
+                        'metadata document per line (reads the stream from '
+                        'PATH arguments, or STDIN if used in a pipe)')
+    parser.add_argument('--stream', action='store_true',
+                        help='decode metadata incrementally and validate '
+                        'album and playlist items as they are read, so that '
+                        'memory use does not depend on their number')
+    parser.add_argument('--assets', action='store_true',
+                        help='also check that files referenced by metadata '
+                        'exist in the package directory or ZIP file (PATH '
+                        'may also be a package directory)')
+    parser.add_argument('--connect', metavar='SOCKET', default=None,
+                        help='check files using the validation server '
+                        'listening on SOCKET (see metaserver)')
+    parser.add_argument('--watch', metavar='DIR', default=None,
+                        help='keep watching DIR and check metadata files and '
+                        'ZIP files as they change (PATH arguments are '
+                        'ignored)')
+    parser.add_argument('--poll', action='store_true',
+                        help='with --watch, scan DIR for changes at regular '
+                        'intervals instead of using inotify')
     args = parser.parse_args()
 
+    if args.watch and (args.ndjson or args.connect or
+                       args.format == 'junit'):
+        parser.error('--watch cannot be used with --ndjson, --connect or '
+                     'junit format')
+    if args.assets and (args.cache or args.ndjson):
+        parser.error('--assets cannot be used with --cache or --ndjson')
+    if args.connect and (args.cache or args.ndjson or args.assets):
+        parser.error('--connect cannot be used with --cache, --ndjson or '
+                     '--assets')
+    if args.stream and (args.cache or args.ndjson or args.assets or
+                        args.connect):
+        parser.error('--stream cannot be used with --cache, --ndjson, '
+                     '--assets or --connect')
+
+    cache = None
+    if args.cache:
+        from .cache import ResultCache
+        cache = ResultCache(args.cache)
+        if args.invalidate:
+            cache.invalidate()
+
     if cn.interm:
         cn.verbose = True
         src = args.paths
-    else:
+    elif not args.watch:
         src = cn.readpipe()
 
-    for p in src:
-        try:
-            validate_path(p)
-        except RuntimeError:
-            cn.pstd(cn.color.red('{} ERR'.format(p)))
+    jobs = args.jobs
+    if not jobs:
+        import multiprocessing
+        jobs = multiprocessing.cpu_count()
+    if args.assets:
+        from .assets import check_path as check_assets
+
+        def check(paths):
+            return pmap(check_assets, paths, jobs)
+    elif args.stream:
+        def check(paths):
+            return pmap(check_stream_path, paths, jobs)
+    else:
+        def check(paths):
+            return check_paths(paths, jobs, cache)
+
+    if args.watch:
+        from .watch import watch
+        results = watch(args.watch, check, args.poll)
+    elif args.connect:
+        from .client import check_paths as check_remote
+        results = check_remote(args.connect, src)
+    elif args.ndjson:
+        if cn.interm:
+            results = check_ndjson_paths(src)
+        else:
+            results = check_ndjson(sys.stdin, '<stdin>')
+    else:
+        results = check(src)
+    try:
+        if args.format == 'json':
+            for res in results:
+                cn.pstd(format_json(res))
+        elif args.format == 'junit':
+            cn.pstd(format_junit(results))
+        else:
+            for res in results:
+                try:
+                    report(res)
+                except RuntimeError:
+                    cn.pstd(cn.color.red('{} ERR'.format(res[0])))
+    except KeyboardInterrupt:
+        if not args.watch:
+            raise
+    finally:
+        if cache:
+            cache.close()
 
 
 if __name__ == '__main__':
@@ -8,22 +8,71 @@ This software is free software licensed under the terms of GPLv3. See COPYING
 file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
-import validators
-
 from . import values
+from . import jsonstream
+from . import custom_validators
+from .compiler import compile_spec, compile_list_spec, compile_bulk_spec
+from .custom_validators import ITEM_LISTS, STREAMED
+from .errors import ContentError
+
+
+# Compiled validators keyed by the ``fail_fast`` flag
+VALIDATORS = {}
+
+# Compiled ``(bulk_check, items_validator)`` pairs keyed by content type
+ITEM_VALIDATORS = {}
+
+# Validators compiled for single keys of ``values.SPECS``, and for specs in
+# ``values.TYPE_SPECS``, used by ``validate_delta()``
+KEY_VALIDATORS = {}
+TYPE_VALIDATORS = {}
+
+
+def get_validator(fail_fast=False):
+    """ Return validator compiled from specs
+
+    Validators are compiled on first use rather than on import, so that
+    programs that import this module but validate nothing start quickly.
+    """
+    try:
+        return VALIDATORS[fail_fast]
+    except KeyError:
+        fn = compile_spec(values.SPECS, fail_fast=fail_fast)
+        return VALIDATORS.setdefault(fail_fast, fn)
+
+
+class LazyValidator(object):
+    """ Validator that is compiled when it is first used
+
+    Calls and attribute access, such as ``source``, are forwarded to the
+    validator returned by ``get_validator()``.
+    """
+
+    def __init__(self, fail_fast=False):
+        self.fail_fast = fail_fast
+
+    def __call__(self, data):
+        return get_validator(self.fail_fast)(data)
 
+    def __getattr__(self, name):
+        return getattr(get_validator(self.fail_fast), name)
 
-VALIDATOR = validators.spec_validator(
-    values.SPECS, key=lambda k: lambda obj: obj.get(k))
 
+# Compiled validators, kept for code that used them before ``get_validator()``
+VALIDATOR = LazyValidator()
+FAIL_FAST_VALIDATOR = LazyValidator(fail_fast=True)
 
-def validate(data, broadcast=False):
+
+def validate(data, broadcast=False, fail_fast=False):
     """ Validates data
 
     When ``broadcast`` flag is ``True``, then the placeholder value for
     ``broadcast`` is not allowed.
+
+    When ``fail_fast`` flag is ``True``, validation stops at the first error,
+    and the returned dict contains only that error.
     """
-    res = VALIDATOR(data)
+    res = get_validator(fail_fast)(data)
     if res:
         return res
     # Strict checking for broadcast
@@ -36,3 +85,271 @@ def validate(data, broadcast=False):
     if 'publisher' not in data:
         return {}
     return {}
+
+
+def is_valid(data, broadcast=False):
+    """ Return ``True`` if data is valid, ``False`` otherwise
+
+    This is the cheapest way to check metadata, as validation stops at the
+    first error and no error messages are formatted. A broadcast placeholder
+    makes the data invalid when ``broadcast`` flag is ``True``.
+    """
+    if get_validator(fail_fast=True)(data):
+        return False
+    return not (broadcast and data['broadcast'] == '$BROADCAST')
+
+
+def validate_many(records, broadcast=False):
+    """ Validate a stream of records and yield ``(id, errors)`` tuples
+
+    ``records`` is any iterable of ``(id, data)`` pairs, such as
+    ``enumerate(list_of_dicts)`` or a generator reading records from a
+    queue. Records are consumed one at a time and nothing is retained after
+    a record's errors are yielded, so arbitrarily long streams can be
+    validated in constant memory.
+
+    ``broadcast`` has the same meaning as in ``validate()``, but a placeholder
+    value is reported as an error for the ``broadcast`` key instead of
+    raising an exception, so that one record does not stop the stream.
+    """
+    validator = get_validator()
+    for rid, data in records:
+        errors = validator(data)
+        if not errors and broadcast and data['broadcast'] == '$BROADCAST':
+            errors = {'broadcast': ValueError(
+                'broadcast date cannot be a placeholder', 'broadcast_strict')}
+        yield rid, errors
+
+
+def get_item_validators(type_key):
+    """ Return bulk and list validators for items of given content type """
+    try:
+        return ITEM_VALIDATORS[type_key]
+    except KeyError:
+        spec = values.TYPE_SPECS[ITEM_LISTS[type_key][1]]
+        pair = (compile_bulk_spec(spec, values.SCANS),
+                compile_list_spec(spec, iterator=True))
+        return ITEM_VALIDATORS.setdefault(type_key, pair)
+
+
+def item_handler(type_key, found):
+    """ Return ``jsonstream`` handler that validates items of a content type
+
+    Errors are collected in ``found[type_key]`` as a ``(found, errors,
+    items)`` tuple like the one returned by ``custom_validators.take()``,
+    with 1-based item indices, so that no more than
+    ``custom_validators.MAX_LIST_ERRORS`` items are kept. If items cannot be
+    validated because they are not objects, the exception raised by the
+    validator is stored instead.
+    """
+    bulk_check, items_validator = get_item_validators(type_key)
+
+    def handle(items, start):
+        if not start:
+            # Only the last of duplicate keys is kept in the document
+            found[type_key] = ([], 0, 0)
+        if isinstance(found[type_key], Exception):
+            return
+        if bulk_check is not None and bulk_check(items):
+            return
+        kept, errors, invalid = found[type_key]
+        limit = custom_validators.MAX_LIST_ERRORS - len(kept)
+        results = ((start + i, e) for i, e in items_validator(items))
+        try:
+            more, more_errors, more_invalid = custom_validators.take(
+                results, max(limit, 0))
+        except AttributeError as exc:
+            found[type_key] = exc
+            return
+        kept.extend(more)
+        found[type_key] = (kept, errors + more_errors,
+                           invalid + more_invalid)
+
+    return handle
+
+
+def validate_stream(f, broadcast=False):
+    """ Validates data decoded incrementally from binary file ``f``
+
+    Returns the same errors as ``validate()`` returns for the whole
+    document, but items of audio playlists and image albums are validated
+    in batches as they are decoded, and are discarded afterwards. Memory use
+    therefore does not depend on the number of items. Raises ``ValueError``
+    if the file does not contain valid JSON, and for broadcast placeholders
+    as ``validate()`` does. Raises ``TypeError`` if the document is not a
+    JSON object.
+    """
+    found = {}
+    handlers = {('content', key, list_key): item_handler(key, found)
+                for key, (list_key, _) in ITEM_LISTS.items()}
+    data = jsonstream.load(f, handlers)
+    if not isinstance(data, dict):
+        raise TypeError('metadata is not a JSON object')
+    streamed = {}
+    for path in handlers:
+        items = data
+        for key in path:
+            items = items.get(key) if isinstance(items, dict) else None
+        type_key = path[1]
+        if type_key not in found or type(items) is not list:
+            continue
+        result = found[type_key]
+        if isinstance(result, Exception):
+            # Like ``validate()``, fail on items that are not objects only
+            # if the rest of the content type is valid, as items are not
+            # validated otherwise
+            if not get_type_validator(type_key)(data['content'][type_key]):
+                raise result
+            result = ([], 0, 0)
+        streamed[id(items)] = result
+    STREAMED.update(streamed)
+    try:
+        return validate(data, broadcast)
+    finally:
+        for key in streamed:
+            del STREAMED[key]
+
+
+def get_key_validator(key):
+    """ Return validator compiled for a single key of ``values.SPECS`` """
+    try:
+        return KEY_VALIDATORS[key]
+    except KeyError:
+        fn = compile_spec({key: values.SPECS[key]}, name='key_validator')
+        return KEY_VALIDATORS.setdefault(key, fn)
+
+
+def get_type_validator(spec_key):
+    """ Return validator compiled from a spec in ``values.TYPE_SPECS`` """
+    try:
+        return TYPE_VALIDATORS[spec_key]
+    except KeyError:
+        fn = compile_spec(values.TYPE_SPECS[spec_key],
+                          name=spec_key.replace('.', '_'))
+        return TYPE_VALIDATORS.setdefault(spec_key, fn)
+
+
+def parse_item_path(path):
+    """ Return ``(type_key, index)`` for a ``content.<type>.<index>`` path
+
+    Returns ``None`` for other paths.
+    """
+    parts = path.split('.')
+    if (len(parts) != 3 or parts[0] != 'content' or
+            parts[1] not in ITEM_LISTS or not parts[2].isdigit()):
+        return None
+    return parts[1], int(parts[2])
+
+
+def replace_items(content, items):
+    """ Return copy of ``content`` with items replaced
+
+    ``items`` maps ``(type_key, index)`` tuples to new items. Only the
+    containers on the path to each replaced item are copied.
+    """
+    content = dict(content)
+    for (type_key, index), item in items.items():
+        list_key = ITEM_LISTS[type_key][0]
+        value = content[type_key] = dict(content[type_key])
+        value[list_key] = list(value[list_key])
+        value[list_key][index - 1] = item
+    return content
+
+
+def update_item_errors(content, pairs, type_key, index, item):
+    """ Return content error pairs updated for a replaced item
+
+    ``pairs`` is the list of ``(path, error)`` pairs of the content error
+    for ``content``, or an empty list if there is none. ``None`` is returned
+    when the new pairs cannot be derived from the old ones, because some
+    errors were suppressed, or because the new errors would exceed the
+    limits in ``custom_validators``.
+    """
+    for key in content:
+        if (key not in values.TYPE_SPECS or
+                type(content[key]) is not dict):
+            return None
+    prefix = 'content.{}.'.format(type_key)
+    item_prefix = '{}{}.'.format(prefix, index)
+    groups = {}
+    for path, err in pairs:
+        key = path.split('.', 2)[1]
+        if path.endswith('.suppressed'):
+            return None
+        groups.setdefault(key, []).append((path, err))
+    group = groups.get(type_key, [])
+    if any(not p[len(prefix):].split('.', 1)[0].isdigit() for p, _ in group):
+        # Item errors are not reported when the type spec is not satisfied
+        return pairs
+    validator = get_type_validator(ITEM_LISTS[type_key][1])
+    new = [(item_prefix + k, e) for k, e in validator(item).items()]
+    old_items = set(p[len(prefix):].split('.', 1)[0] for p, _ in group)
+    if new and str(index) not in old_items:
+        # Count invalid items reported for the whole document
+        reported = set(tuple(p.split('.')[1:3]) for p, _ in pairs)
+        reported = [r for r in reported if r[1].isdigit()]
+        if (len(old_items) >= custom_validators.MAX_LIST_ERRORS or
+                len(reported) >= custom_validators.MAX_DOCUMENT_ERRORS):
+            return None
+    kept = [(p, e) for p, e in group if not p.startswith(item_prefix)]
+    before = [(p, e) for p, e in kept
+              if int(p[len(prefix):].split('.', 1)[0]) < index]
+    groups[type_key] = before + new + kept[len(before):]
+    return [pair for key in content for pair in groups.get(key, [])]
+
+
+def validate_delta(old_data, changes, errors=None):
+    """ Validates data after changes, reusing the errors of the old data
+
+    ``changes`` maps top-level keys to their new values, with ``None``
+    standing for a removed key. A key in ``content.<type>.<index>`` format,
+    where index is 1-based as in error paths, replaces the item with that
+    index in the audio playlist or image album. ``errors`` are the errors
+    returned by ``validate()`` for ``old_data``, and are computed if not
+    given. Neither ``old_data`` nor ``errors`` is modified.
+
+    Returns the same errors as ``validate()`` returns for the changed data.
+    Only rules of the changed keys are run, and replacing an item only
+    validates that item, so the cost does not depend on the size of the
+    rest of the document.
+    """
+    if errors is None:
+        errors = validate(old_data)
+    errors = dict(errors)
+    items = {}
+    for key, value in changes.items():
+        item = parse_item_path(key)
+        if item is not None:
+            items[item] = value
+            continue
+        if key not in values.SPECS:
+            continue
+        errors.pop(key, None)
+        errors.update(get_key_validator(key)({key: value}))
+    if items:
+        if 'content' in changes:
+            raise ValueError('content items cannot be changed along with '
+                             'content')
+        content = old_data.get('content')
+        err = errors.get('content')
+        if err is None or isinstance(err, ContentError):
+            pairs = err.errors if err is not None else []
+            for (type_key, index), item in sorted(items.items()):
+                list_key = ITEM_LISTS[type_key][0]
+                if not 1 <= index <= len(content[type_key][list_key]):
+                    raise IndexError('no item {} in {}'.format(index,
+                                                                list_key))
+                if pairs is None:
+                    continue
+                pairs = update_item_errors(content, pairs, type_key, index,
+                                           item)
+            if pairs is None:
+                errors.pop('content', None)
+                errors.update(get_key_validator('content')(
+                    {'content': replace_items(content, items)}))
+            elif pairs:
+                errors['content'] = ContentError(pairs)
+            else:
+                errors.pop('content', None)
+    # Keys are kept in the order of the specs, as in ``validate()``
+    return {key: errors[key] for key in values.SPECS if key in errors}
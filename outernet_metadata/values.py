@@ -11,8 +11,15 @@ file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 import re
 import sys
 
+try:
+    from types import MappingProxyType
+except ImportError:
+    # Python 2 has no read-only mappings, so defaults are plain dicts
+    MappingProxyType = dict
+
 import validators as v
 from .custom_validators import content_type
+from .timeutil import DATE_FMT, TS_FMT
 
 
 PY3 = sys.version_info >= (3, 0, 0)
@@ -27,8 +34,24 @@ LOCALE_RE = re.compile(r'^[a-z]{2}([_-][a-zA-Z]+)?$', re.I)
 COMMASEP_RE = re.compile(r'^[\w ]+(?:, ?[\w ]+)*$', re.U)
 RELPATH_RE = re.compile(r'^[^/]+(/[^/]+)*$')
 SIZE_RE = re.compile(r'\d+x\d+')
-TS_FMT = '%Y-%m-%d %H:%M:%S UTC'
-DATE_FMT = '%Y-%m-%d'
+
+
+def relpaths_valid(paths):
+    """ Return ``True`` if all strings in ``paths`` match ``RELPATH_RE``
+
+    A path matches unless it is empty, starts or ends with a slash, or has
+    consecutive slashes, so all paths are checked with a few substring
+    searches in one joined string. Paths that contain the NUL character used
+    to join them may be reported as invalid even if they match.
+    """
+    joined = '\0' + '\0'.join(paths) + '\0'
+    return not ('\0\0' in joined or '\0/' in joined or '/\0' in joined or
+                '//' in joined)
+
+
+# Functions that check lists of strings against regular expressions in bulk
+SCANS = {RELPATH_RE: relpaths_valid}
+
 LICENSES = ('CC-BY', 'CC-BY-ND', 'CC-BY-NC', 'CC-BY-ND-NC', 'CC-BY-SA',
             'CC-BY-NC-SA', 'GFDL', 'OPL', 'OCL', 'ADL', 'FAL', 'PD', 'OF',
             'ARL', 'ON')
@@ -78,7 +101,28 @@ OPTIONAL = (
 
 KEYS = REQUIRED + OPTIONAL
 
-DEFAULTS = {
+
+def freeze(value):
+    """ Return read-only view of dicts in ``value``, nested ones included """
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    return value
+
+
+def thaw(value):
+    """ Return a new dict for a value returned by ``freeze()``
+
+    Other values are returned as is.
+    """
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    return value
+
+
+# Default values of optional keys. The mapping and the dicts in it are
+# read-only, so that the defaults cannot be changed through documents they
+# were put in. Use ``thaw()`` or ``normalize()`` to get values for documents.
+DEFAULTS = freeze({
     'archive': 'core',
     'index': 'index.html',
     'is_partner': False,
@@ -87,8 +131,8 @@ DEFAULTS = {
     'language': '',
     'multipage': False,
     'publisher': '',
-    'content': { 'html': {} },
-}
+    'content': {'html': {}},
+})
 
 TYPE_SPECS = {
     'html': {
@@ -153,5 +197,35 @@ SPECS = {
     'thumbnail': [v.optional(''), v.match(RELPATH_RE)],
     'cover': [v.optional(''), v.match(RELPATH_RE)],
     'content': [v.optional(), v.nonempty, v.istype(dict),
-                content_type(TYPE_SPECS)],
+                content_type(TYPE_SPECS, scans=SCANS)],
 }
+
+# Keys that are deprecated, and only kept in metadata if given
+DEPRECATED = [k for k, spec in SPECS.items() if v.deprecated in spec]
+
+# Keys whose defaults are filled in by ``normalize()``. The ``content``
+# default has no ``main`` file, so it would make valid metadata invalid.
+NORMALIZED = [k for k in DEFAULTS if k not in DEPRECATED and k != 'content']
+
+
+def normalize(data):
+    """ Return metadata with defaults of missing optional keys filled in
+
+    Only keys listed in ``NORMALIZED`` are filled in, so deprecated keys and
+    ``content`` are left out, and valid metadata stays valid.
+
+    Nothing is copied if no key is missing, and ``data`` itself is returned.
+    Otherwise the result is a shallow copy of ``data`` that shares its
+    values. ``data`` is never modified, so this is cheap enough to apply to
+    every record of a long stream.
+    """
+    for key in NORMALIZED:
+        if key not in data:
+            break
+    else:
+        return data
+    data = dict(data)
+    for key in NORMALIZED:
+        if key not in data:
+            data[key] = thaw(DEFAULTS[key])
+    return data
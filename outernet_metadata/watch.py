@@ -0,0 +1,236 @@
+"""
+Watch directory trees for changed metadata files
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import time
+import select
+import struct
+
+from . import pathutil
+from .validate import METADATA_NAME, ZIP_EXT
+
+# Seconds a file must stay unchanged before it is checked
+DEBOUNCE = 0.5
+
+# Seconds between scans of the tree when polling
+POLL_INTERVAL = 2.0
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+EVENT = struct.Struct('iIII')
+
+try:
+    fsdecode = os.fsdecode
+except AttributeError:
+    # Python 2 uses byte strings for file names
+    def fsdecode(name):
+        return name
+
+
+def is_target(name):
+    """ Return whether file name is a metadata file or package ZIP file """
+    return name == METADATA_NAME or name.lower().endswith(ZIP_EXT)
+
+
+def targets(path):
+    """ Return list of metadata and ZIP files below ``path`` """
+    found = []
+    for entry in pathutil.scan(path):
+        if not is_target(entry.name):
+            continue
+        try:
+            if entry.is_file():
+                found.append(entry.path)
+        except OSError:
+            continue
+    return found
+
+
+def load_inotify():
+    """ Return libc object with inotify functions, or ``None`` """
+    try:
+        import ctypes
+        import ctypes.util
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        libc.inotify_init
+        libc.inotify_add_watch
+    except (ImportError, OSError, AttributeError):
+        return None
+    return libc
+
+
+class PollWatcher(object):
+    """ Finds changed files by scanning the tree at regular intervals
+
+    Files are compared by size and mtime. Removed files are not reported.
+    """
+
+    def __init__(self, root, interval=POLL_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.stamps = self.scan()
+        self.last = time.time()
+
+    def scan(self):
+        stamps = {}
+        for path in targets(self.root):
+            try:
+                stamps[path] = pathutil.stamp(path)
+            except OSError:
+                continue
+        return stamps
+
+    def read(self, timeout):
+        """ Return list of files that changed, waiting up to ``timeout`` """
+        wait = self.last + self.interval - time.time()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        time.sleep(max(0, wait))
+        self.last = time.time()
+        stamps = self.scan()
+        changed = [p for p, st in stamps.items() if self.stamps.get(p) != st]
+        self.stamps = stamps
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """ Finds changed files using the Linux inotify API
+
+    Every directory in the tree is watched, including directories created
+    after the watcher was set up. A file is reported when it is closed after
+    writing, or moved into the tree. If the kernel event queue overflows,
+    all files in the tree are reported.
+    """
+
+    def __init__(self, root, libc):
+        self.root = root
+        self.libc = libc
+        self.fd = libc.inotify_init()
+        if self.fd < 0:
+            import ctypes
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.dirs = {}
+        self.add_tree(root)
+
+    def add_dir(self, path):
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(path) if hasattr(os, 'fsencode') else path,
+            IN_MASK)
+        if wd >= 0:
+            self.dirs[wd] = path
+
+    def add_tree(self, path):
+        """ Watch ``path`` and directories below it """
+        self.add_dir(path)
+        for entry in pathutil.scan(path):
+            if pathutil.is_dir(entry, False):
+                self.add_dir(entry.path)
+
+    def events(self, data):
+        """ Yield ``(wd, mask, name)`` for events in buffer ``data`` """
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, size = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + size].rstrip(b'\0')
+            offset += size
+            yield wd, mask, fsdecode(name)
+
+    def read(self, timeout):
+        """ Return list of files that changed, waiting up to ``timeout`` """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        changed = []
+        for wd, mask, name in self.events(os.read(self.fd, 64 * 1024)):
+            if mask & IN_Q_OVERFLOW:
+                return targets(self.root)
+            if mask & IN_IGNORED:
+                self.dirs.pop(wd, None)
+                continue
+            if wd not in self.dirs:
+                continue
+            path = os.path.join(self.dirs[wd], name)
+            if mask & IN_ISDIR:
+                # Files may have been created before the watch was added
+                self.add_tree(path)
+                changed.extend(targets(path))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO) and is_target(name):
+                changed.append(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def watcher(root, poll=False, interval=POLL_INTERVAL):
+    """ Return inotify watcher for ``root``, or a polling one
+
+    Polling is used if ``poll`` is ``True``, or if inotify is not available.
+    """
+    libc = None if poll else load_inotify()
+    if libc is not None:
+        try:
+            return InotifyWatcher(root, libc)
+        except OSError:
+            pass
+    return PollWatcher(root, interval)
+
+
+def debounce(w, delay=DEBOUNCE):
+    """ Yield lists of changed files once they stop changing
+
+    A file is yielded after no changes were seen for it for ``delay``
+    seconds, so a burst of writes to the same file results in a single
+    check.
+    """
+    pending = {}
+    while True:
+        timeout = delay
+        if pending:
+            timeout = max(0, min(pending.values()) + delay - time.time())
+        for path in w.read(timeout):
+            pending[path] = time.time()
+        now = time.time()
+        ready = sorted(p for p, t in pending.items() if now - t >= delay)
+        if not ready:
+            continue
+        for p in ready:
+            del pending[p]
+        yield ready
+
+
+def watch(root, check, poll=False, delay=DEBOUNCE):
+    """ Watch ``root`` and yield results of checking changed files
+
+    ``check`` is a function that takes a list of paths and returns an
+    iterable of results, such as ``validate.check_paths()``. It is called
+    with each list of files yielded by ``debounce()``, so results are
+    yielded as files change. Runs until interrupted.
+    """
+    w = watcher(root, poll)
+    try:
+        for paths in debounce(w, delay):
+            for res in check(paths):
+                yield res
+    finally:
+        w.close()
@@ -8,6 +8,11 @@ from setuptools.command.test import test as TestCommand
 SCRIPTDIR = os.path.dirname(__file__) or '.'
 PY3 = sys.version_info >= (3, 0, 0)
 
+# The validation server uses asyncio features added in Python 3.7
+SERVER_SCRIPTS = []
+if sys.version_info >= (3, 7):
+    SERVER_SCRIPTS.append('metaserver = outernet_metadata.server:main')
+
 from outernet_metadata import __version__
 
 
@@ -50,19 +55,25 @@ setup(
     license='GPLv3',
     keywords='json, validation, templates, metadata, outernet',
     url='https://github.com/Outernet-Project/bottle-fdsend',
-    packages=find_packages(),
+    packages=find_packages(exclude=['tests', 'benchmarks']),
     long_description=read('README.rst'),
     install_requires=[
         'chainable-validators>=0.7',
+        'scandir; python_version < "3.5"',
+        'futures; python_version < "3"',
     ],
     extras_require={
         'command line tools':  ['conz>=0.5'],
+        'fast JSON': ['orjson'],
     },
     entry_points={
         'console_scripts': [
             'metacheck = outernet_metadata.validate:main',
             'metagen = outernet_metadata.template:main',
-        ],
+            'imgcount = outernet_metadata.imgcount:main',
+            'metaindex = outernet_metadata.library:main',
+            'metareplaces = outernet_metadata.replaces:main',
+        ] + SERVER_SCRIPTS,
     },
     classifiers=[
         'Development Status :: 4 - Beta',
@@ -0,0 +1,150 @@
+"""
+Tests for outernet_metadata.assets module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import json
+import zipfile
+
+import outernet_metadata.assets as mod
+import outernet_metadata.validate as validate
+
+
+META = {
+    'title': 'Foo',
+    'url': 'outernet://foo.bar/',
+    'timestamp': '2015-04-29 13:22:00 UTC',
+    'broadcast': '2015-04-29',
+    'license': 'CC-BY',
+    'thumbnail': 'thumb.png',
+    'content': {
+        'image': {
+            'album': [
+                {'file': 'img/a.jpg', 'thumbnail': 'img/t/a.jpg'},
+                {'file': 'img/./b.jpg'},
+                {'file': 'img/c.jpg'},
+            ],
+        },
+    },
+}
+
+FILES = ['thumb.png', 'img/a.jpg', 'img/t/a.jpg', 'img/b.jpg']
+
+
+def test_references():
+    """
+    Given metadata with relative and absolute paths, when listing its
+    references, then each relative path is yielded with its key, and absolute
+    paths are skipped.
+    """
+    data = dict(META, cover='/abs.png')
+    data['content'] = dict(META['content'], html={'main': 'index.html'})
+    assert sorted(mod.references(data)) == [
+        ('content.html.main', 'index.html'),
+        ('content.image.1.file', 'img/a.jpg'),
+        ('content.image.1.thumbnail', 'img/t/a.jpg'),
+        ('content.image.2.file', 'img/./b.jpg'),
+        ('content.image.3.file', 'img/c.jpg'),
+        ('thumbnail', 'thumb.png'),
+    ]
+
+
+def test_references_bad_structure():
+    """
+    Given metadata whose content, item lists or items have the wrong type, when
+    listing its references, then nothing is yielded for them.
+    """
+    assert list(mod.references(None)) == []
+    assert list(mod.references({'content': []})) == []
+    assert list(mod.references({'content': {'image': {'album': 1}}})) == []
+    assert list(mod.references(
+        {'content': {'audio': {'playlist': [1, {'file': 2}]}}})) == []
+
+
+def test_check_path_dir(tmp_path):
+    """
+    Given a metadata file in a package directory with one referenced file
+    missing, when calling check_path(), then the missing file is reported as an
+    error.
+    """
+    for p in FILES:
+        path = tmp_path.joinpath(*p.split('/'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+    path = tmp_path / 'info.json'
+    path.write_text(json.dumps(META))
+    assert mod.check_path(str(path)) == (
+        str(path), validate.INVALID,
+        [('content.image.3.file', mod.MISSING,
+          'file img/c.jpg not found in package')])
+
+
+def test_check_path_package_dir(tmp_path):
+    """
+    Given a package directory, when calling check_path() with its path, then
+    metadata is loaded from info.json in it and the result is reported for
+    the directory path.
+    """
+    for p in FILES + ['img/c.jpg']:
+        path = tmp_path.joinpath(*p.split('/'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+    (tmp_path / 'info.json').write_text(json.dumps(META))
+    assert mod.check_path(str(tmp_path)) == (str(tmp_path), validate.VALID,
+                                             [])
+    empty = tmp_path / 'empty'
+    empty.mkdir()
+    assert mod.check_path(str(empty)) == (str(empty), validate.LOAD_ERROR,
+                                          'file not found')
+
+
+def test_check_path_zip(tmp_path):
+    """
+    Given a package ZIP file with all referenced files in the package
+    directory, when calling check_path(), then the metadata is valid.
+    """
+    path = str(tmp_path / 'pkg.zip')
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('pkg/info.json', json.dumps(META))
+        for p in FILES + ['img/c.jpg']:
+            zf.writestr('pkg/' + p, '')
+        zf.writestr('thumb.png', '')
+    assert mod.check_path(path) == (path, validate.VALID, [])
+
+
+def test_check_path_zip_prefix(tmp_path):
+    """
+    Given a package ZIP file with a referenced file outside of the package
+    directory, when calling check_path(), then the file is reported as missing.
+    """
+    path = str(tmp_path / 'pkg.zip')
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('pkg/info.json', json.dumps(META))
+        zf.writestr('thumb.png', '')
+    _, status, details = mod.check_path(path)
+    assert status == validate.INVALID
+    assert [d[0] for d in details][0] == 'thumbnail'
+
+
+def test_check_path_invalid_and_load_errors(tmp_path):
+    """
+    Given invalid metadata with missing files and a missing metadata file, when
+    calling check_path(), then validation errors are reported before missing
+    files, and a load error is reported for the missing metadata file.
+    """
+    data = dict(META, license='foo', content={'html': {'main': 'x.html'}})
+    path = tmp_path / 'info.json'
+    path.write_text(json.dumps(data))
+    _, status, details = mod.check_path(str(path))
+    assert status == validate.INVALID
+    assert [(k, c) for k, c, _ in details] == [
+        ('license', 'isin'), ('thumbnail', mod.MISSING),
+        ('content.html.main', mod.MISSING)]
+    missing = str(tmp_path / 'missing.json')
+    assert mod.check_path(missing) == (missing, validate.LOAD_ERROR,
+                                       'file not found')
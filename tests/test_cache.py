@@ -0,0 +1,109 @@
+"""
+Tests for outernet_metadata.cache module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import json
+
+import pytest
+
+import outernet_metadata.cache as mod
+import outernet_metadata.validate as validate
+
+
+VALID = {
+    'title': 'Foo',
+    'url': 'outernet://foo.bar/',
+    'timestamp': '2015-04-29 13:22:00 UTC',
+    'broadcast': '2015-04-29',
+    'license': 'CC-BY',
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = mod.ResultCache(str(tmp_path / 'cache.db'))
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def meta(tmp_path):
+    path = tmp_path / 'info.json'
+    path.write_text(json.dumps(dict(VALID, title='')))
+    return str(path)
+
+
+def test_unchanged_file_not_read(cache, meta, monkeypatch):
+    """
+    Given a file that was checked before, when checking it again without
+    changes, then the stored result is returned without reading the file.
+    """
+    first = cache.check(meta)
+    monkeypatch.setattr(mod, 'fingerprint', None)
+    assert cache.check(meta) == first
+    assert first[1] == validate.INVALID
+
+
+def test_touched_file_not_parsed(cache, meta, monkeypatch):
+    """
+    Given a file that was checked before, when its mtime changes but not its
+    contents, then the stored result is returned without parsing the file.
+    """
+    first = cache.check(meta)
+    os.utime(meta, (0, 0))
+    monkeypatch.setattr(validate, 'check_path', None)
+    assert cache.check(meta) == first
+
+
+def test_changed_file_revalidated(cache, meta):
+    """
+    Given a file that was checked before, when its contents change, then it
+    is validated again.
+    """
+    cache.check(meta)
+    with open(meta, 'w') as f:
+        json.dump(VALID, f)
+    os.utime(meta, (0, 0))
+    assert cache.check(meta)[1] == validate.VALID
+
+
+def test_invalidate(cache, meta):
+    """
+    Given a cache with stored results, when invalidating it, then no results
+    are stored.
+    """
+    cache.check(meta)
+    cache.invalidate()
+    assert cache.get(meta) is None
+
+
+def test_evict(cache, meta, tmp_path):
+    """
+    Given a cache limited to one entry, when evicting entries, then only the
+    most recently stored one remains.
+    """
+    other = tmp_path / 'other.json'
+    other.write_text(json.dumps(VALID))
+    cache.check(meta)
+    cache.check(str(other))
+    cache.max_entries = 1
+    cache.evict()
+    assert cache.get(meta) is None
+    assert cache.get(str(other)) is not None
+
+
+def test_check_paths_parallel(cache, meta):
+    """
+    Given paths, when checking them with multiple jobs, then results are
+    stored in the cache by the calling process.
+    """
+    ret = list(cache.check_paths([meta, meta], jobs=2))
+    assert [r[1] for r in ret] == [validate.INVALID] * 2
+    assert cache.get(meta)[3] == validate.INVALID
@@ -0,0 +1,207 @@
+"""
+Tests for outernet_metadata.compiler module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import re
+import random
+
+import pytest
+import validators as v
+
+import outernet_metadata.compiler as mod
+
+from outernet_metadata import values
+
+
+def interpreted(spec):
+    return v.spec_validator(spec, key=lambda k: lambda obj: obj.get(k))
+
+
+def errors_repr(errors):
+    return {k: e.args for k, e in errors.items()}
+
+
+VALID = {
+    'title': 'Foo',
+    'url': 'outernet://foo.bar/',
+    'timestamp': '2015-04-29 13:22:00 UTC',
+    'broadcast': '2015-04-29',
+    'license': 'CC-BY',
+    'archive': 'core',
+    'keywords': 'foo,bar',
+    'language': 'en',
+    'publisher': 'foo',
+    'is_partner': False,
+    'is_sponsored': False,
+    'replaces': '6a5afe56ad3d69f2c5a715deda4e32c9',
+    'thumbnail': 'thumb.png',
+    'cover': 'cover.jpg',
+    'content': {'html': {'main': 'index.html'}},
+}
+
+
+@pytest.mark.parametrize('changes', [
+    {},
+    {'title': ''},
+    {'title': None},
+    {'url': 'foo'},
+    {'url': 12},
+    {'timestamp': '2015-04-29'},
+    {'broadcast': '$BROADCAST'},
+    {'broadcast': 'tomorrow'},
+    {'broadcast': '12'},
+    {'license': 'foo'},
+    {'language': ''},
+    {'language': 'foo_bar'},
+    {'keywords': []},
+    {'archive': {}},
+    {'is_partner': 'yes'},
+    {'replaces': 'foo'},
+    {'thumbnail': '/foo.png'},
+    {'cover': 3},
+    {'content': {}},
+    {'content': []},
+    {'content': {'foo': {}}},
+    {'content': {'html': {}}},
+    {'index': 'index.html', 'images': 3, 'multipage': False},
+])
+def test_compiled_spec_matches_interpreted(changes):
+    """
+    Given metadata, when validating it with the compiled spec and the
+    interpreted spec, then both return the same error dict.
+    """
+    data = dict(VALID, **changes)
+    data = {k: val for k, val in data.items() if val is not None}
+    compiled = mod.compile_spec(values.SPECS)
+    expected = interpreted(values.SPECS)(data)
+    assert errors_repr(compiled(data)) == errors_repr(expected)
+
+
+@pytest.mark.parametrize('rules,value', [
+    ([v.required, v.istype(int), v.gte(1)], 0),
+    ([v.required, v.istype(int), v.lte(1)], 2),
+    ([v.optional(), v.instanceof(str)], 1),
+    ([v.required, v.min_len()], []),
+    ([v.required, v.boolean], 'foo'),
+    ([v.OR(v.match(re.compile('a')), v.match(re.compile('b')))], 'c'),
+    ([v.OR(v.match(re.compile('a')), v.match(re.compile('b')))], 'b'),
+    ([v.NOT(v.nonempty)], 'foo'),
+])
+def test_compiled_rules_match_interpreted(rules, value):
+    """
+    Given a spec using various built-in validators, when validating a value
+    with compiled and interpreted spec, then both return the same errors.
+    """
+    spec = {'foo': rules}
+    data = {'foo': value}
+    expected = interpreted(spec)(data)
+    assert errors_repr(mod.compile_spec(spec)(data)) == errors_repr(expected)
+
+
+def test_unknown_validator_is_called():
+    """
+    Given a spec with a custom chainable validator, when validating a value,
+    then the custom validator is called with the value.
+    """
+    @v.chainable
+    def custom(val):
+        raise ValueError('custom error', 'custom')
+    fn = mod.compile_spec({'foo': [v.required, custom]})
+    errors = fn({'foo': 'bar'})
+    assert errors['foo'].args == ('custom error', 'custom')
+
+
+def test_compile_list_spec():
+    """
+    Given a list of objects, when validating them with a compiled list spec,
+    then errors are returned with 1-based indices of the invalid objects.
+    """
+    spec = {'file': [v.required, v.match(values.RELPATH_RE)]}
+    fn = mod.compile_list_spec(spec)
+    items = [{'file': 'a'}, {}, {'file': 'b'}, {'file': '/c'}]
+    expected = interpreted(spec)
+    ret = fn(items)
+    assert [i for i, _ in ret] == [2, 4]
+    for i, errors in ret:
+        assert errors_repr(errors) == errors_repr(expected(items[i - 1]))
+
+
+def test_compile_spec_fail_fast():
+    """
+    Given data with several invalid keys, when validating it with a spec
+    compiled in fail-fast mode, then only the first error is returned.
+    """
+    spec = {'foo': [v.required], 'bar': [v.required]}
+    assert len(mod.compile_spec(spec)({})) == 2
+    assert list(mod.compile_spec(spec, fail_fast=True)({})) == ['foo']
+
+
+def test_relpaths_valid_same_as_regex():
+    """
+    Given strings made of path characters, when checking them in bulk, then
+    they are accepted only if they all match the relative path pattern.
+    """
+    rnd = random.Random(0)
+    for _ in range(5000):
+        path = ''.join(rnd.choice('a/\n.') for _ in range(rnd.randint(0, 5)))
+        expected = bool(values.RELPATH_RE.match(path))
+        assert values.relpaths_valid(['x', path, 'y/z']) == expected, path
+
+
+@pytest.mark.parametrize('spec_key', ['image.album', 'audio.playlist'])
+def test_compile_bulk_spec(spec_key):
+    """
+    Given random lists of items, when checking them with a bulk spec, then
+    the check passes only for lists without errors.
+    """
+    rnd = random.Random(0)
+    spec = values.TYPE_SPECS[spec_key]
+    fn = mod.compile_bulk_spec(spec, values.SCANS)
+    list_fn = mod.compile_list_spec(spec)
+    choices = {
+        'file': [None, 'a.jpg', 'a/b.jpg', '/a.jpg', 'a//b', '', 3],
+        'title': [None, None, 'foo', 1],
+        'duration': [None, 1, 300, 0, True, 1.5, '2'],
+        'size': [None, '10x10', '10x10px', 'x10'],
+        'caption': [None, 'foo', b'foo'],
+    }
+    passed = 0
+    for _ in range(2000):
+        items = []
+        for _ in range(rnd.randint(0, 4)):
+            item = {k: rnd.choice(c) for k, c in choices.items()}
+            items.append({k: val for k, val in item.items()
+                          if val is not None})
+        if fn(items):
+            passed += 1
+            assert list_fn(items) == []
+        else:
+            assert list_fn(items) != []
+    assert passed
+
+
+def test_compile_bulk_spec_unsupported():
+    """
+    Given a spec with a validator that cannot be checked in bulk, when
+    compiling it, then None is returned.
+    """
+    assert mod.compile_bulk_spec({'foo': [v.required, v.nonempty]}) is None
+
+
+def test_compile_list_spec_iterator():
+    """
+    Given a list spec compiled as an iterator, when validating objects, then
+    the same results are yielded lazily.
+    """
+    spec = {'file': [v.required, v.match(values.RELPATH_RE)]}
+    fn = mod.compile_list_spec(spec, iterator=True)
+    items = [{'file': 'a'}, {}, {'file': '/c'}]
+    ret = fn(items)
+    assert next(ret)[0] == 2
+    assert [i for i, _ in ret] == [3]
@@ -0,0 +1,24 @@
+"""
+Tests for benchmarks.corpus module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import pytest
+
+import benchmarks.corpus as mod
+from outernet_metadata import validator
+
+
+@pytest.mark.parametrize('invalid,expected', [(0.0, True), (1.0, False)])
+def test_generate_invalid_ratio(invalid, expected):
+    """
+    Given an invalid ratio of 0 or 1, when generating a corpus, then all
+    records are valid or all are invalid, respectively.
+    """
+    records = mod.generate(200, invalid=invalid, large=0.0)
+    assert all(validator.is_valid(r) is expected for r in records)
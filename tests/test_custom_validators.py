@@ -0,0 +1,105 @@
+"""
+Tests for outernet_metadata.custom_validators module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import pytest
+
+import outernet_metadata.custom_validators as mod
+
+from outernet_metadata.values import TYPE_SPECS
+
+
+def content_errors(content):
+    with pytest.raises(ValueError) as exc:
+        mod.content_type(TYPE_SPECS)(content)
+    msg, code = exc.value.args
+    assert code == 'content_type'
+    return sorted(msg.strip().split('\n'))
+
+
+def test_valid_content():
+    """
+    Given valid content dict, when validating it, then it is returned as is.
+    """
+    content = {'html': {'main': 'index.html'},
+               'image': {'album': [{'file': 'a.jpg'}, {'file': 'b.jpg'}]}}
+    assert mod.content_type(TYPE_SPECS)(content) is content
+
+
+def test_invalid_type_spec():
+    """
+    Given content dict with invalid type-specific keys, when validating it,
+    then errors are reported under the content type key.
+    """
+    assert content_errors({'html': {'main': '/index.html'}}) == [
+        'content.html.main: value does not match the expected format']
+
+
+def test_invalid_album_items():
+    """
+    Given an image album with invalid items, when validating it, then errors
+    for each item are reported under 1-based item indices.
+    """
+    album = [{'file': 'a.jpg'}, {'file': '/b.jpg'}, {'size': '1x1'}]
+    assert content_errors({'image': {'album': album}}) == [
+        'content.image.2.file: value does not match the expected format',
+        'content.image.3.file: value is required',
+    ]
+
+
+def test_invalid_playlist_items():
+    """
+    Given an audio playlist with invalid items, when validating it, then
+    errors for each item are reported under 1-based item indices.
+    """
+    playlist = [{'file': 'a.mp3', 'duration': 0}]
+    assert content_errors({'audio': {'playlist': playlist}}) == [
+        'content.audio.1.duration: value must be greater than 1']
+
+
+def test_item_errors_are_capped(monkeypatch):
+    """
+    Given an album with more invalid items than the limit, when validating
+    it, then errors of the first items are reported, followed by a count of
+    the suppressed errors.
+    """
+    monkeypatch.setattr(mod, 'MAX_LIST_ERRORS', 2)
+    album = [{'file': '/a.jpg'}] * 5 + [{'size': 1}] * 5
+    assert content_errors({'image': {'album': album}}) == [
+        'content.image.1.file: value does not match the expected format',
+        'content.image.2.file: value does not match the expected format',
+        'content.image.suppressed: 13 more errors in 8 items were not '
+        'reported',
+    ]
+
+
+def test_document_errors_are_capped(monkeypatch):
+    """
+    Given several item lists with invalid items, when validating them, then
+    the number of invalid items reported for the document is limited.
+    """
+    monkeypatch.setattr(mod, 'MAX_DOCUMENT_ERRORS', 3)
+    content = {'image': {'album': [{'file': '/a.jpg'}] * 2},
+               'audio': {'playlist': [{'file': '/a.mp3'}] * 2}}
+    errors = content_errors(content)
+    assert len(errors) == 4
+    assert sum('suppressed' in e for e in errors) == 1
+    assert '1 more errors in 1 items' in [e for e in errors
+                                          if 'suppressed' in e][0]
+
+
+def test_take():
+    """
+    Given an iterator of results, when calling take(), then the first
+    results are returned with counts of errors and items in the rest.
+    """
+    results = ((i, {'a': 1, 'b': 2}) for i in range(5))
+    found, errors, items = mod.take(results, 2)
+    assert [i for i, _ in found] == [0, 1]
+    assert (errors, items) == (6, 3)
@@ -0,0 +1,56 @@
+"""
+Tests for outernet_metadata.errors module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import pickle
+
+import outernet_metadata.errors as mod
+
+
+class Param(object):
+    formatted = False
+
+    def __format__(self, spec):
+        Param.formatted = True
+        return 'param'
+
+
+def test_message_is_lazy():
+    """
+    Given a validation error, when it is created, then its message is not
+    formatted until it is accessed.
+    """
+    err = mod.ValidationError('value is {}', 'foo', (Param(),))
+    assert not Param.formatted
+    assert err.args == ('value is param', 'foo')
+    assert Param.formatted
+
+
+def test_error_pickles():
+    """
+    Given a validation error, when pickling and unpickling it, then it has the
+    same message and code.
+    """
+    err = mod.ValidationError('value is {}', 'foo', (1,))
+    assert pickle.loads(pickle.dumps(err)).args == err.args
+
+
+def test_flatten():
+    """
+    Given errors dict with nested content errors, when flattening it, then
+    nested errors are yielded in place of the content key.
+    """
+    nested = mod.ContentError([
+        ('content.html.main', mod.ValidationError('bad: main', 'match'))])
+    errors = {'title': ValueError('empty', 'nonempty'), 'content': nested}
+    ret = [(p, mod.error_code(e), e.args[0])
+           for p, e in mod.flatten(errors)]
+    assert ret == [('content.html.main', 'match', 'bad: main'),
+                   ('title', 'nonempty', 'empty')]
+    assert nested.args == ('\ncontent.html.main: bad: main', 'content_type')
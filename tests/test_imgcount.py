@@ -0,0 +1,134 @@
+"""
+Tests for outernet_metadata.imgcount module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import zipfile
+
+import pytest
+
+import outernet_metadata.imgcount as mod
+
+
+@pytest.fixture
+def package(tmp_path):
+    for p in ['a/b/c.jpg', 'a/b/d.JPG', 'a/e.png', 'f.gif', 'g/h/i/j.svg',
+              'g/k.html']:
+        path = tmp_path.joinpath(*p.split('/'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+    return str(tmp_path)
+
+
+def test_count_dir(package):
+    """
+    Given a package directory with nested assets, when counting them, then
+    files are counted by lowercase extension.
+    """
+    counts = mod.AssetCounter().count(package)
+    assert counts == {'.jpg': 2, '.png': 1, '.gif': 1, '.svg': 1,
+                      '.html': 1}
+
+
+def test_count_zip(tmp_path):
+    """
+    Given a content package ZIP file, when counting its assets, then member
+    files are counted by lowercase extension and directories are skipped.
+    """
+    path = str(tmp_path / 'pkg.zip')
+    with zipfile.ZipFile(path, 'w') as zf:
+        zf.writestr('pkg/', '')
+        zf.writestr('pkg/a.jpg', '')
+        zf.writestr('pkg/img/b.PNG', '')
+        zf.writestr('pkg/info.json', '{}')
+    counts = mod.AssetCounter().count(path)
+    assert counts == {'.jpg': 1, '.png': 1, '.json': 1}
+
+
+def test_count_missing_or_bad(tmp_path):
+    """
+    Given a missing path and a file that is not a valid ZIP file, when counting
+    assets, then empty counts are returned.
+    """
+    bad = tmp_path / 'bad.zip'
+    bad.write_text('not a zip')
+    counter = mod.AssetCounter()
+    assert counter.count(str(tmp_path / 'missing')) == {}
+    assert counter.count(str(bad)) == {}
+
+
+def test_cache_reused(package, monkeypatch):
+    """
+    Given a directory that was already counted, when counting it again without
+    changes, then the cached counts are used and no directory is scanned.
+    """
+    counter = mod.AssetCounter()
+    counter.count(package)
+    calls = []
+    orig = mod.scan_dir
+    monkeypatch.setattr(mod, 'scan_dir', lambda p: calls.append(p) or orig(p))
+    assert counter.count(package)['.jpg'] == 2
+    assert calls == []
+
+
+def test_cache_invalidated_by_dir_change(package):
+    """
+    Given a counted directory, when a file is added to a subdirectory, then
+    counting it again picks up the new file.
+    """
+    counter = mod.AssetCounter()
+    counter.count(package)
+    subdir = os.path.join(package, 'a', 'b')
+    path = os.path.join(subdir, 'new.jpg')
+    open(path, 'w').close()
+    # Make sure the mtime differs on file systems with coarse timestamps
+    st = os.stat(subdir)
+    os.utime(subdir, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    assert counter.count(package)['.jpg'] == 3
+
+
+def test_count_many_keeps_order(tmp_path):
+    """
+    Given a number of packages, when counting them with multiple jobs, then
+    results are yielded in the order of the paths.
+    """
+    paths = []
+    for n in range(10):
+        d = tmp_path / str(n)
+        d.mkdir()
+        for i in range(n):
+            (d / '{}.png'.format(i)).write_text('')
+        paths.append(str(d))
+    ret = list(mod.AssetCounter().count_many(reversed(paths), jobs=4))
+    assert [p for p, _ in ret] == paths[::-1]
+    assert [c['.png'] for _, c in ret] == list(range(10))[::-1]
+
+
+def test_cache_file_roundtrip(package, tmp_path):
+    """
+    Given a populated cache, when saving and loading it, then the loaded cache
+    is equal and can be used for counting.
+    """
+    path = str(tmp_path / 'cache.json')
+    counter = mod.AssetCounter()
+    counter.count(package)
+    mod.save_cache(path, counter.cache)
+    assert mod.load_cache(path) == counter.cache
+    assert mod.AssetCounter(mod.load_cache(path)).count(package)['.jpg'] == 2
+
+
+def test_load_cache_missing_or_stale(tmp_path):
+    """
+    Given a missing cache file and one in an old format, when loading the
+    cache, then an empty cache is returned.
+    """
+    path = tmp_path / 'cache.json'
+    assert mod.load_cache(str(path)) == {}
+    path.write_text('{"format": 0, "entries": {"x": 1}}')
+    assert mod.load_cache(str(path)) == {}
@@ -0,0 +1,126 @@
+"""
+Tests for outernet_metadata.jsonstream module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import io
+import json
+
+import pytest
+
+import outernet_metadata.jsonstream as mod
+
+
+DOC = {
+    'title': u'Föö ☃',
+    'size': 1234567,
+    'ratio': -1.5e10,
+    'flags': [True, False, None],
+    'content': {
+        'image': {'album': [{'file': 'a{}.jpg'.format(i), 'n': i}
+                            for i in range(10)]},
+        'html': {'main': 'index.html'},
+    },
+}
+
+
+def load(text, handlers=None, chunk_size=3, batch_size=4):
+    reader = mod.Reader(io.BytesIO(text.encode('utf8')), chunk_size)
+    handlers = handlers or {}
+    prefixes = set(p[:i] for p in handlers for i in range(len(p)))
+    doc = mod.decode(reader, (), handlers, prefixes, batch_size)
+    if reader.peek():
+        raise ValueError('Extra data')
+    return doc
+
+
+@pytest.mark.parametrize('indent', [None, 2])
+def test_load_without_handlers(indent):
+    """
+    Given a document read in small chunks, when decoding it, then the result
+    is the same as that of json.loads().
+    """
+    text = json.dumps(DOC, indent=indent, ensure_ascii=False)
+    assert load(text) == json.loads(text)
+
+
+def test_load_streams_arrays():
+    """
+    Given a handler for an array path, when decoding a document, then array
+    items are passed to the handler in batches, and the array is replaced
+    with a list of its first item.
+    """
+    batches = []
+    path = ('content', 'image', 'album')
+    doc = load(json.dumps(DOC), {path: lambda b, s: batches.append((s, b))})
+    album = DOC['content']['image']['album']
+    assert doc['content']['image']['album'] == album[:1]
+    assert [s for s, _ in batches] == [0, 4, 8]
+    assert sum((b for _, b in batches), []) == album
+    assert doc['content']['html'] == DOC['content']['html']
+
+
+def test_load_empty_and_other_arrays():
+    """
+    Given a handler for a path whose value is an empty array or not an
+    array, when decoding, then the handler is not called.
+    """
+    calls = []
+    handlers = {('a',): calls.append, ('b', 'c'): calls.append}
+    assert load('{"a": [], "b": {"c": 1}}', handlers) == {
+        'a': [], 'b': {'c': 1}}
+    assert calls == []
+
+
+@pytest.mark.parametrize('text', [
+    '', '{', '{"a": 1', '{"a" 1}', '{"a": 1,}', '[1, 2', '{"a": [1, 2}',
+    '{"a": 1} 2', '{1: 2}', '{"a": tru}',
+])
+def test_load_invalid(text):
+    """
+    Given invalid JSON, when decoding it, then ValueError is raised.
+    """
+    handlers = {('a',): lambda b, s: None}
+    with pytest.raises(ValueError):
+        load(text, handlers)
+
+
+def test_load_file():
+    """
+    Given a binary file, when calling load(), then the document is decoded
+    and streamed arrays are passed to handlers.
+    """
+    items = []
+    f = io.BytesIO(json.dumps({'a': list(range(1000))}).encode('utf8'))
+    doc = mod.load(f, {('a',): lambda b, s: items.extend(b)})
+    assert doc == {'a': [0]}
+    assert items == list(range(1000))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 5, 7])
+def test_load_values_split_across_chunks(chunk_size):
+    """
+    Given literals, escapes and numbers that may be split between chunks,
+    when decoding, then the result is the same as that of json.loads().
+    """
+    text = ('{"a": [-Infinity, NaN, true, null, -12.5e-3], '
+            '"b": "\\ud83d\\ude00\\u00e9\\n", "c": {"d": "' + 'x' * 50 + '"}}')
+    assert load(text, chunk_size=chunk_size) == json.loads(text)
+
+
+def test_load_invalid_stops_reading():
+    """
+    Given malformed data followed by a long array, when decoding, then
+    ValueError is raised without reading the rest of the file.
+    """
+    text = '{"x": {"y": 1 "z": 2}, "a": [' + ', '.join(['1'] * 10000) + ']}'
+    f = io.BytesIO(text.encode('utf8'))
+    reader = mod.Reader(f, chunk_size=64)
+    with pytest.raises(ValueError):
+        mod.decode(reader, (), {('a',): lambda b, s: None}, {()}, 4)
+    assert f.tell() < 1024
@@ -0,0 +1,63 @@
+"""
+Tests for outernet_metadata.jsonutil module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import pytest
+
+import outernet_metadata.jsonutil as mod
+
+
+@pytest.fixture(params=[name for name, _ in mod.BACKENDS])
+def backend(request):
+    try:
+        mod.use(request.param)
+    except ImportError:
+        pytest.skip('{} is not installed'.format(request.param))
+    yield request.param
+    mod.use()
+
+
+@pytest.mark.parametrize('data', [
+    b'{"foo": "\xc5\xa1"}',
+    u'{"foo": "š"}',
+])
+def test_loads(backend, data):
+    """
+    Given JSON as bytes or text, when decoding it with any backend, then the
+    decoded object is returned.
+    """
+    assert mod.loads(data) == {'foo': u'š'}
+
+
+def test_loads_invalid(backend):
+    """
+    Given invalid JSON, when decoding it with any backend, then ValueError is
+    raised.
+    """
+    with pytest.raises(ValueError):
+        mod.loads(b'{')
+
+
+def test_dumps_compact(backend):
+    """
+    Given an object, when encoding it in compact mode with any backend, then
+    the output has sorted keys and decodes to the same object.
+    """
+    obj = {'b': [1, 2], 'a': {'c': True}}
+    out = mod.dumps(obj, compact=True)
+    assert out.index('"a"') < out.index('"b"')
+    assert mod.loads(out) == obj
+
+
+def test_dumps_pretty():
+    """
+    Given an object, when encoding it in default mode, then the output is
+    indented with sorted keys.
+    """
+    assert mod.dumps({'b': 1, 'a': 2}) == '{\n    "a": 2,\n    "b": 1\n}'
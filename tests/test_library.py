@@ -0,0 +1,182 @@
+"""
+Tests for outernet_metadata.library module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import json
+
+import pytest
+
+import outernet_metadata.library as mod
+from outernet_metadata.template import md5
+
+
+def meta(n, **kwargs):
+    data = {
+        'title': 'Package {}'.format(n),
+        'url': 'http://example.com/{}'.format(n),
+        'timestamp': '2015-04-{:02} 13:22:00 UTC'.format(n),
+        'broadcast': '2015-05-{:02}'.format(n),
+        'license': 'CC-BY',
+        'content': {'html': {'main': 'index.html'}},
+    }
+    data.update(kwargs)
+    return data
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+@pytest.fixture
+def index(tmp_path):
+    idx = mod.LibraryIndex(str(tmp_path / 'library.db'))
+    yield idx
+    idx.close()
+
+
+@pytest.fixture
+def library(tmp_path):
+    return [
+        write(tmp_path, '1.json', meta(1)),
+        write(tmp_path, '2.json', meta(2, license='GFDL',
+                                       content={'video': {'main': 'v.mp4'}})),
+        write(tmp_path, '3.json', meta(3, broadcast='$BROADCAST',
+                                       content={'video': {'main': 'v.mp4'},
+                                                'generic': {}})),
+        write(tmp_path, '4.json', meta(4, license='foo')),
+    ]
+
+
+def test_update_statuses(index, library, tmp_path):
+    """
+    Given valid, invalid and missing metadata files, when updating the index,
+    then each file is reported with its status and only valid metadata is
+    stored.
+    """
+    missing = str(tmp_path / 'missing.json')
+    ret = dict(index.update(library + [missing]))
+    assert [ret[p] for p in library] == [mod.ADDED] * 3 + [mod.INVALID]
+    assert ret[missing] == mod.REMOVED
+    assert index.get(md5('http://example.com/2'))['license'] == 'GFDL'
+    assert index.get(md5('http://example.com/4')) is None
+
+
+def test_update_non_object(index, library, tmp_path):
+    """
+    Given a metadata file that is not a JSON object among valid files, when
+    updating the index, then it is reported as invalid and the other files
+    are added.
+    """
+    bad = write(tmp_path, 'bad.json', [meta(5)])
+    ret = dict(index.update([bad] + library[:1]))
+    assert ret == {bad: mod.INVALID, library[0]: mod.ADDED}
+
+
+def test_update_incremental(index, library, monkeypatch):
+    """
+    Given an up to date index, when updating it again, then unchanged files are
+    not loaded, and a changed file is loaded and its row replaced.
+    """
+    list(index.update(library))
+    loaded = []
+    orig = mod.load_entry
+    monkeypatch.setattr(mod, 'load_entry',
+                        lambda p: loaded.append(p) or orig(p))
+    assert set(s for _, s in index.update(library)) == set([mod.UNCHANGED])
+    assert loaded == []
+    with open(library[0], 'w') as f:
+        json.dump(meta(1, license='GFDL', title='Changed title'), f)
+    st = os.stat(library[0])
+    os.utime(library[0], ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    ret = dict(index.update(library))
+    assert loaded == [library[0]]
+    assert ret[library[0]] == mod.ADDED
+    assert index.find(license='GFDL', content_type='html') == [
+        (md5('http://example.com/1'), library[0], 'Changed title')]
+
+
+def test_find(index, library):
+    """
+    Given an updated index, when searching by license, content type and date
+    ranges, then matching packages are returned, newest first.
+    """
+    list(index.update(library))
+    ids = lambda **kw: [r[0] for r in index.find(**kw)]
+    one, two, three = [md5('http://example.com/{}'.format(n))
+                       for n in (1, 2, 3)]
+    assert ids() == [three, two, one]
+    assert ids(license='CC-BY') == [three, one]
+    assert ids(content_type='video') == [three, two]
+    assert ids(content_type='video', license='CC-BY') == [three]
+    assert ids(since='2015-04-02 00:00:00 UTC') == [three, two]
+    assert ids(until='2015-04-02 13:22:00 UTC') == [one]
+    # Placeholders are not matched by broadcast date lookups
+    assert ids(broadcast_since='2015-05-01') == [two, one]
+    assert ids(broadcast_until='2015-05-02') == [one]
+    with pytest.raises(TypeError):
+        index.find(foo='bar')
+
+
+def test_find_lenient_dates(index, tmp_path):
+    """
+    Given packages with unpadded dates, when searching by date ranges, then
+    they are compared by date rather than as text.
+    """
+    sep = write(tmp_path, 'sep.json', meta(
+        1, timestamp='2015-9-30 0:0:0 utc', broadcast='2015-9- 1'))
+    octo = write(tmp_path, 'oct.json', meta(
+        2, timestamp='2015-10-01  00:00:00 UTC', broadcast='2015-10-01'))
+    list(index.update([sep, octo]))
+    ids = lambda **kw: [r[2] for r in index.find(**kw)]
+    assert ids(since='2015-10-01 00:00:00 UTC') == ['Package 2']
+    assert ids(since='2015-09-01 00:00:00 UTC',
+               until='2015-10-01 00:00:00 UTC') == ['Package 1']
+    assert ids(until='2015-10-1 0:0:0 UTC') == ['Package 1']
+    assert ids(broadcast_until='2015-09-02') == ['Package 1']
+    with pytest.raises(ValueError):
+        index.find(since='yesterday')
+
+
+def test_removed_and_prune(index, library):
+    """
+    Given indexed files that were deleted, when updating with one of them and
+    pruning, then both are removed from the index.
+    """
+    list(index.update(library))
+    os.remove(library[0])
+    os.remove(library[1])
+    assert dict(index.update(library[:1])) == {library[0]: mod.REMOVED}
+    assert index.prune() == [library[1]]
+    assert [r[1] for r in index.find()] == [library[2]]
+
+
+def test_same_url_in_two_files(index, tmp_path):
+    """
+    Given two files with the same URL, when indexing them and removing the
+    first one, then the package from the second file is kept.
+    """
+    first = write(tmp_path, 'a.json', meta(1))
+    second = write(tmp_path, 'b.json', meta(1, title='Copy'))
+    list(index.update([first, second]))
+    assert index.find() == [(md5('http://example.com/1'), second, 'Copy')]
+    os.remove(first)
+    index.prune()
+    assert index.find() == [(md5('http://example.com/1'), second, 'Copy')]
+
+
+def test_update_parallel(index, library):
+    """
+    Given a number of metadata files, when updating the index with multiple
+    jobs, then the statuses are the same as for a serial update.
+    """
+    assert dict(index.update(library, jobs=2)) == dict(
+        zip(library, [mod.ADDED] * 3 + [mod.INVALID]))
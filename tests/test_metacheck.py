@@ -0,0 +1,253 @@
+"""
+Tests for outernet_metadata.validate module (metacheck command)
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import json
+import zipfile
+
+import outernet_metadata.validate as mod
+
+
+VALID = {
+    'title': 'Foo',
+    'url': 'outernet://foo.bar/',
+    'timestamp': '2015-04-29 13:22:00 UTC',
+    'broadcast': '2015-04-29',
+    'license': 'CC-BY',
+}
+
+
+def write_meta(path, data):
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+def test_check_path_valid(tmp_path):
+    """
+    Given a path to valid metadata, when calling check_path(), then it returns
+    a result with valid status.
+    """
+    path = write_meta(tmp_path / 'info.json', VALID)
+    assert mod.check_path(path + '\n') == (path, mod.VALID, [])
+
+
+def test_check_path_invalid(tmp_path):
+    """
+    Given a path to invalid metadata, when calling check_path(), then it
+    returns a result with invalid status and a list of errors.
+    """
+    path = write_meta(tmp_path / 'info.json', dict(VALID, title=''))
+    p, status, details = mod.check_path(path)
+    assert status == mod.INVALID
+    assert [(k, c) for k, c, _ in details] == [('title', 'nonempty')]
+
+
+def test_check_path_nested_errors(tmp_path):
+    """
+    Given metadata with invalid content type keys, when calling check_path(),
+    then nested errors are reported under their full key path.
+    """
+    content = {'video': {'main': 'video.mp4', 'size': 'a:b'},
+               'image': {'album': [{'file': 'a:b.jpg', 'size': '1:2'}]}}
+    path = write_meta(tmp_path / 'info.json', dict(VALID, content=content))
+    _, status, details = mod.check_path(path)
+    assert status == mod.INVALID
+    assert [(k, c) for k, c, _ in details] == [
+        ('content.video.size', 'match'),
+        ('content.image.1.size', 'match'),
+    ]
+
+
+def test_check_path_load_errors(tmp_path):
+    """
+    Given paths to missing file and file with bad JSON, when calling
+    check_path(), then it returns results with load error status.
+    """
+    bad = tmp_path / 'bad.json'
+    bad.write_text('{')
+    missing = str(tmp_path / 'missing.json')
+    assert mod.check_path(str(bad)) == (str(bad), mod.LOAD_ERROR,
+                                        'invalid JSON format')
+    assert mod.check_path(missing) == (missing, mod.LOAD_ERROR,
+                                       'file not found')
+
+
+def test_check_paths_parallel_order(tmp_path):
+    """
+    Given a number of paths, when calling check_paths() with multiple jobs,
+    then results are returned in the same order as the paths.
+    """
+    paths = []
+    for i in range(50):
+        data = dict(VALID, title='' if i % 3 else 'Foo')
+        paths.append(write_meta(tmp_path / '{}.json'.format(i), data))
+    serial = list(mod.check_paths(paths))
+    parallel = list(mod.check_paths(paths, jobs=3))
+    assert [r[0] for r in parallel] == paths
+    assert parallel == serial
+
+
+def test_check_paths_non_objects(tmp_path):
+    """
+    Given files with JSON documents that are not objects among valid files,
+    when calling check_paths() serially and with multiple jobs, then they
+    are reported as load errors and the other files are checked.
+    """
+    paths = []
+    for i, doc in enumerate([VALID, [], 'x', 1, VALID]):
+        paths.append(write_meta(tmp_path / '{}.json'.format(i), doc))
+    expected = [(paths[0], mod.VALID, [])]
+    expected += [(p, mod.LOAD_ERROR, mod.NOT_OBJECT) for p in paths[1:4]]
+    expected += [(paths[4], mod.VALID, [])]
+    assert list(mod.check_paths(paths)) == expected
+    assert list(mod.check_paths(paths, jobs=2)) == expected
+    assert [mod.check_stream_path(p) for p in paths] == expected
+
+
+def write_zip(path, members):
+    with zipfile.ZipFile(str(path), 'w') as zf:
+        for name, content in members.items():
+            zf.writestr(name, content)
+    return str(path)
+
+
+def test_load_zip(tmp_path):
+    """
+    Given a content package ZIP file, when calling load(), then metadata is
+    loaded from the info.json in the package directory.
+    """
+    pkgid = '3bd97bbcb5a13980be4b7ed301b46810'
+    path = write_zip(tmp_path / (pkgid + '.zip'), {
+        pkgid + '/index.html': '<html></html>',
+        pkgid + '/info.json': json.dumps(VALID),
+    })
+    assert mod.load(path) == VALID
+
+
+def test_load_zip_top_level(tmp_path):
+    """
+    Given a ZIP file with info.json at the top level, when calling load(),
+    then metadata is loaded from it.
+    """
+    path = write_zip(tmp_path / 'foo.zip', {'info.json': json.dumps(VALID)})
+    assert mod.load(path) == VALID
+
+
+def test_check_path_zip_errors(tmp_path):
+    """
+    Given ZIP files without metadata or with invalid format, when calling
+    check_path(), then it returns results with load error status.
+    """
+    empty = write_zip(tmp_path / 'empty.zip', {'index.html': ''})
+    bad = tmp_path / 'bad.zip'
+    bad.write_text('foo')
+    assert mod.check_path(empty)[1:] == (mod.LOAD_ERROR, 'file not found')
+    assert mod.check_path(str(bad))[1:] == (mod.LOAD_ERROR,
+                                            'invalid ZIP file')
+
+
+def test_check_ndjson():
+    """
+    Given an NDJSON stream with valid, invalid and malformed records, when
+    calling check_ndjson(), then results are yielded in stream order with
+    line numbers as record IDs.
+    """
+    lines = [json.dumps(VALID), '', '{', json.dumps(dict(VALID, title=''))]
+    ret = list(mod.check_ndjson(iter(lines), 'foo'))
+    assert [(r[0], r[1]) for r in ret] == [
+        ('foo:1', mod.VALID),
+        ('foo:3', mod.LOAD_ERROR),
+        ('foo:4', mod.INVALID),
+    ]
+
+
+def test_check_ndjson_non_objects():
+    """
+    Given an NDJSON stream with records that are not JSON objects, when
+    calling check_ndjson(), then they are reported as load errors and the
+    rest of the stream is checked.
+    """
+    lines = ['[1, 2]', '3', json.dumps(VALID)]
+    assert list(mod.check_ndjson(iter(lines), 'foo')) == [
+        ('foo:1', mod.LOAD_ERROR, 'record is not a JSON object'),
+        ('foo:2', mod.LOAD_ERROR, 'record is not a JSON object'),
+        ('foo:3', mod.VALID, []),
+    ]
+
+
+def test_check_ndjson_yields_load_errors_early():
+    """
+    Given an NDJSON stream with a run of malformed lines, when iterating
+    over check_ndjson(), then each load error is yielded before the next
+    line is read.
+    """
+    read = []
+
+    def lines():
+        for i in range(1000):
+            read.append(i)
+            yield '{'
+        yield json.dumps(VALID)
+
+    ret = mod.check_ndjson(lines(), 'foo')
+    assert next(ret) == ('foo:1', mod.LOAD_ERROR, 'invalid JSON format')
+    assert next(ret)[0] == 'foo:2'
+    assert read == [0, 1]
+
+
+def test_format_json():
+    """
+    Given check results, when formatting them as JSON, then each result is
+    one line of JSON with structured errors.
+    """
+    res = ('foo.json', mod.INVALID, [('title', 'nonempty', 'msg')])
+    line = mod.format_json(res)
+    assert '\n' not in line
+    assert json.loads(line) == {
+        'path': 'foo.json', 'status': mod.INVALID,
+        'errors': [{'key': 'title', 'code': 'nonempty', 'message': 'msg'}]}
+
+
+def test_format_junit():
+    """
+    Given check results, when formatting them as JUnit XML, then each result
+    is a test case, with failures for invalid and errors for unreadable
+    files.
+    """
+    import xml.etree.ElementTree as ET
+    results = [
+        ('a.json', mod.VALID, []),
+        ('b.json', mod.INVALID, [('title', 'nonempty', 'a <b>')]),
+        ('c.json', mod.LOAD_ERROR, 'file not found'),
+    ]
+    suite = ET.fromstring(mod.format_junit(iter(results)))
+    assert suite.attrib['tests'] == '3'
+    assert suite.attrib['failures'] == '1'
+    assert suite.attrib['errors'] == '1'
+    cases = suite.findall('testcase')
+    assert [c.attrib['name'] for c in cases] == ['a.json', 'b.json', 'c.json']
+    assert cases[1].find('failure').text == 'title: a <b> [nonempty]'
+
+
+def test_check_stream_path(tmp_path):
+    """
+    Given metadata files and ZIP files, when calling check_stream_path(),
+    then it returns the same results as check_path().
+    """
+    album = [{'file': 'a.jpg'}] * 500 + [{'file': '/b.jpg'}]
+    data = dict(VALID, content={'image': {'album': album}})
+    path = write_meta(tmp_path / 'info.json', data)
+    zpath = str(tmp_path / 'pkg.zip')
+    with zipfile.ZipFile(zpath, 'w') as zf:
+        zf.writestr('pkg/info.json', json.dumps(data))
+    bad = tmp_path / 'bad.json'
+    bad.write_text('{"title": ')
+    for p in (path, zpath, str(bad), str(tmp_path / 'missing.json')):
+        assert mod.check_stream_path(p) == mod.check_path(p)
+    assert mod.check_stream_path(path)[2][0][0] == 'content.image.501.file'
@@ -0,0 +1,113 @@
+"""
+Tests for outernet_metadata.pathutil module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import sys
+
+import pytest
+
+import outernet_metadata.pathutil as mod
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for p in ['a/b/c.jpg', 'a/b/d.txt', 'a/e.png', 'f.gif', 'g/h/i/j.svg',
+              'g/k.html']:
+        path = tmp_path.joinpath(*p.split('/'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('')
+    (tmp_path / 'empty').mkdir()
+    return str(tmp_path)
+
+
+def walk_paths(root):
+    paths = set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in dirnames + filenames:
+            paths.add(os.path.join(dirpath, name))
+    return paths
+
+
+@pytest.mark.parametrize('threads', [0, 4])
+def test_scan(tree, threads):
+    """
+    Given a directory tree, when scanning it, then entries for all files and
+    directories below the root are yielded.
+    """
+    ret = [e.path for e in mod.scan(tree, threads=threads)]
+    assert len(ret) == len(set(ret))
+    assert set(ret) == walk_paths(tree)
+
+
+def test_scan_top_down(tree):
+    """
+    Given a directory tree, when scanning it, then each directory is yielded
+    before its contents.
+    """
+    ret = [e.path for e in mod.scan(tree)]
+    for p in ret:
+        parent = os.path.dirname(p)
+        if parent != tree:
+            assert ret.index(parent) < ret.index(p)
+
+
+def test_scan_deep_tree(tmp_path):
+    """
+    Given a directory tree deeper than the recursion limit, when scanning it,
+    then all directories are yielded.
+    """
+    depth = 200
+    os.makedirs(os.path.join(str(tmp_path), *['d'] * depth))
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(100)
+    try:
+        count = sum(1 for _ in mod.scan(str(tmp_path)))
+    finally:
+        sys.setrecursionlimit(limit)
+    assert count == depth
+
+
+def test_scan_missing_path(tmp_path):
+    """
+    Given a path that does not exist, when scanning it, then nothing is
+    yielded.
+    """
+    assert list(mod.scan(str(tmp_path / 'missing'))) == []
+
+
+def test_fnwalk(tree):
+    """
+    Given a directory tree, when walking it with a match function, then
+    paths that match are yielded, including the root.
+    """
+    ret = list(mod.fnwalk(tree, lambda p: not p.endswith('.txt')))
+    expected = walk_paths(tree) | {tree}
+    assert set(ret) == expected - {os.path.join(tree, 'a/b/d.txt')}
+    assert ret[0] == tree
+
+
+@pytest.mark.parametrize('threads', [0, 2])
+def test_extwalk(tree, threads):
+    """
+    Given a directory tree, when walking it for given extensions, then only
+    files with matching extensions are yielded.
+    """
+    ret = mod.extwalk(tree, exts=['.jpg', '.png'], threads=threads)
+    assert sorted(os.path.relpath(p, tree) for p in ret) == [
+        'a/b/c.jpg', 'a/e.png']
+
+
+def test_extcount(tree):
+    """
+    Given a directory tree, when counting files with image extensions, then
+    the number of image files is returned.
+    """
+    assert mod.extcount(tree) == 4
+    assert mod.extcount(os.path.join(tree, 'f.gif')) == 1
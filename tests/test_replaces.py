@@ -0,0 +1,92 @@
+"""
+Tests for outernet_metadata.replaces module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import json
+
+import outernet_metadata.replaces as mod
+from outernet_metadata.template import md5
+
+
+def graph(edges):
+    g = mod.ReplacesGraph()
+    for id, replaces in edges:
+        g.add(id, replaces)
+    return g
+
+
+def test_chains_and_heads():
+    """
+    Given packages that form replacement chains, when querying the graph, then
+    heads are reported with their roots and chain lengths, and replaced IDs
+    that are not known are reported as dangling.
+    """
+    g = graph([('c', 'b'), ('b', 'a'), ('a', None), ('x', None),
+               ('e', 'd'), ('d', 'zz')])
+    assert g.heads() == [('c', 'a', 3), ('e', 'd', 2)]
+    assert g.chain('c') == ['c', 'b', 'a']
+    assert g.dangling() == [('d', 'zz')]
+    assert g.cycles() == []
+    assert g.conflicts() == []
+
+
+def test_cycles():
+    """
+    Given packages that replace each other in cycles, when querying the graph,
+    then each cycle is reported once, and chains leading into a cycle have no
+    root.
+    """
+    g = graph([('b', 'a'), ('a', 'c'), ('c', 'b'), ('d', 'a'), ('e', 'e')])
+    assert g.cycles() == [['a', 'c', 'b'], ['e']]
+    # Chain leading into a cycle has no root
+    assert g.heads() == [('d', None, 1)]
+    assert g.chain('d') == ['d', 'a', 'c', 'b']
+
+
+def test_conflicts():
+    """
+    Given two packages that replace the same package, when querying the graph,
+    then the conflict is reported and both are heads.
+    """
+    g = graph([('b', 'a'), ('c', 'a'), ('a', None)])
+    assert g.conflicts() == [('a', ['b', 'c'])]
+    assert g.heads() == [('b', 'a', 2), ('c', 'a', 2)]
+
+
+def test_long_chain():
+    """
+    Given a very long replacement chain, when listing heads, then the chain is
+    resolved without hitting the recursion limit.
+    """
+    n = 100000
+    g = graph([(str(i), str(i - 1) if i else None) for i in range(n)])
+    assert g.heads() == [(str(n - 1), '0', n)]
+
+
+def test_build(tmp_path):
+    """
+    Given metadata files with and without valid URLs and replaces IDs, when
+    building the graph, then IDs are normalized, invalid replaces IDs are
+    ignored, and files without a URL are skipped.
+    """
+    def write(name, url, **kwargs):
+        path = tmp_path / name
+        path.write_text(json.dumps(dict(url=url, **kwargs)))
+        return str(path)
+
+    old = write('old.json', 'http://example.com/old')
+    new = write('new.json', 'http://example.com/new',
+                replaces=md5('http://example.com/old').upper())
+    bad = write('bad.json', 'http://example.com/bad', replaces='foo')
+    nourl = write('nourl.json', None)
+    g = mod.build([old, new, bad, nourl, str(tmp_path / 'missing')])
+    assert g.heads() == [(md5('http://example.com/new'),
+                          md5('http://example.com/old'), 2)]
+    assert g.replaces[md5('http://example.com/bad')] is None
+    assert g.skipped == [nourl, str(tmp_path / 'missing')]
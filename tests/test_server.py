@@ -0,0 +1,162 @@
+"""
+Tests for outernet_metadata.server and outernet_metadata.client modules
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+if sys.version_info < (3, 7):
+    pytest.skip('server requires Python 3.7 or newer', allow_module_level=True)
+
+import asyncio
+
+import outernet_metadata.server as mod
+import outernet_metadata.client as client
+import outernet_metadata.validate as validate
+
+
+VALID = {
+    'title': 'Foo',
+    'url': 'outernet://foo.bar/',
+    'timestamp': '2015-04-29 13:22:00 UTC',
+    'broadcast': '2015-04-29',
+    'license': 'CC-BY',
+}
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / 'server.sock')
+    srv = mod.Server(path, jobs=2)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(srv.start())
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    yield path
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.run_until_complete(srv.stop())
+    loop.close()
+
+
+def test_handle():
+    """
+    Given requests with valid, invalid and missing metadata, and a malformed
+    request line, when handling them, then results are returned as lines of
+    JSON in metacheck format.
+    """
+    ret = json.loads(mod.handle({'id': 'x', 'data': VALID}))
+    assert ret == {'path': 'x', 'status': validate.VALID, 'errors': []}
+    ret = json.loads(mod.handle({'data': dict(VALID, license='foo')}))
+    assert ret['status'] == validate.INVALID
+    assert [e['key'] for e in ret['errors']] == ['license']
+    ret = json.loads(mod.handle({'foo': 1}))
+    assert ret['status'] == validate.LOAD_ERROR
+    ret = json.loads(mod.handle_line(b'{bad'))
+    assert ret['error'] == 'invalid JSON format'
+
+
+def test_handle_non_object_metadata(tmp_path):
+    """
+    Given requests with metadata that is not a JSON object, when handling
+    them, then load errors are returned.
+    """
+    path = tmp_path / 'info.json'
+    path.write_text('[1]')
+    ret = json.loads(mod.handle_line(json.dumps({'path': str(path)})))
+    assert ret['path'] == str(path)
+    assert ret['status'] == validate.LOAD_ERROR
+    ret = json.loads(mod.handle_line(json.dumps({'id': 'x', 'data': [1]})))
+    assert ret == {'path': 'x', 'status': validate.LOAD_ERROR,
+                   'error': 'metadata is not a JSON object'}
+
+
+def test_client_bad_file_in_batch(server, tmp_path):
+    """
+    Given a file that is not a JSON object among valid files, when checking
+    them through the server, then a result is returned for every file.
+    """
+    paths = []
+    for name, text in (('1', json.dumps(VALID)), ('2', '[1]'),
+                       ('3', json.dumps(VALID))):
+        path = tmp_path / '{}.json'.format(name)
+        path.write_text(text)
+        paths.append(str(path))
+    ret = list(client.check_paths(server, paths))
+    assert [r[1] for r in ret] == [validate.VALID, validate.LOAD_ERROR,
+                                   validate.VALID]
+
+
+def test_client_check_paths(server, tmp_path):
+    """
+    Given valid, invalid and missing files, when checking them through the
+    server, then the results are the same as those of local checks, in the same
+    order.
+    """
+    paths = []
+    for n in range(50):
+        path = tmp_path / '{}.json'.format(n)
+        data = VALID if n % 2 else dict(VALID, title='')
+        path.write_text(json.dumps(data))
+        paths.append(str(path))
+    paths.append(str(tmp_path / 'missing.json'))
+    expected = [validate.check_path(p) for p in paths]
+    assert list(client.check_paths(server, paths)) == expected
+
+
+def test_client_relative_paths(server, tmp_path, monkeypatch):
+    """
+    Given relative paths, when checking them through the server, then the
+    results report the paths as given, like local checks do.
+    """
+    monkeypatch.chdir(str(tmp_path))
+    (tmp_path / 'info.json').write_text(json.dumps(VALID))
+    paths = ['info.json', ' ./info.json\n', 'missing.json']
+    expected = [validate.check_path(p) for p in paths]
+    assert list(client.check_paths(server, paths)) == expected
+    assert [r[0] for r in expected] == ['info.json', './info.json',
+                                        'missing.json']
+
+
+def test_concurrent_clients(server, tmp_path):
+    """
+    Given several clients connected at the same time, when they check files
+    through the server, then each of them receives all of its results.
+    """
+    path = tmp_path / 'info.json'
+    path.write_text(json.dumps(VALID))
+    results = []
+
+    def run():
+        results.append(list(client.check_paths(server, [str(path)] * 20)))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == [[(str(path), validate.VALID, [])] * 20] * 4
+
+
+def test_stop_removes_socket(tmp_path):
+    """
+    Given a started server, when stopping it, then its socket file is removed.
+    """
+    path = str(tmp_path / 'server.sock')
+    srv = mod.Server(path)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(srv.start())
+    assert os.path.exists(path)
+    loop.run_until_complete(srv.stop())
+    loop.close()
+    assert not os.path.exists(path)
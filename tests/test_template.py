@@ -8,6 +8,10 @@ This software is free software licensed under the terms of GPLv3. See COPYING
 file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 """
 
+import io
+import os
+import json
+
 import pytest
 
 import outernet_metadata.template as mod
@@ -69,3 +73,124 @@ def test_generate_template_ignored_keywords():
     """
     ret = mod.generate_template(foo='bar')
     assert 'foo' not in ret
+
+
+RECORD = {
+    'title': 'Foo',
+    'url': 'http://example.com/foo',
+    'timestamp': '2015-04-29 13:22:00 UTC',
+    'license': 'CC-BY',
+    'content': {'html': {'main': 'index.html'}},
+}
+
+
+def test_read_csv():
+    """
+    Given a CSV manifest with JSON columns, empty cells and a malformed JSON
+    cell, when reading it, then empty cells are omitted, JSON columns are
+    parsed, and the malformed row is yielded as a record error.
+    """
+    f = io.StringIO(
+        'title,url,license,is_partner,content\n'
+        'Foo,http://a.com/,CC-BY,true,"{""html"": {""main"": ""a.html""}}"\n'
+        'Bar,http://b.com/,,,\n'
+        'Baz,http://c.com/,,{bad,\n')
+    ret = list(mod.read_csv(f, 'm.csv'))
+    assert ret[0] == ('m.csv:2', {
+        'title': 'Foo', 'url': 'http://a.com/', 'license': 'CC-BY',
+        'is_partner': True, 'content': {'html': {'main': 'a.html'}}})
+    assert ret[1] == ('m.csv:3', {'title': 'Bar', 'url': 'http://b.com/'})
+    assert ret[2][0] == 'm.csv:4'
+    assert ret[2][1].code == 'record'
+
+
+def test_read_ndjson():
+    """
+    Given an NDJSON manifest with a blank line, a non-object record and
+    malformed JSON, when reading it, then blank lines are skipped and bad lines
+    are yielded as record errors.
+    """
+    f = io.StringIO('{"title": "Foo"}\n\n[1]\n{bad\n')
+    ret = list(mod.read_ndjson(f, 'm'))
+    assert ret[0] == ('m:1', {'title': 'Foo'})
+    assert [r[0] for r in ret[1:]] == ['m:3', 'm:4']
+    assert all(r[1].code == 'record' for r in ret[1:])
+
+
+def test_make_package():
+    """
+    Given manifest records, when making packages, then optional keys are copied
+    from the record, deprecated keys are only kept if given, and missing
+    timestamps default to the current time.
+    """
+    id, meta, errors = mod.make_package(dict(RECORD, thumbnail='t.png'))
+    assert id == mod.md5(RECORD['url'])
+    assert meta['thumbnail'] == 't.png'
+    assert meta['broadcast'] == '$BROADCAST'
+    assert 'multipage' not in meta
+    assert errors == {}
+    _, meta, errors = mod.make_package({'title': 'Foo', 'multipage': True})
+    assert meta['timestamp']
+    assert set(errors) == set(['url', 'license', 'multipage'])
+
+
+def test_make_package_without_content():
+    """
+    Given a manifest row without a content column, when making a package,
+    then it gets an HTML content type with index.html as the main file and
+    is valid.
+    """
+    record = {'title': 'Foo', 'url': 'http://example.com/a',
+              'license': 'CC-BY'}
+    _, meta, errors = mod.make_package(record)
+    assert meta['content'] == {'html': {'main': 'index.html'}}
+    assert errors == {}
+    f = io.StringIO('title,url,license\nFoo,http://example.com/a,CC-BY\n')
+    [(_, record)] = mod.read_csv(f, 'm.csv')
+    assert mod.make_package(record)[2] == {}
+
+
+def test_batch(tmp_path):
+    """
+    Given valid, invalid, malformed and duplicate records, when generating
+    packages in a batch, then results are yielded in record order and only
+    valid, unique packages are written.
+    """
+    records = [('r1', RECORD),
+               ('r2', dict(RECORD, license='foo')),
+               ('r3', mod.ValidationError('invalid JSON format', 'record')),
+               ('r4', dict(RECORD, title='Copy'))]
+    records += [('r{}'.format(i), dict(RECORD, url='http://a.com/{}'.format(i)))
+                for i in range(5, 100)]
+    ret = list(mod.batch(iter(records), str(tmp_path), jobs=2))
+    assert [r[0] for r in ret] == [r[0] for r in records]
+    assert ret[0][1] == str(tmp_path / mod.md5(RECORD['url']))
+    assert [sorted(r[2]) for r in ret[1:4]] == [
+        ['license'], ['record'], ['url']]
+    assert all(r[1] and not r[2] for r in ret[4:])
+    with open(os.path.join(ret[0][1], 'info.json')) as f:
+        assert json.load(f)['title'] == 'Foo'
+    assert len(os.listdir(str(tmp_path))) == 96
+    assert not [n for n in os.listdir(ret[0][1]) if n.endswith('.tmp')]
+
+
+def test_batch_write_error(tmp_path):
+    """
+    Given a base path that is not a directory, when generating packages in a
+    batch, then the record is reported with a write error.
+    """
+    base = tmp_path / 'file'
+    base.write_text('')
+    ret = list(mod.batch([('r1', RECORD)], str(base)))
+    assert ret[0][1] is None
+    assert list(ret[0][2]) == ['write']
+
+
+def test_generate_template_does_not_share_defaults():
+    """
+    Given a generated template, when changing its content dict, then
+    templates generated later are not affected.
+    """
+    ret = mod.generate_template()
+    ret['content']['html']['main'] = 'foo.html'
+    assert mod.generate_template()['content'] == {'html': {}}
@@ -0,0 +1,123 @@
+"""
+Tests for outernet_metadata.timeutil module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import random
+import datetime
+
+import pytest
+
+import outernet_metadata.timeutil as mod
+
+
+SAMPLES = [
+    '2015-04-29', '2015-4-9', '2015-04- 9', '2015-04-  9', '2015-02-29',
+    '2016-02-29', '2015-04-31', '0000-01-01', '0001-01-01', '9999-12-31',
+    '15-04-29', '2015-13-01', '2015-00-10', '2015-04-29 ', ' 2015-04-29',
+    '2015-04-011', '2015/04/29', '', '٢٠١٥-04-29',
+    '2015-04-29 13:22:00 UTC', '2015-04-29 13:22:00 utc',
+    '2015-04-29\t13:22:00  UTC', '2015-04-29 1:2:3 UTC',
+    '2015-04-29 24:00:00 UTC', '2015-04-29 23:59:60 UTC',
+    '2015-04-29 23:59:61 UTC', '2015-04-29 13:22:00', '2015-04-29 13:22 UTC',
+    '2015-04-29 13:22:00 UTC ', '2015-04-29 13:22:00 GMT',
+    '2015-04-29 13:22:00UTC', '2015-02-29 13:22:00 UTC',
+]
+
+
+def strptime_accepts(s, fmt):
+    try:
+        datetime.datetime.strptime(s, fmt)
+    except ValueError:
+        return False
+    return True
+
+
+def mutate(rnd, s):
+    chars = '0123456789 -:\tUTCutc/x'
+    s = list(s)
+    for _ in range(rnd.randint(1, 3)):
+        op = rnd.randint(0, 2)
+        pos = rnd.randint(0, len(s))
+        if op == 0 and s:
+            del s[min(pos, len(s) - 1)]
+        elif op == 1:
+            s.insert(pos, rnd.choice(chars))
+        elif s:
+            s[min(pos, len(s) - 1)] = rnd.choice(chars)
+    return ''.join(s)
+
+
+@pytest.mark.parametrize('fmt', [mod.DATE_FMT, mod.TS_FMT])
+def test_same_as_strptime(fmt):
+    """
+    Given samples and random mutations of valid values, when checking them
+    with the fast parser, then the result matches that of strptime().
+    """
+    rnd = random.Random(0)
+    check = mod.CHECKS[fmt]
+    valid = ['2015-04-29', '2016-02-29 23:59:59 UTC', '1999-12-31 00:00:00 UTC']
+    values = SAMPLES + [mutate(rnd, rnd.choice(valid)) for _ in range(20000)]
+    for s in values:
+        assert check(s) == strptime_accepts(s, fmt), repr(s)
+
+
+def test_parse_values():
+    """
+    Given valid unpadded and lower-case values, when parsing them, then the
+    matching date and datetime objects are returned.
+    """
+    assert mod.parse_date('2015-4- 9') == datetime.date(2015, 4, 9)
+    assert mod.parse_timestamp('2015-04-29 13:22:05 utc') == (
+        datetime.datetime(2015, 4, 29, 13, 22, 5))
+
+
+@pytest.mark.parametrize('value', [12, None, b'2015-04-29', ['2015-04-29']])
+def test_non_strings(value):
+    """
+    Given values that are not strings, when checking them, then TypeError is
+    raised like strptime() does.
+    """
+    with pytest.raises(TypeError):
+        datetime.datetime.strptime(value, mod.DATE_FMT)
+    with pytest.raises(TypeError):
+        mod.CHECKS[mod.DATE_FMT](value)
+
+
+def test_memo_bounded():
+    """
+    Given a memoized parser, when checking repeated and many distinct values,
+    then repeated values are not parsed again and the memo does not grow beyond
+    its size.
+    """
+    calls = []
+
+    def parse(s):
+        calls.append(s)
+        if s == 'bad':
+            raise ValueError()
+
+    check = mod.memoized(parse, size=3)
+    assert [check(s) for s in ['a', 'bad', 'a', 'bad']] == [
+        True, False, True, False]
+    assert calls == ['a', 'bad']
+    for s in 'bcdefg':
+        check(s)
+    assert len(check.memo) <= 3
+
+
+def test_format_canonical():
+    """
+    Given valid unpadded values, when formatting them, then zero-padded
+    canonical values are returned, and invalid dates raise ValueError.
+    """
+    assert mod.format_date('2015-9- 1') == '2015-09-01'
+    assert mod.format_timestamp('2015-9-30\t0:0:0  utc') == (
+        '2015-09-30 00:00:00 UTC')
+    with pytest.raises(ValueError):
+        mod.format_date('2015-09-31')
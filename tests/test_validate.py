@@ -10,6 +10,8 @@ file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
 
 import pytest
 
+import io
+import json
 import itertools
 
 import outernet_metadata.validator as mod
@@ -200,3 +202,247 @@ def test_broadcast_flag():
     data['broadcast'] = '$BROADCAST'
     with pytest.raises(ValueError):
         mod.validate(data, broadcast=True)
+
+
+def test_validate_many():
+    """
+    Given an iterable of records, when calling validate_many(), then it yields
+    record IDs with errors for each record.
+    """
+    bad = dict(BASE_METADATA, title='')
+    records = iter([('a', BASE_METADATA), ('b', bad)])
+    ret = mod.validate_many(records)
+    assert next(ret)[0] == 'a'
+    rid, errors = next(ret)
+    assert rid == 'b'
+    assert 'title' in errors
+
+
+def test_validate_many_is_lazy():
+    """
+    Given an infinite stream of records, when calling validate_many(), then
+    records are validated as they are consumed.
+    """
+    records = ((i, {}) for i in itertools.count())
+    ret = mod.validate_many(records)
+    assert [rid for rid, _ in itertools.islice(ret, 3)] == [0, 1, 2]
+
+
+def test_validate_many_broadcast_flag():
+    """
+    Given records with broadcast placeholder, when calling validate_many()
+    with broadcast flag, then the placeholder is reported as an error.
+    """
+    data = {'title': 'Foo', 'url': 'outernet://foo.bar/',
+            'timestamp': '2015-04-29 13:22:00 UTC',
+            'broadcast': '$BROADCAST', 'license': 'CC-BY'}
+    [(_, errors)] = mod.validate_many([(1, data)], broadcast=True)
+    assert errors['broadcast'].args[1] == 'broadcast_strict'
+
+
+def test_validate_fail_fast():
+    """
+    Given metadata with many errors, when calling validate() with fail_fast
+    flag, then only one error is returned.
+    """
+    data = {'title': '', 'url': 'foo', 'license': 'foo'}
+    assert len(mod.validate(data)) > 1
+    errors = mod.validate(data, fail_fast=True)
+    assert len(errors) == 1
+    key, err = list(errors.items())[0]
+    assert mod.validate(data)[key].args == err.args
+
+
+def test_validate_fail_fast_album():
+    """
+    Given metadata with many invalid album items, when calling validate()
+    with fail_fast flag, then only the first invalid item is reported.
+    """
+    data = dict(BASE_METADATA)
+    data['content'] = {'image': {'album': [{'file': '/foo'}] * 100}}
+    for k in ('images', 'index', 'keep_formatting', 'multipage'):
+        del data[k]
+    errors = mod.validate(data, fail_fast=True)
+    assert [p for p, _ in errors['content'].errors] == [
+        'content.image.1.file']
+
+
+@pytest.mark.parametrize('data,broadcast,expected', [
+    ({'title': ''}, False, False),
+    ({}, False, True),
+    ({'broadcast': '$BROADCAST'}, False, True),
+    ({'broadcast': '$BROADCAST'}, True, False),
+])
+def test_is_valid(data, broadcast, expected):
+    """
+    Given metadata, when calling is_valid(), then it returns whether the
+    metadata is valid.
+    """
+    meta = {'title': 'Foo', 'url': 'outernet://foo.bar/',
+            'timestamp': '2015-04-29 13:22:00 UTC',
+            'broadcast': '2015-04-29', 'license': 'CC-BY'}
+    meta.update(data)
+    assert mod.is_valid(meta, broadcast=broadcast) is expected
+
+
+@pytest.mark.parametrize('content', [
+    {'image': {'album': [{'file': 'a.jpg'}] * 600}},
+    {'image': {'album': [{'file': 'a.jpg'}] * 300 + [{'file': '/b.jpg'}] +
+               [{}] * 2 + [{'size': 3}]}},
+    {'image': {'album': [{}]}},
+    {'image': {'album': []}},
+    {'image': {'album': [{'file': '/a'}] * 3, 'description': 3}},
+    {'image': {'album': [1, 2] * 300, 'description': 3}},
+    {'audio': {'playlist': [{'file': 'a.mp3', 'duration': 0}] * 300},
+     'foo': {}, 'image': {'album': {}}},
+])
+def test_validate_stream(content):
+    """
+    Given metadata with album or playlist items, when calling
+    validate_stream() on the encoded document, then it returns the same
+    errors as validate().
+    """
+    data = dict(BASE_METADATA, content=content)
+    encoded = json.dumps(data).encode('utf8')
+    expected = mod.validate(json.loads(encoded.decode('utf8')))
+    errors = mod.validate_stream(io.BytesIO(encoded))
+    assert {k: e.args for k, e in errors.items()} == {
+        k: e.args for k, e in expected.items()}
+    assert not mod.STREAMED
+
+
+def test_validate_stream_capped(monkeypatch):
+    """
+    Given metadata with more invalid album items than the limit, when
+    calling validate_stream(), then it returns the same errors as validate().
+    """
+    monkeypatch.setattr(mod.custom_validators, 'MAX_LIST_ERRORS', 300)
+    album = [{'file': '/a.jpg'}] * 1000
+    data = dict(BASE_METADATA, content={'image': {'album': album}})
+    encoded = json.dumps(data).encode('utf8')
+    errors = mod.validate_stream(io.BytesIO(encoded))
+    assert errors['content'].args == mod.validate(data)['content'].args
+    assert len(errors['content'].errors) == 301
+
+
+@pytest.mark.parametrize('album', [[1], [{}] + [1] * 300])
+def test_validate_stream_non_objects(album):
+    """
+    Given album items that are not objects in an otherwise valid content
+    type, when calling validate_stream(), then it fails like validate().
+    """
+    data = dict(BASE_METADATA, content={'image': {'album': album}})
+    encoded = json.dumps(data).encode('utf8')
+    with pytest.raises(AttributeError):
+        mod.validate(data)
+    with pytest.raises(AttributeError):
+        mod.validate_stream(io.BytesIO(encoded))
+    assert not mod.STREAMED
+
+
+def delta_errors(data, changes, **kwargs):
+    errors = mod.validate_delta(data, changes, **kwargs)
+    return [(k, e.args) for k, e in errors.items()]
+
+
+def changed(data, changes):
+    data = dict(data)
+    content = data.get('content')
+    for key, value in changes.items():
+        if key.startswith('content.'):
+            _, type_key, index = key.split('.')
+            content = mod.replace_items(content, {
+                (type_key, int(index)): value})
+        elif value is None:
+            data.pop(key, None)
+        else:
+            data[key] = value
+    if content is not None and 'content' not in changes:
+        data['content'] = content
+    return data
+
+
+DELTA_CONTENT = {
+    'image': {'album': [{'file': 'a.jpg'}, {'file': '/b.jpg'},
+                        {'file': 'c.jpg', 'size': 3}, {'file': 'd.jpg'}]},
+    'audio': {'playlist': [{'file': 'a.mp3'}, {'file': 'b.mp3'}]},
+}
+
+
+@pytest.mark.parametrize('content,changes', [
+    (None, {'title': ''}),
+    (None, {'title': None, 'keywords': 'foo'}),
+    (None, {'index': None, 'images': None, 'multipage': None}),
+    (None, {'partner': 'bar'}),
+    (DELTA_CONTENT, {'content.image.2': {'file': 'b.jpg'}}),
+    (DELTA_CONTENT, {'content.image.1': {'file': '/a.jpg'}}),
+    (DELTA_CONTENT, {'content.image.4': {'size': 'x'}}),
+    (DELTA_CONTENT, {'content.audio.1': {}, 'content.image.3': {}}),
+    (DELTA_CONTENT, {'content.audio.2': {'file': 'c.mp3'}, 'title': 'Bar'}),
+    (DELTA_CONTENT, {'content': {'html': {}}}),
+    (dict(DELTA_CONTENT, video={}), {'content.image.2': {'file': 'b'}}),
+    (dict(DELTA_CONTENT, foo={}), {'content.image.2': {'file': 'b'}}),
+    ({'image': {'album': [{'file': '/a'}], 'description': 1}},
+     {'content.image.1': {'file': 'a'}}),
+    ({}, {'title': 'Bar'}),
+])
+def test_validate_delta(content, changes):
+    """
+    Given metadata and changes, when calling validate_delta(), then it
+    returns the same errors as validate() for the changed metadata.
+    """
+    data = dict(BASE_METADATA)
+    if content is not None:
+        data['content'] = content
+    expected = [(k, e.args) for k, e in
+                mod.validate(changed(data, changes)).items()]
+    assert delta_errors(data, changes) == expected
+    old = mod.validate(data)
+    keys = list(old)
+    assert delta_errors(data, changes, errors=old) == expected
+    assert list(old) == keys
+
+
+def test_validate_delta_capped(monkeypatch):
+    """
+    Given album with suppressed item errors, when calling validate_delta()
+    with a changed item, then errors are the same as those of validate().
+    """
+    monkeypatch.setattr(mod.custom_validators, 'MAX_LIST_ERRORS', 2)
+    album = [{'file': 'a'}] * 2 + [{'file': '/a'}] * 3
+    data = dict(BASE_METADATA, content={'image': {'album': album}})
+    for changes in ({'content.image.1': {}}, {'content.image.3': {}},
+                    {'content.image.5': {'file': 'a'}}):
+        expected = [(k, e.args) for k, e in
+                    mod.validate(changed(data, changes)).items()]
+        assert delta_errors(data, changes) == expected
+    monkeypatch.setattr(mod.custom_validators, 'MAX_LIST_ERRORS', 1)
+    album = [{'file': 'a'}] * 2 + [{'file': '/a'}]
+    data = dict(BASE_METADATA, content={'image': {'album': album}})
+    changes = {'content.image.1': {}}
+    expected = [(k, e.args) for k, e in
+                mod.validate(changed(data, changes)).items()]
+    assert delta_errors(data, changes) == expected
+
+
+def test_validate_delta_bad_item():
+    """
+    Given a change of an item that does not exist, when calling
+    validate_delta(), then IndexError is raised.
+    """
+    data = dict(BASE_METADATA, content=DELTA_CONTENT)
+    with pytest.raises(IndexError):
+        mod.validate_delta(data, {'content.image.5': {}})
+    with pytest.raises(ValueError):
+        mod.validate_delta(data, {'content.image.1': {}, 'content': {}})
+
+
+def test_module_validators():
+    """
+    Given the module-level validators, when calling them, then they return
+    the same errors as the compiled validators.
+    """
+    data = {'title': '', 'url': 'foo'}
+    assert list(mod.VALIDATOR(data)) == list(mod.get_validator()(data))
+    assert len(mod.FAIL_FAST_VALIDATOR(data)) == 1
+    assert mod.VALIDATOR.source == mod.get_validator().source
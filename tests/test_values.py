@@ -0,0 +1,84 @@
+"""
+Tests for outernet_metadata.values module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import pytest
+
+import outernet_metadata.values as mod
+from outernet_metadata import validator
+
+
+def test_defaults_are_read_only():
+    """
+    Given the defaults, when trying to change them, then TypeError is raised.
+    """
+    with pytest.raises(TypeError):
+        mod.DEFAULTS['archive'] = 'foo'
+    with pytest.raises(TypeError):
+        mod.DEFAULTS['content']['html']['main'] = 'foo.html'
+
+
+def test_thaw():
+    """
+    Given a frozen value, when thawing it, then an equal dict that can be
+    changed is returned.
+    """
+    content = mod.thaw(mod.DEFAULTS['content'])
+    assert content == {'html': {}}
+    assert type(content['html']) is dict
+    assert mod.thaw('foo') == 'foo'
+
+
+def test_normalize_fills_defaults():
+    """
+    Given metadata with some optional keys missing, when normalizing it, then
+    a copy with defaults for the missing keys is returned.
+    """
+    data = {'title': 'Foo', 'archive': 'ephemeral', 'content': {'app': {}}}
+    ret = mod.normalize(data)
+    assert ret is not data
+    assert set(ret) == set(data) | set(mod.NORMALIZED)
+    assert ret['archive'] == 'ephemeral'
+    assert ret['content'] is data['content']
+    assert ret['keywords'] == ''
+    assert data == {'title': 'Foo', 'archive': 'ephemeral',
+                    'content': {'app': {}}}
+
+
+def test_normalize_skips_deprecated_and_content():
+    """
+    Given metadata without deprecated keys and content, when normalizing it,
+    then they are not added.
+    """
+    data = mod.normalize({})
+    assert 'content' not in data
+    assert not set(data) & set(mod.DEPRECATED)
+    assert set(mod.DEPRECATED) >= {'index', 'multipage'}
+
+
+def test_normalize_keeps_valid():
+    """
+    Given valid metadata without optional keys, when normalizing it, then
+    the result is still valid.
+    """
+    data = {'title': 'Foo', 'url': 'outernet://foo.bar/',
+            'timestamp': '2015-04-29 13:22:00 UTC',
+            'broadcast': '2015-04-29', 'license': 'CC-BY',
+            'content': {'html': {'main': 'index.html'}}}
+    assert validator.validate(data) == {}
+    assert validator.validate(mod.normalize(data)) == {}
+
+
+def test_normalize_complete():
+    """
+    Given metadata with all optional keys, when normalizing it, then it is
+    returned as is.
+    """
+    data = mod.normalize({'title': 'Foo'})
+    assert mod.normalize(data) is data
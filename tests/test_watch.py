@@ -0,0 +1,134 @@
+"""
+Tests for outernet_metadata.watch module
+
+Copyright 2015, Outernet Inc.
+Some rights reserved.
+
+This software is free software licensed under the terms of GPLv3. See COPYING
+file that comes with the source code, or http://www.gnu.org/licenses/gpl.txt.
+"""
+
+import os
+import time
+
+import pytest
+
+import outernet_metadata.watch as mod
+import outernet_metadata.validate as validate
+
+
+class FakeWatcher(object):
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.closed = False
+
+    def read(self, timeout):
+        if self.batches:
+            return self.batches.pop(0)
+        time.sleep(timeout)
+        return []
+
+    def close(self):
+        self.closed = True
+
+
+def wait_for(fn, timeout=5):
+    end = time.time() + timeout
+    while time.time() < end:
+        ret = fn()
+        if ret:
+            return ret
+        time.sleep(0.05)
+    return fn()
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'a' / 'info.json').write_text('{}')
+    (tmp_path / 'b.zip').write_text('')
+    (tmp_path / 'c.txt').write_text('')
+    return tmp_path
+
+
+def test_targets(tree):
+    """
+    Given a directory tree, when listing watch targets, then only metadata
+    files and ZIP files are returned.
+    """
+    assert sorted(mod.targets(str(tree))) == [
+        str(tree / 'a' / 'info.json'), str(tree / 'b.zip')]
+
+
+def test_debounce_coalesces_bursts():
+    """
+    Given bursts of change events, when debouncing them, then each burst is
+    yielded once as a sorted list of unique paths.
+    """
+    w = FakeWatcher([['a', 'b'], ['a'], ['a', 'c']])
+    batches = mod.debounce(w, delay=0.05)
+    assert next(batches) == ['a', 'b', 'c']
+    w.batches = [['b']]
+    assert next(batches) == ['b']
+
+
+def test_poll_watcher(tree):
+    """
+    Given a polled directory tree, when a file is changed and a package is
+    added, then both paths are reported once on the next read.
+    """
+    w = mod.PollWatcher(str(tree), interval=0)
+    assert w.read(0) == []
+    path = tree / 'a' / 'info.json'
+    path.write_text('{"title": "changed"}')
+    st = os.stat(str(path))
+    os.utime(str(path), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+    (tree / 'd').mkdir()
+    (tree / 'd' / 'info.json').write_text('{}')
+    assert sorted(w.read(0)) == [str(path), str(tree / 'd' / 'info.json')]
+    assert w.read(0) == []
+
+
+@pytest.mark.skipif(mod.load_inotify() is None, reason='needs inotify')
+def test_inotify_watcher(tree):
+    """
+    Given an inotify watcher, when files are written in watched and new
+    directories, then only metadata and ZIP files are reported.
+    """
+    w = mod.watcher(str(tree))
+    assert isinstance(w, mod.InotifyWatcher)
+    try:
+        (tree / 'a' / 'info.json').write_text('{}')
+        (tree / 'a' / 'notes.txt').write_text('')
+        assert wait_for(lambda: w.read(0.1)) == [str(tree / 'a' / 'info.json')]
+        # New directories are watched too
+        (tree / 'd').mkdir()
+        assert w.read(1) == []
+        (tree / 'd' / 'e.zip').write_text('')
+        assert wait_for(lambda: w.read(0.1)) == [str(tree / 'd' / 'e.zip')]
+    finally:
+        w.close()
+
+
+def test_watcher_poll_fallback(tree, monkeypatch):
+    """
+    Given that inotify is not available or polling is requested, when creating
+    a watcher, then a polling watcher is returned.
+    """
+    monkeypatch.setattr(mod, 'load_inotify', lambda: None)
+    assert isinstance(mod.watcher(str(tree)), mod.PollWatcher)
+    assert isinstance(mod.watcher(str(tree), poll=True), mod.PollWatcher)
+
+
+def test_watch(tree, monkeypatch):
+    """
+    Given a change event for a metadata file, when watching, then the file is
+    checked, and the watcher is closed when iteration stops.
+    """
+    path = str(tree / 'a' / 'info.json')
+    w = FakeWatcher([[path]])
+    monkeypatch.setattr(mod, 'watcher', lambda root, poll: w)
+    results = mod.watch(str(tree), validate.check_paths, delay=0.01)
+    assert next(results)[:2] == (path, validate.INVALID)
+    results.close()
+    assert w.closed